@@ -0,0 +1,142 @@
+# -*- coding: utf-8 -*-
+"""
+Limpieza ASR en una sola pasada con diccionario de correcciones externo.
+
+Reemplaza las pasadas regex sucesivas de clean_text por un único recorrido lineal:
+- une números partidos ("15, 000, 23" -> "1500023")
+- corrige palabras/frases mal transcritas consultando un diccionario (hash por
+  palabra + tabla de frases indexada por su primera palabra), así que el costo
+  no crece con el tamaño del diccionario
+- colapsa espacios
+
+Formato del diccionario (TSV, UTF-8):
+  # comentario
+  variante<TAB>corrección
+Las variantes se comparan sin distinguir mayúsculas y como palabra completa;
+pueden tener varias palabras ("en el lote" -> ...). También se acepta un JSON
+{"variante": "corrección", ...}.
+"""
+
+import re
+import json
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+# Reglas históricas de clean_text (se usan si no se encuentra el archivo externo)
+DEFAULT_CORRECTIONS: Dict[str, str] = {
+    # so[vb]i[cq]uado -> ubicado
+    "soviquado": "ubicado", "sovicuado": "ubicado", "sobiquado": "ubicado", "sobicuado": "ubicado",
+    # hablicaci[oó]n -> habilitacion
+    "hablicacion": "habilitacion", "hablicación": "habilitacion",
+    # proe?dial -> predial
+    "proedial": "predial", "prodial": "predial",
+    "rantas": "rentas",
+}
+
+DEFAULT_CORRECTIONS_PATH = Path(__file__).parent / "asr_corrections.tsv"
+
+# Token = palabra (\w+) que se extiende sobre separadores [\s,]+ entre dígitos, o un bloque de espacios
+_TOKEN_RX = re.compile(r"(\w+(?:(?<=\d)[\s,]+(?=\d)\w+)*)|(\s+)")
+_JOIN_RX = re.compile(r"[\s,]+")
+
+def load_corrections(path: Path) -> Dict[str, str]:
+    """ Lee un diccionario TSV o JSON. Claves en minúsculas y espacios normalizados. """
+    path = Path(path)
+    if path.suffix.lower() == ".json":
+        raw = json.loads(path.read_text(encoding="utf-8"))
+        items = list(raw.items())
+    else:
+        items = []
+        with path.open("r", encoding="utf-8") as f:
+            for line in f:
+                line = line.rstrip("\n")
+                if not line.strip() or line.lstrip().startswith("#"):
+                    continue
+                parts = line.split("\t")
+                if len(parts) < 2:
+                    continue
+                items.append((parts[0], parts[1]))
+    out: Dict[str, str] = {}
+    for k, v in items:
+        key = " ".join(str(k).lower().split())
+        if key:
+            out[key] = str(v).strip()
+    return out
+
+class CleanupEngine:
+    def __init__(self, corrections: Optional[Dict[str, str]] = None):
+        self.words: Dict[str, str] = {}
+        # primera palabra -> [(resto de palabras, reemplazo)], frases más largas primero
+        self.phrases: Dict[str, List[Tuple[Tuple[str, ...], str]]] = {}
+        for variant, repl in (corrections if corrections is not None else DEFAULT_CORRECTIONS).items():
+            self.add(variant, repl)
+
+    @classmethod
+    def from_file(cls, path: Path) -> "CleanupEngine":
+        return cls(load_corrections(path))
+
+    def __len__(self) -> int:
+        return len(self.words) + sum(len(v) for v in self.phrases.values())
+
+    def add(self, variant: str, repl: str) -> None:
+        parts = variant.lower().split()
+        if not parts:
+            return
+        if len(parts) == 1:
+            self.words[parts[0]] = repl
+            return
+        lst = self.phrases.setdefault(parts[0], [])
+        lst.append((tuple(parts[1:]), repl))
+        lst.sort(key=lambda t: -len(t[0]))
+
+    @staticmethod
+    def _word(m) -> str:
+        w = m.group(1)
+        return w if w.isalnum() else _JOIN_RX.sub("", w)  # unir números partidos
+
+    def _match_phrase(self, raw: str, pos: int, cands) -> Optional[Tuple[str, int]]:
+        match = _TOKEN_RX.match
+        for rest, repl in cands:
+            p = pos
+            for part in rest:
+                ms = match(raw, p)
+                if ms is None or ms.group(2) is None:
+                    break
+                mw = match(raw, ms.end())
+                if mw is None or mw.group(1) is None or self._word(mw).lower() != part:
+                    break
+                p = mw.end()
+            else:
+                return repl, p
+        return None
+
+    def clean(self, raw: str) -> str:
+        words, phrases = self.words, self.phrases
+        search = _TOKEN_RX.search
+        out: List[str] = []
+        pos, n = 0, len(raw)
+        while pos < n:
+            m = search(raw, pos)
+            if m is None:
+                break
+            start, end = m.span()
+            if start > pos:
+                out.append(raw[pos:start])  # puntuación/otros: se copian tal cual
+            pos = end
+            if m.group(1) is None:
+                out.append(" ")  # colapsar espacios
+                continue
+            w = self._word(m)
+            low = w.lower()
+            if phrases:
+                cands = phrases.get(low)
+                if cands:
+                    hit = self._match_phrase(raw, pos, cands)
+                    if hit:
+                        out.append(hit[0])
+                        pos = hit[1]
+                        continue
+            out.append(words.get(low, w))
+        if pos < n:
+            out.append(raw[pos:])
+        return "".join(out).strip()
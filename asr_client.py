@@ -0,0 +1,215 @@
+# -*- coding: utf-8 -*-
+"""
+Cliente compartido de AssemblyAI: un solo pool HTTP, tope de transcripciones en vuelo,
+cola acotada y reintentos con backoff.
+
+- Conexiones: un aai.Client (httpx) por proceso, reutilizado por subida, alta y sondeo
+  de todas las transcripciones, en lugar de un Transcriber nuevo por llamada.
+- Concurrencia: como mucho `max_inflight` transcripciones a la vez; hasta `max_queue`
+  esperan turno (como mucho `queue_timeout_s`). Cola llena => TranscriptionBusy (429);
+  espera agotada o proveedor caído tras los reintentos => TranscriptionUnavailable (503).
+  Ambas llevan `retry_after` para la cabecera Retry-After.
+- Reintentos: sólo errores transitorios (408/425/429/5xx, cortes y timeouts de red), con
+  backoff exponencial y jitter completo. Subida, alta y sondeo se reintentan por separado:
+  un corte al sondear no vuelve a subir el audio.
+- base_url configurable: se puede probar contra un servidor HTTP local que imite la API.
+"""
+
+import time
+import random
+import threading
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterator, Optional, TypeVar
+
+import assemblyai as aai
+import httpx
+
+T = TypeVar("T")
+
+TRANSIENT_STATUS = {408, 425, 429, 500, 502, 503, 504}
+PENDING_STATUS = {"queued", "processing"}
+
+class TranscriptionUnavailable(RuntimeError):
+    """ El proveedor no responde o no hubo turno a tiempo: reintentar más tarde (503). """
+    status_code = 503
+
+    def __init__(self, message: str, retry_after: float = 5.0, reason: str = "unavailable"):
+        super().__init__(message)
+        self.retry_after = retry_after
+        self.reason = reason  # unavailable | queue_timeout | poll_timeout | rejected
+
+class TranscriptionBusy(TranscriptionUnavailable):
+    """ Cola de transcripciones llena: se rechaza sin esperar (429). """
+    status_code = 429
+
+def is_transient(exc: BaseException) -> bool:
+    if isinstance(exc, httpx.TransportError):  # conexión, timeouts, protocolo
+        return True
+    return getattr(exc, "status_code", None) in TRANSIENT_STATUS
+
+def backoff_delay(attempt: int, base_s: float, max_s: float) -> float:
+    """ Jitter completo: uniforme en [0, min(max_s, base_s * 2^attempt)]. """
+    return random.uniform(0.0, min(max_s, base_s * (2 ** attempt)))
+
+def with_retries(fn: Callable[[], T], retries: int, base_s: float, max_s: float,
+                 on_retry: Optional[Callable[[BaseException], None]] = None,
+                 sleep: Callable[[float], None] = time.sleep) -> T:
+    """ Llama fn(); ante errores transitorios reintenta hasta `retries` veces. """
+    attempt = 0
+    while True:
+        try:
+            return fn()
+        except Exception as e:
+            if attempt >= retries or not is_transient(e):
+                raise
+            if on_retry is not None:
+                on_retry(e)
+            sleep(backoff_delay(attempt, base_s, max_s))
+            attempt += 1
+
+class ConcurrencyLimiter:
+    """ Semáforo con cola acotada y espera máxima; cuenta en vuelo, en cola y rechazos. """
+
+    def __init__(self, max_inflight: int = 8, max_queue: int = 32, queue_timeout_s: float = 30.0,
+                 retry_after_s: float = 5.0):
+        self.max_inflight = max(1, max_inflight)
+        self.max_queue = max(0, max_queue)
+        self.queue_timeout_s = max(0.0, queue_timeout_s)
+        self.retry_after_s = retry_after_s
+        self.inflight = self.queued = 0
+        self.completed = self.rejected = self.timeouts = 0
+        self._cond = threading.Condition()
+
+    @contextmanager
+    def slot(self) -> Iterator[None]:
+        with self._cond:
+            if self.inflight >= self.max_inflight:
+                if self.queued >= self.max_queue:
+                    self.rejected += 1
+                    raise TranscriptionBusy(
+                        f"Hay {self.inflight} transcripciones en curso y {self.queued} en cola "
+                        f"(máximo {self.max_inflight} + {self.max_queue}).", self.retry_after_s, "rejected")
+                self.queued += 1
+                deadline = time.monotonic() + self.queue_timeout_s
+                try:
+                    while self.inflight >= self.max_inflight:
+                        remaining = deadline - time.monotonic()
+                        if remaining <= 0:
+                            self.timeouts += 1
+                            raise TranscriptionUnavailable(
+                                f"Sin turno para transcribir tras {self.queue_timeout_s:g}s en cola.",
+                                self.retry_after_s, "queue_timeout")
+                        self._cond.wait(remaining)
+                finally:
+                    self.queued -= 1
+            self.inflight += 1
+        try:
+            yield
+        finally:
+            with self._cond:
+                self.inflight -= 1
+                self.completed += 1
+                self._cond.notify()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._cond:
+            return {"inflight": self.inflight, "queued": self.queued, "max_inflight": self.max_inflight,
+                    "max_queue": self.max_queue, "completed": self.completed,
+                    "rejected": self.rejected, "queue_timeouts": self.timeouts}
+
+class AssemblyAIClient:
+    def __init__(self, config: aai.TranscriptionConfig, api_key: Optional[str] = None,
+                 base_url: Optional[str] = None, http_timeout_s: float = 30.0,
+                 keepalive_s: Optional[float] = 30.0, poll_interval_s: float = 3.0,
+                 poll_timeout_s: Optional[float] = None, limiter: Optional[ConcurrencyLimiter] = None,
+                 retries: int = 3, backoff_s: float = 0.5, max_backoff_s: float = 8.0,
+                 on_event: Optional[Callable[[str], None]] = None):
+        settings = aai.settings.copy()
+        if api_key:
+            settings.api_key = api_key
+        if base_url:
+            settings.base_url = base_url
+        settings.http_timeout = http_timeout_s
+        settings.keepalive_expiry = keepalive_s
+        settings.polling_interval = poll_interval_s
+        self._client = aai.Client(settings=settings)
+        self._transcriber = aai.Transcriber(client=self._client, config=config, max_workers=1)
+        self.poll_timeout_s = poll_timeout_s or None
+        self.limiter = limiter or ConcurrencyLimiter()
+        self.retries, self.backoff_s, self.max_backoff_s = max(0, retries), backoff_s, max_backoff_s
+        self.on_event = on_event
+        self.retried = self.failed = 0
+        self.last_error: Optional[str] = None
+
+    @property
+    def base_url(self) -> str:
+        return self._client.settings.base_url
+
+    def _event(self, name: str) -> None:
+        if self.on_event is not None:
+            self.on_event(name)
+
+    def _on_retry(self, e: BaseException) -> None:
+        self.retried += 1
+        self.last_error = str(e)
+        self._event("retry")
+
+    def _call(self, fn: Callable[[], T], retries: Optional[int] = None) -> T:
+        try:
+            return with_retries(fn, self.retries if retries is None else retries,
+                                self.backoff_s, self.max_backoff_s, self._on_retry)
+        except Exception as e:
+            if not is_transient(e):
+                raise
+            # transitorio también en el último intento: el proveedor no está disponible
+            self.failed += 1
+            self.last_error = str(e)
+            raise TranscriptionUnavailable(f"AssemblyAI no disponible: {e}",
+                                           self.limiter.retry_after_s) from e
+
+    def _upload(self, audio: Any) -> str:
+        """ Las rutas y los bytes se reenvían enteros; un file-like sólo si se puede rebobinar. """
+        if not hasattr(audio, "read"):
+            return self._call(lambda: self._transcriber.upload_file(audio))
+        try:
+            pos = audio.tell() if audio.seekable() else None
+        except (AttributeError, OSError):
+            pos = None
+        if pos is None:
+            return self._call(lambda: self._transcriber.upload_file(audio), retries=0)
+
+        def upload() -> str:
+            audio.seek(pos)
+            return self._transcriber.upload_file(audio)
+        return self._call(upload)
+
+    def transcribe(self, audio: Any) -> aai.Transcript:
+        try:
+            with self.limiter.slot():
+                return self._transcribe(audio)
+        except TranscriptionUnavailable as e:
+            self._event(e.reason)
+            raise
+
+    def _transcribe(self, audio: Any) -> aai.Transcript:
+        url = self._upload(audio)
+        # el alta se reintenta sólo si no hubo respuesta o fue un rechazo transitorio;
+        # el sondeo reusa el mismo transcript_id
+        transcript = self._call(lambda: self._transcriber.submit(url))
+        try:
+            self._call(lambda: transcript.wait_for_completion(poll_timeout=self.poll_timeout_s))
+        except aai.TranscriptError:
+            if transcript.status not in PENDING_STATUS:
+                raise
+            self.failed += 1
+            raise TranscriptionUnavailable(
+                f"La transcripción {transcript.id} no terminó en {self.poll_timeout_s:g}s.",
+                self.limiter.retry_after_s, "poll_timeout")
+        return transcript
+
+    def stats(self) -> Dict[str, Any]:
+        return {"base_url": self.base_url, **self.limiter.stats(), "retries": self.retried,
+                "failed": self.failed, "last_error": self.last_error}
+
+    def close(self) -> None:
+        self._client.http_client.close()
@@ -0,0 +1,104 @@
+# -*- coding: utf-8 -*-
+"""
+Caché en disco de transcripciones, direccionada por el contenido del audio.
+
+Clave = sha256(bytes del audio + configuración de transcripción: modelo, idioma); el
+audio puede venir como bytes, ruta o file-like (se hashea por bloques, sin cargarlo).
+Cada entrada es un JSON {text, confidence, words, utterances} en el directorio de
+caché; el mtime del archivo marca el último uso y, al superar el tamaño máximo,
+se eliminan las entradas menos usadas recientemente (LRU).
+"""
+
+import os
+import json
+import hashlib
+import threading
+from pathlib import Path
+from typing import Any, BinaryIO, Dict, Optional, Union
+
+AudioSource = Union[bytes, bytearray, str, "os.PathLike[str]", BinaryIO]
+
+_HASH_CHUNK = 1 << 20
+
+class AudioCache:
+    def __init__(self, directory: Path, max_bytes: int = 512 << 20):
+        self.dir = Path(directory)
+        self.dir.mkdir(parents=True, exist_ok=True)
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._bytes = sum(p.stat().st_size for p in self.dir.glob("*.json"))
+        self.hits = self.misses = self.evictions = 0
+
+    @staticmethod
+    def key(audio: AudioSource, config_tag: str) -> str:
+        h = hashlib.sha256()
+        if isinstance(audio, (bytes, bytearray)):
+            h.update(audio)
+        elif isinstance(audio, (str, os.PathLike)):
+            with open(audio, "rb") as f:
+                for block in iter(lambda: f.read(_HASH_CHUNK), b""):
+                    h.update(block)
+        else:
+            pos = audio.tell()
+            for block in iter(lambda: audio.read(_HASH_CHUNK), b""):
+                h.update(block)
+            audio.seek(pos)  # el mismo objeto se sube después
+        h.update(b"\0" + config_tag.encode("utf-8"))
+        return h.hexdigest()
+
+    def _path(self, key: str) -> Path:
+        return self.dir / f"{key}.json"
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        p = self._path(key)
+        try:
+            data = json.loads(p.read_text(encoding="utf-8"))
+            os.utime(p)  # marca de uso para el LRU
+        except (OSError, ValueError):
+            with self._lock:
+                self.misses += 1
+            return None
+        with self._lock:
+            self.hits += 1
+        return data
+
+    def put(self, key: str, result: Dict[str, Any]) -> None:
+        p = self._path(key)
+        blob = json.dumps(result, ensure_ascii=False).encode("utf-8")
+        if len(blob) > self.max_bytes:
+            return
+        tmp = p.with_name(p.name + f".tmp{os.getpid()}.{threading.get_ident()}")
+        tmp.write_bytes(blob)
+        with self._lock:
+            old = p.stat().st_size if p.exists() else 0
+            os.replace(tmp, p)
+            self._bytes += len(blob) - old
+            if self._bytes > self.max_bytes:
+                self._evict()
+
+    def _evict(self) -> None:
+        entries = []
+        for q in self.dir.glob("*.json"):
+            try:
+                st = q.stat()
+            except OSError:
+                continue
+            entries.append((st.st_mtime, st.st_size, q))
+        entries.sort()
+        total = sum(e[1] for e in entries)
+        target = int(self.max_bytes * 0.9)
+        for _, size, q in entries:
+            if total <= target:
+                break
+            try:
+                q.unlink()
+                total -= size
+                self.evictions += 1
+            except OSError:
+                pass
+        self._bytes = total
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {"dir": str(self.dir), "bytes": self._bytes, "max_bytes": self.max_bytes,
+                    "hits": self.hits, "misses": self.misses, "evictions": self.evictions}
@@ -0,0 +1,586 @@
+# -*- coding: utf-8 -*-
+"""
+Benchmarks del pipeline catastral.
+
+Uso:
+  python benchmark.py fields [--rounds 2000]
+  python benchmark.py cleanup [--rounds 200] [--sizes 9,1000,10000]
+  python benchmark.py pipeline [--docs 500] [--seed 0] [--batch-sizes 1,32,256] [--modes full,rules-only,auto]
+                              [--out actual.json]
+  python benchmark.py compare base.json actual.json [--threshold 0.10]
+  python benchmark.py asr grabaciones/ [--backends assemblyai,local]
+  python benchmark.py startup [--workers 4] [--model ruta]
+  python benchmark.py ruler [--docs 300] [--model ruta]
+
+  fields  -> etapa normalizar+validar sobre todos los campos de LABEL_MAP:
+             field specs compiladas (build_fields) vs. las tablas de lambdas anteriores.
+  cleanup -> clean_text en una pasada (asr_cleanup) vs. una pasada regex por corrección,
+             con diccionarios de distinto tamaño.
+  pipeline -> corpus sintético (synthetic.py) por el pipeline completo: docs/s y
+             p50/p95/p99 por etapa y de punta a punta, documento a documento (process_text)
+             y en lote (process_texts) con cada tamaño de lote; además docs/s por modo de
+             extracción (full / rules-only / auto) y cuántos documentos de auto cayeron a
+             la pasada neuronal. Sin caché de resultados.
+  compare  -> contrasta dos resultados de `pipeline`; sale con código 1 si alguna
+             métrica empeora más que el umbral (menos docs/s o más latencia).
+  asr      -> los mismos audios por cada backend de transcripción (sin caché): segundos,
+             factor de tiempo real y, si junto al audio hay un .txt con la transcripción
+             de referencia, WER.
+  startup  -> arranque en frío, como gunicorn: el master hace fork de N workers y cada
+             uno atiende su primer documento. Perezoso (cada worker carga todo) vs.
+             precarga en el master (pipeline_catastral.preload); latencia del primer
+             request y RSS / PSS / USS por worker (/proc/<pid>/smaps_rollup, Linux).
+  ruler    -> tiempo por componente (tokenizer, cada pipe, limpieza y post-proceso) con
+             los patrones originales del entity_ruler vs. compilados (ruler_compiler.py),
+             y la fracción del pipeline que se lleva el ruler en modo full y rules-only.
+"""
+
+import os
+import re
+import sys
+import json
+import time
+import random
+import signal
+import argparse
+import platform
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import pipeline_catastral as pc
+from asr_cleanup import CleanupEngine, DEFAULT_CORRECTIONS
+from metrics import REGISTRY
+from result_cache import compute_fingerprint
+from synthetic import generate_corpus
+
+# ---------------------------------------------------------
+# Línea base: tablas NORMALIZERS/VALIDATORS previas (lambdas)
+# ---------------------------------------------------------
+def _legacy_tables() -> Tuple[Dict[str, Callable], Dict[str, Any]]:
+    digits = lambda x: re.sub(r"\D", "", x) if x else None
+    upper = lambda x: x.strip().upper() if x else None
+    title = lambda x: x.strip().title() if x else None
+    fecha = lambda x: re.sub(r"[^0-9/.-]", "", x) if x else None
+    medida = lambda x: float(re.sub(r"[^\d.]", "", x)) if re.sub(r"[^\d.]", "", x) else None
+    servicio = lambda x: True if str(x).strip().upper() in ["1", "SI", "SÍ"] else False
+    first = lambda x: pc.normalize_to_digits_first(x)
+    normalizers: Dict[str, Callable] = {
+        "DNI": digits, "NUMERO_DOCUMENTO": digits, "TELEFONO": digits,
+        "RUC": lambda x: re.sub(r"\D", "", x)[:11] if x else None,
+        "CORREO_ELECTRONICO": lambda x: x.strip().lower() if x else None,
+        "CODIGO_UNICO_CATASTRAL": lambda x: pc.extract_cuc(x) or (re.sub(r"\D", "", x)[:12] if x else None),
+        "CODIGO_CONTRIBUYENTE": digits, "CODIGO_PREDIAL": digits, "NUMERO_MUNICIPAL": digits,
+        "DEPARTAMENTO": upper, "PROVINCIA": upper, "DISTRITO": upper, "ZONA_SECTOR_ETAPA": upper,
+        "SUBLOTE": upper, "RAZON_SOCIAL": upper,
+        "NOMBRE_VIA": title, "NOMBRE_HABILITACION": title, "NOMBRES": title,
+        "APELLIDO_PATERNO": title, "APELLIDO_MATERNO": title,
+        "SECTOR": first, "MANZANA": first, "LOTE": first, "NUMERO_INTERIOR": first,
+        "FECHA_ADQUISICION": lambda x: pc.parse_fecha_es(x),
+        "FECHA_CONSTRUCCION": fecha, "OBRA_FECHA_CONSTRUCCION": fecha,
+        "MEP": lambda x: (
+            "CONCRETO" if re.search(r"\bconcreto\b", x, flags=re.I) else
+            "LADRILLO" if re.search(r"\bladrillo(s)?\b", x, flags=re.I) else
+            "MADERA"   if re.search(r"\bmadera\b", x, flags=re.I) else
+            "ADOBE"    if re.search(r"\badobe\b", x, flags=re.I) else
+            "QUINCHA"  if re.search(r"\bquincha\b", x, flags=re.I) else
+            pc._normalize_upper(x)
+        ),
+    }
+    for k in ("AREA_TERRENO_ADQUIRIDA", "AREA_TERRENO_VERIFICADA", "AREA_VERIFICADA",
+              "MEDIDA_FRENTE", "MEDIDA_DERECHA", "MEDIDA_IZQUIERDA", "MEDIDA_FONDO"):
+        normalizers[k] = medida
+    for k in ("LUZ", "AGUA", "TELEFONO", "DESAGUE", "GAS", "INTERNET", "TV"):
+        normalizers[f"SERVICIO_{k}"] = servicio
+    validators = {k: cf.pattern for k, cf in pc.COMPILED_FIELDS.items() if cf.pattern is not None}
+    return normalizers, validators
+
+def _legacy_normalize_validate(normalizers, validators, key: str, value: str):
+    fn = normalizers.get(key, lambda x: x.strip() if isinstance(x, str) else x)
+    try:
+        norm = fn(value or "")
+    except ValueError:
+        norm = None
+    n = norm or ""
+    if not n:
+        return norm, False
+    rx = validators.get(key)
+    if rx is None:
+        return norm, True
+    return norm, bool(rx.match(n if isinstance(n, str) else str(n)))
+
+# ----------------------------
+# Valores de ejemplo por campo
+# ----------------------------
+_SAMPLES = {
+    "NUMERO_DOCUMENTO": "dni 45, 67, 89, 12",
+    "NUMERO_RUC": "ruc 20123456789",
+    "TELEFONO": "teléfono 987 654 321",
+    "CORREO_ELECTRONICO": "  Juan.Perez@Correo.com ",
+    "CODIGO_UNICO_CATASTRAL": "código único catastral 12 34 56 78 90 12",
+    "CODIGO_CONTRIBUYENTE": "código de contribuyente 1234567",
+    "CODIGO_PREDIAL": "código predial 7654321",
+    "SECTOR": "sector 35", "MANZANA": "manzana 4", "LOTE": "lote 12",
+    "NUMERO_MUNICIPAL": "número 245", "NUMERO_INTERIOR": "interior 3",
+    "DEPARTAMENTO": "lima", "PROVINCIA": "lima", "DISTRITO": "san juan de lurigancho",
+    "NOMBRES": "maría elena", "APELLIDO_PATERNO": "quispe", "APELLIDO_MATERNO": "huamán",
+    "FECHA_ADQUISICION": "15 de junio del 2015",
+    "FECHA_CONSTRUCCION": "2010", "OBRA_FECHA_CONSTRUCCION": "03/2012",
+    "MEP": "muros de ladrillo con columnas de concreto",
+    "ZONIFICACION": "RDM",
+}
+
+def _sample_for(key: str) -> str:
+    if key in _SAMPLES:
+        return _SAMPLES[key]
+    if key.startswith(("AREA_", "MEDIDA_")):
+        return "120.50 metros"
+    if key.startswith("SERVICIO_"):
+        return "si"
+    return f"  valor de {key.lower()}  "
+
+def bench_fields(rounds: int) -> Dict[str, Any]:
+    keys = sorted(set(pc.LABEL_MAP.values()))
+    pairs = [(k, _sample_for(k)) for k in keys]
+    normalizers, validators = _legacy_tables()
+
+    # Comprobación de equivalencia antes de medir
+    mismatches = []
+    for k, v in pairs:
+        new = pc.normalize_field(k, v)
+        ok_new, _ = pc.validate_field(k, new or "")
+        old, ok_old = _legacy_normalize_validate(normalizers, validators, k, v)
+        if (new, ok_new) != (old, ok_old):
+            mismatches.append({"field": k, "value": v, "specs": [new, ok_new], "legacy": [old, ok_old]})
+
+    t0 = time.perf_counter()
+    for _ in range(rounds):
+        for k, v in pairs:
+            _legacy_normalize_validate(normalizers, validators, k, v)
+    legacy_s = time.perf_counter() - t0
+
+    specs, default = pc.COMPILED_FIELDS, pc._DEFAULT_COMPILED
+    t0 = time.perf_counter()
+    for _ in range(rounds):
+        for k, v in pairs:
+            cf = specs.get(k, default)
+            n = cf.normalize(v)
+            cf.validate(n or "")
+    specs_s = time.perf_counter() - t0
+
+    calls = rounds * len(pairs)
+    return {
+        "fields": len(pairs),
+        "rounds": rounds,
+        "legacy_us_per_field": legacy_s / calls * 1e6,
+        "specs_us_per_field": specs_s / calls * 1e6,
+        "speedup": legacy_s / specs_s if specs_s else None,
+        "mismatches": mismatches,
+    }
+
+# ---------------------------------
+# clean_text: una pasada vs. N regex
+# ---------------------------------
+_CLEANUP_TEXT = (
+    "El predio soviquado en la hablicación Los Jardines, código proedial 15, 000, 23, "
+    "titular con DNI 45, 67, 89, 12 pagó sus rantas; área del terreno 120, 50 metros.  "
+)
+
+def _legacy_cleaner(corrections: Dict[str, str]) -> Callable[[str], str]:
+    """ Una pasada regex por corrección, como hacía clean_text. """
+    rules = [(re.compile(rf"\b{re.escape(k)}\b", flags=re.IGNORECASE), v) for k, v in corrections.items()]
+    join, ws = re.compile(r"(?:(?<=\d)[\s,]+(?=\d))+"), re.compile(r"\s+")
+
+    def clean(raw: str) -> str:
+        s = join.sub("", raw)
+        for rx, v in rules:
+            s = rx.sub(v, s)
+        return ws.sub(" ", s).strip()
+    return clean
+
+def _synthetic_corrections(n: int) -> Dict[str, str]:
+    rnd = random.Random(n)
+    out = dict(DEFAULT_CORRECTIONS)
+    while len(out) < n:
+        w = "".join(rnd.choice("abcdefghijklmnopqrstuvwxyz") for _ in range(rnd.randint(5, 10)))
+        out[w] = w[::-1]
+    return out
+
+def bench_cleanup(rounds: int, sizes: List[int]) -> Dict[str, Any]:
+    text = _CLEANUP_TEXT * 20
+    rows = []
+    for n in sizes:
+        corr = _synthetic_corrections(n)
+        engine, legacy = CleanupEngine(corr), _legacy_cleaner(corr)
+        same = engine.clean(text) == legacy(text)
+        t0 = time.perf_counter()
+        for _ in range(rounds):
+            engine.clean(text)
+        eng_s = (time.perf_counter() - t0) / rounds
+        legacy_rounds = max(1, rounds // max(1, n // 100))
+        t0 = time.perf_counter()
+        for _ in range(legacy_rounds):
+            legacy(text)
+        leg_s = (time.perf_counter() - t0) / legacy_rounds
+        rows.append({"entries": len(corr), "same_output": same,
+                     "single_pass_ms": eng_s * 1e3, "regex_passes_ms": leg_s * 1e3,
+                     "speedup": leg_s / eng_s if eng_s else None})
+    return {"text_chars": len(text), "results": rows}
+
+# ------------------------------------------------
+# pipeline: etapas por documento y en lote + compare
+# ------------------------------------------------
+_STAGES = ("clean_text", "run_ner", "map_and_merge", "build_fields", "assemble_output", "total")
+
+def _percentiles(samples: List[float]) -> Dict[str, float]:
+    xs = sorted(samples)
+    if not xs:
+        return {"n": 0}
+    q = lambda p: xs[min(len(xs) - 1, int(round(p / 100 * (len(xs) - 1))))] * 1e3
+    return {"n": len(xs), "mean_ms": sum(xs) / len(xs) * 1e3, "p50_ms": q(50), "p95_ms": q(95), "p99_ms": q(99)}
+
+def _bench_single(texts: List[str]) -> Dict[str, Any]:
+    """ Misma secuencia que process_text (sin caché), cronometrando cada etapa. """
+    samples: Dict[str, List[float]] = {k: [] for k in _STAGES}
+    clock = time.perf_counter
+    t_all = clock()
+    for raw in texts:
+        t0 = clock()
+        cleaned = pc.clean_text(raw)
+        t1 = clock()
+        spans = pc.run_ner(cleaned)
+        t2 = clock()
+        por_campo, _ = pc.map_and_merge(spans)
+        t3 = clock()
+        fields = pc.build_fields(por_campo, full_text=cleaned)
+        t4 = clock()
+        pc.assemble_output(cleaned, spans, fields)
+        t5 = clock()
+        for k, v in zip(_STAGES, (t1 - t0, t2 - t1, t3 - t2, t4 - t3, t5 - t4, t5 - t0)):
+            samples[k].append(v)
+    elapsed = clock() - t_all
+    return {"docs": len(texts), "elapsed_s": elapsed, "docs_per_s": len(texts) / elapsed if elapsed else None,
+            "stages": {k: _percentiles(v) for k, v in samples.items()}}
+
+def _stage_means(snapshot: Dict[str, Any]) -> Dict[str, Dict[str, float]]:
+    """ Media por etapa (ms) a partir de las métricas acumuladas por process_texts. """
+    out = {}
+    for (stage,), (_, total, n) in sorted(snapshot.get("catastro_stage_seconds", {}).items()):
+        out[stage] = {"n": n, "mean_ms": total / n * 1e3 if n else 0.0}
+    return out
+
+def _bench_batch(texts: List[str], batch_size: int) -> Dict[str, Any]:
+    REGISTRY.drain()
+    latencies: List[float] = []
+    per_doc: List[float] = []
+    t_all = time.perf_counter()
+    for chunk in pc._chunked(texts, batch_size):
+        t0 = time.perf_counter()
+        for _ in pc.process_texts(chunk, batch_size=batch_size):
+            pass
+        dt = time.perf_counter() - t0
+        latencies.append(dt)
+        per_doc.extend([dt / len(chunk)] * len(chunk))
+    elapsed = time.perf_counter() - t_all
+    return {"batch_size": batch_size, "docs": len(texts), "elapsed_s": elapsed,
+            "docs_per_s": len(texts) / elapsed if elapsed else None,
+            "batch_latency": _percentiles(latencies), "amortized_doc_latency": _percentiles(per_doc),
+            "stages": _stage_means(REGISTRY.drain())}
+
+def _bench_modes(texts: List[str], modes: List[str], batch_size: int) -> List[Dict[str, Any]]:
+    rows = []
+    for mode in modes:
+        paths: Dict[str, int] = {}
+        t0 = time.perf_counter()
+        for r in pc.process_texts(texts, batch_size=batch_size, mode=mode):
+            p = (r.get("extraction") or {}).get("path", "error")
+            paths[p] = paths.get(p, 0) + 1
+        elapsed = time.perf_counter() - t0
+        rows.append({"mode": mode, "batch_size": batch_size, "docs": len(texts), "elapsed_s": elapsed,
+                     "docs_per_s": len(texts) / elapsed if elapsed else None, "paths": paths})
+    return rows
+
+def bench_pipeline(docs: int, seed: int, batch_sizes: List[int], noise: float, warmup: int,
+                   modes: Optional[List[str]] = None) -> Dict[str, Any]:
+    pc.RESULT_CACHE_ENABLED = False  # medir el pipeline, no la caché
+    texts = generate_corpus(docs, seed=seed, noise=noise)
+    for t in generate_corpus(warmup, seed=seed + 1, noise=noise):
+        pc.process_text(t)  # carga modelo, catálogo UBIGEO y resolver difuso
+    here = Path(__file__).parent
+    return {
+        "meta": {
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "model_path": pc.MODEL_PATH,
+            "fingerprint": compute_fingerprint(Path(pc.MODEL_PATH), [here / "pipeline_catastral.py",
+                                                                     here / "asr_cleanup.py"]),
+            "python": platform.python_version(),
+            "spacy": pc.spacy.__version__,
+            "machine": platform.machine(),
+            "cpus": os.cpu_count(),
+            "corpus": {"docs": docs, "seed": seed, "noise": noise,
+                       "mean_chars": sum(map(len, texts)) / len(texts) if texts else 0},
+        },
+        "single": _bench_single(texts),
+        "batch": [_bench_batch(texts, bs) for bs in batch_sizes],
+        "modes": _bench_modes(texts, modes or [], max(batch_sizes or [1])),
+    }
+
+def _comparable(res: Dict[str, Any]) -> Dict[str, Tuple[float, bool]]:
+    """ nombre -> (valor, mayor_es_mejor) """
+    out: Dict[str, Tuple[float, bool]] = {}
+    single = res.get("single") or {}
+    if single.get("docs_per_s"):
+        out["single.docs_per_s"] = (single["docs_per_s"], True)
+    for stage, st in (single.get("stages") or {}).items():
+        for p in ("p50_ms", "p95_ms", "p99_ms"):
+            if p in st:
+                out[f"single.{stage}.{p}"] = (st[p], False)
+    for b in res.get("batch") or []:
+        bs = b["batch_size"]
+        if b.get("docs_per_s"):
+            out[f"batch{bs}.docs_per_s"] = (b["docs_per_s"], True)
+        for p in ("p50_ms", "p95_ms", "p99_ms"):
+            if p in (b.get("batch_latency") or {}):
+                out[f"batch{bs}.latency.{p}"] = (b["batch_latency"][p], False)
+    for m in res.get("modes") or []:
+        if m.get("docs_per_s"):
+            out[f"mode.{m['mode']}.docs_per_s"] = (m["docs_per_s"], True)
+    return out
+
+def compare_results(base: Dict[str, Any], current: Dict[str, Any], threshold: float,
+                    min_ms: float = 0.5) -> Dict[str, Any]:
+    a, b = _comparable(base), _comparable(current)
+    rows, regressions = [], []
+    for name in sorted(set(a) & set(b)):
+        (va, higher_better), (vb, _) = a[name], b[name]
+        if not higher_better and max(va, vb) < min_ms:
+            continue  # latencias ínfimas: puro ruido
+        change = (vb - va) / va if va else 0.0
+        worse = -change if higher_better else change
+        row = {"metric": name, "baseline": va, "current": vb, "change": change, "regression": worse > threshold}
+        rows.append(row)
+        if row["regression"]:
+            regressions.append(name)
+    warn = []
+    if base.get("meta", {}).get("corpus") != current.get("meta", {}).get("corpus"):
+        warn.append("corpus distinto entre base y actual: la comparación no es directa")
+    return {"threshold": threshold, "regressions": regressions, "warnings": warn, "rows": rows}
+
+# ------------------------------------
+# Backends de transcripción (asr)
+# ------------------------------------
+_AUDIO_EXT = {".wav", ".mp3", ".m4a", ".ogg", ".flac", ".webm", ".aac"}
+
+def _word_error_rate(ref: str, hyp: str) -> float:
+    r, h = ref.lower().split(), hyp.lower().split()
+    prev = list(range(len(h) + 1))
+    for i, rw in enumerate(r, 1):
+        cur = [i] + [0] * len(h)
+        for j, hw in enumerate(h, 1):
+            cur[j] = min(prev[j] + 1, cur[j - 1] + 1, prev[j - 1] + (rw != hw))
+        prev = cur
+    return prev[-1] / len(r) if r else float(bool(h))
+
+def bench_asr(paths: List[Path], backends: List[str]) -> Dict[str, Any]:
+    import transcriber
+    transcriber.AUDIO_CACHE_ENABLED = False  # medir el backend, no la caché
+    files: List[Path] = []
+    for p in paths:
+        files.extend(sorted(q for q in p.rglob("*") if q.suffix.lower() in _AUDIO_EXT) if p.is_dir() else [p])
+    rows = []
+    for name in backends:
+        secs, rtfs, wers, errors = [], [], [], []
+        for f in files:
+            try:
+                t = transcriber.transcribe_audio(f, backend=name)
+            except Exception as e:
+                errors.append(f"{f.name}: {e}")
+                continue
+            secs.append(t["timing"]["seconds"])
+            if t["timing"]["real_time_factor"] is not None:
+                rtfs.append(t["timing"]["real_time_factor"])
+            ref = f.with_suffix(".txt")
+            if ref.exists():
+                wers.append(_word_error_rate(ref.read_text(encoding="utf-8"), t.get("text") or ""))
+        rows.append({
+            "backend": name, "files": len(files), "ok": len(secs), "errors": errors[:5],
+            "latency": _percentiles(secs),
+            "total_s": round(sum(secs), 3),
+            "mean_real_time_factor": round(sum(rtfs) / len(rtfs), 3) if rtfs else None,
+            "mean_wer": round(sum(wers) / len(wers), 4) if wers else None,
+        })
+    return {"files": [str(f) for f in files], "backends": rows}
+
+def _mem_mb(pid: int) -> Dict[str, float]:
+    """ RSS, PSS (RSS repartiendo las páginas compartidas) y USS (privadas) en MB. """
+    kb: Dict[str, int] = {}
+    with open(f"/proc/{pid}/smaps_rollup", encoding="ascii") as f:
+        for line in f:
+            parts = line.split()
+            if len(parts) >= 2 and parts[1].isdigit():
+                kb[parts[0].rstrip(":")] = int(parts[1])
+    uss = kb.get("Private_Clean", 0) + kb.get("Private_Dirty", 0)
+    return {"rss_mb": round(kb.get("Rss", 0) / 1024, 1), "pss_mb": round(kb.get("Pss", 0) / 1024, 1),
+            "uss_mb": round(uss / 1024, 1)}
+
+def _startup_variant(preload: bool, workers: int, warmup: int) -> Dict[str, Any]:
+    """ Un arranque: (precarga opcional en el master) + fork de `workers` + primer documento en cada uno. """
+    pc.RESULT_CACHE_ENABLED = False
+    doc = generate_corpus(1, seed=123)[0]
+    t0 = time.perf_counter()
+    master = pc.preload(warmup) if preload else None
+    master_s = time.perf_counter() - t0
+    children = []
+    for _ in range(workers):
+        r, w = os.pipe()  # hijo -> padre: latencia del primer documento
+        pid = os.fork()
+        if pid == 0:
+            os.close(r)
+            t = time.perf_counter()
+            pc.process_text(doc)
+            os.write(w, f"{time.perf_counter() - t:.6f}".encode())
+            os.close(w)
+            signal.pause()  # vivo hasta que el padre mida su memoria
+            os._exit(0)
+        os.close(w)
+        children.append((pid, r))
+    rows = []
+    for pid, r in children:
+        first_s = float(os.read(r, 64).decode())
+        os.close(r)
+        rows.append({"first_request_ms": round(first_s * 1e3, 1), **_mem_mb(pid)})
+    for pid, _ in children:
+        os.kill(pid, signal.SIGKILL)
+        os.waitpid(pid, 0)
+    keys = ("first_request_ms", "rss_mb", "pss_mb", "uss_mb")
+    return {"variant": "preload" if preload else "lazy", "master_preload_s": round(master_s, 3),
+            "master": {**_mem_mb(os.getpid()), **(master or {})}, "workers": rows,
+            "mean": {k: round(sum(x[k] for x in rows) / len(rows), 1) for k in keys}}
+
+def bench_startup(workers: int, warmup: int, model: Optional[str] = None) -> Dict[str, Any]:
+    """ Cada variante en un intérprete nuevo (arranque realmente en frío). """
+    import subprocess
+    out = []
+    for variant in ("lazy", "preload"):
+        cmd = [sys.executable, __file__, "startup", "--variant", variant,
+               "--workers", str(workers), "--warmup", str(warmup)] + (["--model", model] if model else [])
+        t0 = time.perf_counter()
+        res = subprocess.run(cmd, capture_output=True, text=True, check=True)
+        row = json.loads(res.stdout)
+        row["process_s"] = round(time.perf_counter() - t0, 3)  # import + (precarga) + workers
+        out.append(row)
+    return {"workers": workers, "warmup_docs": warmup, "variants": out}
+
+def _component_seconds(nlp, texts: List[str], ruler: str) -> Dict[str, float]:
+    """ Segundos acumulados por componente, documento a documento (como process_text, sin caché). """
+    clock = time.perf_counter
+    secs = {"clean_text": 0.0, "tokenizer": 0.0, **{name: 0.0 for name in nlp.pipe_names}, "post": 0.0}
+    for raw in texts:
+        t0 = clock()
+        cleaned = pc.clean_text(raw)
+        t1 = clock()
+        doc = nlp.make_doc(cleaned)
+        secs["clean_text"] += t1 - t0
+        secs["tokenizer"] += clock() - t1
+        for name, proc in nlp.pipeline:
+            t0 = clock()
+            doc = proc(doc)
+            secs[name] += clock() - t0
+        t0 = clock()
+        spans = pc._doc_to_spans(doc)
+        por_campo, _ = pc.map_and_merge(spans)
+        pc.assemble_output(cleaned, spans, pc.build_fields(por_campo, full_text=cleaned))
+        secs["post"] += clock() - t0
+    return secs
+
+def bench_ruler(docs: int, seed: int, model: Optional[str] = None, ruler: str = "entity_ruler") -> Dict[str, Any]:
+    import spacy
+    from ruler_compiler import compile_ruler
+    texts = generate_corpus(docs, seed=seed)
+    rows = []
+    for variant in ("original", "compiled"):
+        nlp = spacy.load(model or pc.MODEL_PATH)
+        stats = compile_ruler(nlp, ruler) if variant == "compiled" else None
+        _component_seconds(nlp, texts[:20], ruler)  # calentamiento
+        secs = _component_seconds(nlp, texts, ruler)
+        neural = set(pc.neural_pipes(nlp))
+        total = sum(secs.values())
+        rules_only = sum(v for k, v in secs.items() if k not in neural)
+        rows.append({
+            "variant": variant, "compile": stats, "docs_per_s": round(docs / total, 1) if total else None,
+            "ms_per_doc": {k: round(v / docs * 1e3, 3) for k, v in secs.items()},
+            "ruler_share": {"full": round(secs[ruler] / total, 3) if total else None,
+                            "rules-only": round(secs[ruler] / rules_only, 3) if rules_only else None},
+        })
+    before, after = (r["ms_per_doc"][ruler] for r in rows)
+    return {"docs": docs, "variants": rows, "ruler_speedup": round(before / after, 2) if after else None}
+
+def main(argv: List[str]) -> int:
+    p = argparse.ArgumentParser(description="Benchmarks Pipeline Catastral")
+    sub = p.add_subparsers(dest="cmd", required=True)
+    f = sub.add_parser("fields", help="normalizar+validar: field specs vs lambdas previas")
+    f.add_argument("--rounds", type=int, default=2000)
+    c = sub.add_parser("cleanup", help="clean_text: una pasada vs. una regex por corrección")
+    c.add_argument("--rounds", type=int, default=200)
+    c.add_argument("--sizes", default="9,1000,10000", help="tamaños de diccionario separados por coma")
+    pp = sub.add_parser("pipeline", help="corpus sintético por el pipeline completo (docs/s y percentiles)")
+    pp.add_argument("--docs", type=int, default=500)
+    pp.add_argument("--seed", type=int, default=0)
+    pp.add_argument("--noise", type=float, default=0.3, help="probabilidad de ruido ASR por frase (0..1)")
+    pp.add_argument("--batch-sizes", default="1,32,256", help="tamaños de lote para process_texts")
+    pp.add_argument("--warmup", type=int, default=20)
+    pp.add_argument("--modes", default="full,rules-only,auto", help="modos de extracción a comparar ('' = ninguno)")
+    pp.add_argument("--model", help="ruta del modelo spaCy (por defecto MODEL_PATH)")
+    pp.add_argument("--out", help="además de imprimir, guardar el JSON en este archivo")
+    cm = sub.add_parser("compare", help="detecta regresiones entre dos resultados de `pipeline`")
+    cm.add_argument("baseline")
+    cm.add_argument("current")
+    cm.add_argument("--threshold", type=float, default=0.10, help="empeoramiento relativo tolerado (0.10 = 10%%)")
+    cm.add_argument("--min-ms", type=float, default=0.5, help="ignorar latencias por debajo de este valor (ruido)")
+    a = sub.add_parser("asr", help="compara backends de transcripción sobre los mismos audios")
+    a.add_argument("paths", nargs="+", help="archivos de audio o directorios")
+    a.add_argument("--backends", default="assemblyai,local", help="backends separados por coma")
+    st = sub.add_parser("startup", help="arranque en frío: perezoso vs. precarga en el master (Linux)")
+    st.add_argument("--workers", type=int, default=4)
+    st.add_argument("--warmup", type=int, default=16, help="documentos del lote de calentamiento")
+    st.add_argument("--model", help="ruta del modelo spaCy (por defecto MODEL_PATH)")
+    st.add_argument("--variant", choices=("lazy", "preload"), help=argparse.SUPPRESS)
+    r = sub.add_parser("ruler", help="entity_ruler con patrones originales vs. compilados (ruler_compiler.py)")
+    r.add_argument("--docs", type=int, default=300)
+    r.add_argument("--seed", type=int, default=0)
+    r.add_argument("--model", help="ruta del modelo spaCy (por defecto MODEL_PATH)")
+    args = p.parse_args(argv)
+
+    if args.cmd == "fields":
+        res = bench_fields(args.rounds)
+    elif args.cmd == "cleanup":
+        res = bench_cleanup(args.rounds, [int(x) for x in args.sizes.split(",") if x])
+    elif args.cmd == "pipeline":
+        if args.model:
+            pc.MODEL_PATH = args.model
+        res = bench_pipeline(args.docs, args.seed, [int(x) for x in args.batch_sizes.split(",") if x],
+                             args.noise, args.warmup, [m for m in args.modes.split(",") if m])
+        if args.out:
+            Path(args.out).write_text(json.dumps(res, ensure_ascii=False, indent=2), encoding="utf-8")
+    elif args.cmd == "startup":
+        if args.model:
+            pc.MODEL_PATH = args.model
+        if args.variant:
+            res = _startup_variant(args.variant == "preload", args.workers, args.warmup)
+            print(json.dumps(res, ensure_ascii=False))
+            return 0
+        res = bench_startup(args.workers, args.warmup, args.model)
+    elif args.cmd == "ruler":
+        res = bench_ruler(args.docs, args.seed, args.model)
+    elif args.cmd == "asr":
+        res = bench_asr([Path(x) for x in args.paths], [x for x in args.backends.split(",") if x])
+    else:
+        base = json.loads(Path(args.baseline).read_text(encoding="utf-8"))
+        cur = json.loads(Path(args.current).read_text(encoding="utf-8"))
+        res = compare_results(base, cur, args.threshold, min_ms=args.min_ms)
+        print(json.dumps(res, ensure_ascii=False, indent=2))
+        return 1 if res["regressions"] else 0
+    print(json.dumps(res, ensure_ascii=False, indent=2))
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,174 @@
+# -*- coding: utf-8 -*-
+"""
+Procesamiento masivo en streaming (backfills de transcripciones archivadas).
+
+Entrada : archivo NDJSON ({"id": ..., "text": ...} por línea) o directorio de .txt
+Salida  : NDJSON incremental, una línea {"id": ..., "result": {...}} por registro,
+          en el mismo orden de la entrada
+Reanudar: el checkpoint guarda cuántos registros de entrada ya están escritos y el
+          tamaño de la salida en ese punto; al reanudar se trunca la salida a ese
+          tamaño (descarta una ventana a medio escribir) y se saltan esos registros.
+
+La memoria es constante: se leen y procesan ventanas de `window` registros, con a lo
+sumo una ventana en proceso mientras se escribe la anterior.
+"""
+
+import os
+import json
+import time
+from pathlib import Path
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+Record = Tuple[str, Optional[str], Optional[str]]  # (id, texto, error de lectura)
+
+# -------
+# Entrada
+# -------
+def iter_ndjson_lines(lines: Iterable[str], text_field: str = "text", id_field: str = "id") -> Iterator[Record]:
+    for lineno, line in enumerate(lines, 1):
+        if not line.strip():
+            continue
+        try:
+            obj = json.loads(line)
+        except ValueError as e:
+            yield str(lineno), None, f"JSON inválido en línea {lineno}: {e}"
+            continue
+        if not isinstance(obj, dict):
+            yield str(lineno), None, f"Línea {lineno}: se esperaba un objeto JSON"
+            continue
+        rid = str(obj.get(id_field, lineno))
+        text = obj.get(text_field)
+        if not isinstance(text, str):
+            yield rid, None, f"Falta el campo de texto '{text_field}'"
+            continue
+        yield rid, text, None
+
+def iter_ndjson(path: Path, text_field: str = "text", id_field: str = "id") -> Iterator[Record]:
+    with Path(path).open("r", encoding="utf-8", errors="ignore") as f:
+        yield from iter_ndjson_lines(f, text_field=text_field, id_field=id_field)
+
+def iter_txt_dir(path: Path) -> Iterator[Record]:
+    """ .txt del directorio (recursivo), en orden estable por ruta relativa. """
+    root = Path(path)
+    for p in sorted(root.rglob("*.txt")):
+        rid = p.relative_to(root).as_posix()
+        try:
+            yield rid, p.read_text(encoding="utf-8", errors="ignore"), None
+        except OSError as e:
+            yield rid, None, str(e)
+
+def iter_input(path: Path, text_field: str = "text", id_field: str = "id") -> Iterator[Record]:
+    path = Path(path)
+    if path.is_dir():
+        return iter_txt_dir(path)
+    return iter_ndjson(path, text_field=text_field, id_field=id_field)
+
+# ----------
+# Checkpoint
+# ----------
+class Checkpoint:
+    def __init__(self, path: Path, source: Path):
+        self.path = Path(path)
+        self.source = str(Path(source).resolve())
+        self.done = 0
+        self.output_bytes = 0
+
+    def load(self) -> "Checkpoint":
+        if not self.path.exists():
+            return self
+        data = json.loads(self.path.read_text(encoding="utf-8"))
+        if data.get("source") != self.source:
+            raise RuntimeError(f"El checkpoint {self.path} corresponde a otra entrada: {data.get('source')}")
+        self.done = int(data["done"])
+        self.output_bytes = int(data["output_bytes"])
+        return self
+
+    def save(self) -> None:
+        tmp = self.path.with_name(self.path.name + ".tmp")
+        tmp.write_text(json.dumps({"source": self.source, "done": self.done,
+                                   "output_bytes": self.output_bytes, "updated": time.time()}),
+                       encoding="utf-8")
+        os.replace(tmp, self.path)
+
+# ----------
+# Ejecución
+# ----------
+def _windows(records: Iterator[Record], size: int) -> Iterator[List[Record]]:
+    buf: List[Record] = []
+    for r in records:
+        buf.append(r)
+        if len(buf) >= size:
+            yield buf
+            buf = []
+    if buf:
+        yield buf
+
+def _process_window(extract_batch: Callable[[List[str]], List[Dict[str, Any]]],
+                    window: List[Record]) -> List[Dict[str, Any]]:
+    idx = [i for i, (_, text, err) in enumerate(window) if err is None]
+    results = extract_batch([window[i][1] for i in idx]) if idx else []
+    by_idx = dict(zip(idx, results))
+    return [by_idx[i] if i in by_idx else {"error": window[i][2]} for i in range(len(window))]
+
+def iter_results(records: Iterable[Record], extract_batch: Callable[[List[str]], List[Dict[str, Any]]],
+                 window: int = 1000) -> Iterator[Tuple[str, Dict[str, Any]]]:
+    """ (id, resultado) por registro, en orden, procesando de a `window` (sin checkpoint; p. ej. exportación). """
+    for w in _windows(iter(records), window):
+        for (rid, _, _), res in zip(w, _process_window(extract_batch, w)):
+            yield rid, res
+
+def run_bulk(records: Iterator[Record], output: Path, extract_batch: Callable[[List[str]], List[Dict[str, Any]]],
+             checkpoint: Checkpoint, window: int = 1000,
+             progress: Optional[Callable[[Dict[str, Any]], None]] = None) -> Dict[str, Any]:
+    """
+    Procesa `records` con `extract_batch` (lista de textos -> lista de resultados, mismo
+    orden) y escribe NDJSON en `output`, reanudando desde `checkpoint`.
+    """
+    output = Path(output)
+    checkpoint.load()
+    skip = checkpoint.done
+    records = iter(records)
+    for _ in range(skip):
+        if next(records, None) is None:
+            break
+    if skip and not output.exists():
+        raise RuntimeError(f"El checkpoint indica {skip} registros hechos pero falta la salida {output}")
+    stats = {"resumed_from": skip, "processed": 0, "failed": 0}
+    t0 = time.perf_counter()
+    mode = "r+b" if skip else "wb"
+    with output.open(mode) as out, ThreadPoolExecutor(max_workers=1) as ex:
+        out.truncate(checkpoint.output_bytes if skip else 0)
+        out.seek(0, os.SEEK_END)
+        pending = deque()
+        wins = _windows(records, window)
+
+        def submit_next() -> None:
+            w = next(wins, None)
+            if w is not None:
+                pending.append((w, ex.submit(_process_window, extract_batch, w)))
+
+        submit_next()
+        while pending:
+            w, fut = pending.popleft()
+            submit_next()  # la siguiente ventana se procesa mientras se escribe esta
+            results = fut.result()
+            for (rid, _, _), res in zip(w, results):
+                if "error" in res:
+                    stats["failed"] += 1
+                out.write(json.dumps({"id": rid, "result": res}, ensure_ascii=False).encode("utf-8"))
+                out.write(b"\n")
+            out.flush()
+            os.fsync(out.fileno())
+            checkpoint.done += len(w)
+            checkpoint.output_bytes = out.tell()
+            checkpoint.save()
+            stats["processed"] += len(w)
+            if progress is not None:
+                elapsed = time.perf_counter() - t0
+                progress({**stats, "done": checkpoint.done, "elapsed_s": round(elapsed, 2),
+                          "docs_per_s": round(stats["processed"] / elapsed, 1) if elapsed else 0.0})
+    stats["done"] = checkpoint.done
+    stats["elapsed_s"] = round(time.perf_counter() - t0, 3)
+    return stats
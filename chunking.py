@@ -0,0 +1,89 @@
+# -*- coding: utf-8 -*-
+"""
+Segmentación de transcripciones largas en ventanas solapadas para el NER.
+
+- plan_windows(): ventanas de hasta `max_chars` caracteres que empiezan y terminan en
+  límites de oración/enunciado (". ", "? ", "; ", saltos de línea); consecutivas se
+  solapan al menos `overlap` caracteres para que una entidad cortada en el borde de una
+  ventana aparezca entera en la siguiente.
+- merge_spans(): lleva los spans de cada ventana a offsets globales y resuelve el
+  solapamiento: ante spans en conflicto gana el que está más lejos del borde de su
+  ventana (el menos expuesto a quedar truncado); los duplicados exactos se colapsan.
+
+Un texto que entra en una sola ventana produce [(0, len(text))] y sus spans no se tocan.
+"""
+
+import re
+from bisect import bisect_right
+from typing import Any, List, Sequence, Tuple
+
+# Posición donde empieza una nueva oración / enunciado
+_BOUNDARY_RX = re.compile(r"(?<=[.!?;])\s+|\n\s*")
+_WS_RX = re.compile(r"\s+")
+
+def sentence_starts(text: str) -> List[int]:
+    """ Posiciones donde empieza una oración/enunciado (después de . ! ? ; o salto de línea). """
+    return [m.end() for m in _BOUNDARY_RX.finditer(text)]
+
+def _ws_cut(text: str, pos: int, lo: int) -> int:
+    """ Último inicio de palabra en (lo, pos]; si no hay, pos. """
+    pos = min(pos, len(text))
+    k = text.rfind(" ", lo + 1, pos)
+    return k + 1 if k >= 0 else pos
+
+def plan_windows(text: str, max_chars: int, overlap: int) -> List[Tuple[int, int]]:
+    n = len(text)
+    if n <= max_chars:
+        return [(0, n)]
+    overlap = max(0, min(overlap, max_chars // 2))
+    cuts = sentence_starts(text)
+    windows: List[Tuple[int, int]] = []
+    start = 0
+    while True:
+        limit = start + max_chars
+        if limit >= n:
+            windows.append((start, n))
+            return windows
+        # fin: último límite de oración que deja la ventana al menos a medio llenar
+        i = bisect_right(cuts, limit) - 1
+        end = cuts[i] if i >= 0 and cuts[i] - start >= max_chars // 2 else _ws_cut(text, limit, start)
+        windows.append((start, end))
+        # inicio siguiente: último límite de oración que garantiza el solapamiento
+        j = bisect_right(cuts, end - overlap) - 1
+        nxt = cuts[j] if j >= 0 and cuts[j] > start else _ws_cut(text, end - overlap, start)
+        start = nxt if start < nxt < end else end
+
+def merge_spans(windows: Sequence[Tuple[int, int]], per_window: Sequence[Sequence[Any]],
+                doc_len: int) -> List[Any]:
+    """
+    `per_window[i]` son los spans (con .start/.end relativos a la ventana i). Devuelve los
+    spans con offsets globales (se mutan .start/.end), sin conflictos y ordenados.
+    """
+    if len(windows) == 1:
+        return list(per_window[0])
+    cands = []
+    for (ws, we), spans in zip(windows, per_window):
+        for sp in spans:
+            sp.start += ws
+            sp.end += ws
+            left = sp.start - ws if ws > 0 else doc_len
+            right = we - sp.end if we < doc_len else doc_len
+            cands.append((min(left, right), sp))
+    cands.sort(key=lambda t: (-t[0], t[1].start, t[1].end))
+    taken: List[Tuple[int, int]] = []
+    seen = set()
+    kept = []
+    for _, sp in cands:
+        key = (sp.label, sp.start, sp.end)
+        if key in seen:
+            continue
+        k = bisect_right(taken, (sp.start, float("inf")))
+        if k > 0 and taken[k - 1][1] > sp.start:
+            continue
+        if k < len(taken) and taken[k][0] < sp.end:
+            continue
+        taken.insert(k, (sp.start, sp.end))
+        seen.add(key)
+        kept.append(sp)
+    kept.sort(key=lambda s: (s.start, s.end))
+    return kept
@@ -0,0 +1,249 @@
+# -*- coding: utf-8 -*-
+"""
+Exportación masiva de fichas: una fila por ficha, columnas estables.
+
+Formatos:
+  xlsx    : openpyxl en modo write-only (las filas se vuelcan a disco al agregarlas)
+  csv     : UTF-8 con BOM (Excel lo abre con tildes correctas)
+  parquet : columnar para análisis (requiere `pip install pyarrow`), por row groups
+
+Columnas: "id", luego un campo estándar por columna (valores de LABEL_MAP, en su
+orden, más los derivados: UBIGEO, FECHA_CONSTRUCCION), y al final "errores"
+(campo: error; ...) y "error" (fallo del documento completo). Los campos fuera de
+esa lista no se exportan, así el esquema no depende del lote.
+
+La memoria es acotada: las filas se escriben a medida que llegan (parquet guarda a
+lo sumo un row group), sin armar la tabla completa.
+
+CLI:
+  python export.py convert resultados.ndjson fichas.xlsx   (salida de --input/--output)
+  python export.py extract entrada.ndjson fichas.csv [--mode auto] [--workers 4]
+"""
+
+import io
+import csv
+import sys
+import json
+import argparse
+from pathlib import Path
+from typing import Any, Dict, Iterable, Iterator, List, Mapping, Optional, Sequence, Tuple
+
+FORMATS = ("xlsx", "csv", "parquet")
+MEDIA_TYPES = {
+    "xlsx": "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+    "csv": "text/csv; charset=utf-8",
+    "parquet": "application/vnd.apache.parquet",
+}
+DERIVED_FIELDS = ("UBIGEO", "FECHA_CONSTRUCCION")  # los arma build_fields, no vienen del modelo
+
+_XLSX_MAX_CELL = 32767  # límite de caracteres por celda de Excel
+
+Row = Tuple[str, Mapping[str, Any]]  # (id, resultado de process_text)
+
+def columns_from_label_map(label_map: Mapping[str, str], extra: Sequence[str] = DERIVED_FIELDS) -> List[str]:
+    """ Campos estándar sin repetir, en el orden de LABEL_MAP, más los derivados. """
+    return list(dict.fromkeys([*label_map.values(), *extra]))
+
+def result_to_row(rid: str, result: Mapping[str, Any], columns: Sequence[str]) -> List[Any]:
+    """ Acepta cualquier perfil de respuesta: el campo puede ser {normalized, ...} o el valor directo. """
+    if "error" in result:
+        return [rid, *([None] * len(columns)), None, result["error"]]
+    fields = result.get("fields") or {}
+    values, errors = [], []
+    for col in columns:
+        f = fields.get(col)
+        if isinstance(f, dict):
+            values.append(f.get("normalized"))
+            if f.get("errors"):
+                errors.append(f"{col}: {', '.join(map(str, f['errors']))}")
+        else:
+            values.append(f)
+    return [rid, *values, "; ".join(errors) or None, None]
+
+def header(columns: Sequence[str]) -> List[str]:
+    return ["id", *columns, "errores", "error"]
+
+# -----------
+# Escritores
+# -----------
+class CsvRowWriter:
+    def __init__(self, path: Path, columns: Sequence[str]):
+        self._f = open(path, "w", encoding="utf-8-sig", newline="")
+        self._w = csv.writer(self._f)
+        self._w.writerow(header(columns))
+
+    def write(self, row: List[Any]) -> None:
+        self._w.writerow(row)
+
+    def close(self) -> None:
+        self._f.close()
+
+class XlsxRowWriter:
+    def __init__(self, path: Path, columns: Sequence[str]):
+        try:
+            import openpyxl  # pip install openpyxl
+            from openpyxl.cell.cell import ILLEGAL_CHARACTERS_RE
+        except ImportError:
+            raise RuntimeError("La exportación a Excel requiere openpyxl (pip install openpyxl).")
+        self._illegal = ILLEGAL_CHARACTERS_RE
+        self.path = path
+        self._wb = openpyxl.Workbook(write_only=True)
+        self._ws = self._wb.create_sheet("fichas")
+        self._ws.freeze_panes = "B2"
+        self._ws.append(header(columns))
+
+    def _cell(self, v: Any) -> Any:
+        if isinstance(v, str):
+            return self._illegal.sub("", v)[:_XLSX_MAX_CELL]
+        if v is None or isinstance(v, (int, float, bool)):
+            return v
+        return str(v)
+
+    def write(self, row: List[Any]) -> None:
+        self._ws.append([self._cell(v) for v in row])
+
+    def close(self) -> None:
+        self._wb.save(self.path)
+
+class ParquetRowWriter:
+    """ Todas las columnas como texto (los tipos normalizados varían por campo y por ficha). """
+
+    def __init__(self, path: Path, columns: Sequence[str], row_group: int = 10000):
+        try:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+        except ImportError:
+            raise RuntimeError("La exportación a Parquet requiere pyarrow (pip install pyarrow).")
+        self._pa = pa
+        self._names = header(columns)
+        self._schema = pa.schema([(n, pa.string()) for n in self._names])
+        self._writer = pq.ParquetWriter(str(path), self._schema, compression="zstd")
+        self._row_group = max(1, row_group)
+        self._cols: List[List[Optional[str]]] = [[] for _ in self._names]
+
+    def _flush(self) -> None:
+        if self._cols[0]:
+            self._writer.write_table(self._pa.Table.from_arrays(
+                [self._pa.array(c, type=self._pa.string()) for c in self._cols], schema=self._schema))
+            self._cols = [[] for _ in self._names]
+
+    def write(self, row: List[Any]) -> None:
+        for col, v in zip(self._cols, row):
+            col.append(None if v is None else str(v))
+        if len(self._cols[0]) >= self._row_group:
+            self._flush()
+
+    def close(self) -> None:
+        self._flush()
+        self._writer.close()
+
+_WRITERS = {"csv": CsvRowWriter, "xlsx": XlsxRowWriter, "parquet": ParquetRowWriter}
+
+def resolve_format(fmt: Optional[str] = None, path: Optional[Path] = None) -> str:
+    """ Formato explícito o por extensión de `path`; ValueError si no se reconoce. """
+    f = (fmt or (Path(path).suffix.lstrip(".") if path else "") or "").lower()
+    if f not in FORMATS:
+        raise ValueError(f"Formato de exportación desconocido: '{fmt or f}' (usa {', '.join(FORMATS)})")
+    return f
+
+def export_rows(rows: Iterable[Row], path: Path, columns: Sequence[str], fmt: Optional[str] = None) -> Dict[str, Any]:
+    """ Escribe las fichas a `path` a medida que llegan. Si falla, no deja un archivo a medias. """
+    path = Path(path)
+    fmt = resolve_format(fmt, path)
+    writer = _WRITERS[fmt](path, columns)
+    stats = {"format": fmt, "rows": 0, "failed": 0}
+    try:
+        for rid, result in rows:
+            if "error" in result:
+                stats["failed"] += 1
+            writer.write(result_to_row(rid, result, columns))
+            stats["rows"] += 1
+        writer.close()
+    except BaseException:
+        path.unlink(missing_ok=True)
+        raise
+    return stats
+
+def iter_csv_chunks(rows: Iterable[Row], columns: Sequence[str], flush_rows: int = 500) -> Iterator[bytes]:
+    """ CSV en bloques de bytes, para responder en streaming sin archivo intermedio. """
+    buf = io.StringIO()
+    w = csv.writer(buf)
+    buf.write("\ufeff")  # BOM, igual que CsvRowWriter
+    w.writerow(header(columns))
+    n = 0
+    for rid, result in rows:
+        w.writerow(result_to_row(rid, result, columns))
+        n += 1
+        if n % flush_rows == 0:
+            yield buf.getvalue().encode("utf-8")
+            buf.seek(0)
+            buf.truncate()
+    if buf.tell():
+        yield buf.getvalue().encode("utf-8")
+
+def iter_results_ndjson(path: Path) -> Iterator[Row]:
+    """ Lee la salida del modo masivo ({"id", "result"} por línea) sin cargarla entera. """
+    with Path(path).open("r", encoding="utf-8") as f:
+        for lineno, line in enumerate(f, 1):
+            if not line.strip():
+                continue
+            try:
+                obj = json.loads(line)
+            except ValueError as e:
+                yield str(lineno), {"error": f"JSON inválido en línea {lineno}: {e}"}
+                continue
+            yield str(obj.get("id", lineno)), obj.get("result") or {"error": "Registro sin 'result'"}
+
+# ----
+# CLI
+# ----
+def main(argv) -> int:
+    import pipeline_catastral as pc
+    from bulk import iter_input, iter_results
+
+    p = argparse.ArgumentParser(description="Exportación de fichas a Excel / CSV / Parquet")
+    sub = p.add_subparsers(dest="cmd", required=True)
+    c = sub.add_parser("convert", help="convierte la salida NDJSON del modo masivo")
+    c.add_argument("input")
+    c.add_argument("output")
+    c.add_argument("--format", choices=FORMATS, help="por defecto, según la extensión de output")
+    e = sub.add_parser("extract", help="extrae desde textos (NDJSON o directorio de .txt) y exporta")
+    e.add_argument("input")
+    e.add_argument("output")
+    e.add_argument("--format", choices=FORMATS)
+    e.add_argument("--mode", "-m", choices=pc.EXTRACTION_MODES, default=None)
+    e.add_argument("--workers", "-w", type=int, default=1, help="procesos NER (1 = sin pool)")
+    e.add_argument("--window", type=int, default=1000, help="fichas por lote en memoria")
+    e.add_argument("--text-field", default="text")
+    e.add_argument("--id-field", default="id")
+    args = p.parse_args(argv)
+
+    try:
+        fmt = resolve_format(args.format, Path(args.output))
+    except ValueError as err:
+        print(err, file=sys.stderr)
+        return 1
+    columns = columns_from_label_map(pc.LABEL_MAP)
+    if args.cmd == "convert":
+        stats = export_rows(iter_results_ndjson(Path(args.input)), Path(args.output), columns, fmt)
+        print(json.dumps(stats, ensure_ascii=False))
+        return 0
+
+    mode = pc.resolve_mode(args.mode)
+    pool = None
+    if args.workers != 1:
+        pool = pc.NERWorkerPool(workers=args.workers or pc.POOL_WORKERS, model_path=pc.MODEL_PATH).start()
+        extract_batch = lambda texts: pool.process_texts(texts, mode=mode, profile="fields-only")
+    else:
+        extract_batch = lambda texts: list(pc.process_texts(texts, mode=mode, profile="fields-only"))
+    try:
+        records = iter_input(Path(args.input), text_field=args.text_field, id_field=args.id_field)
+        stats = export_rows(iter_results(records, extract_batch, window=args.window), Path(args.output), columns, fmt)
+    finally:
+        if pool is not None:
+            pool.shutdown(wait=True)
+    print(json.dumps(stats, ensure_ascii=False))
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
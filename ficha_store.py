@@ -0,0 +1,235 @@
+# -*- coding: utf-8 -*-
+"""
+Almacén de fichas procesadas en SQLite (un archivo, sin servicio externo).
+
+Cada resultado de extracción se guarda con columnas indexadas para las consultas
+habituales: CODIGO_UNICO_CATASTRAL (¿ya se capturó este CUC?), NUMERO_DOCUMENTO (otros
+predios del mismo titular), UBIGEO y fecha de proceso. El resultado completo va como
+JSON en la misma fila.
+
+Las escrituras no bloquean la extracción: add() sólo encola (O(1)) y un hilo propio
+escribe por lotes (hasta `batch_size` filas o `flush_ms` de espera, una transacción
+por lote). Las consultas ven lo escrito hasta el último lote; si la cola se llena
+(`max_pending`) la ficha no se guarda y se cuenta en "dropped", sin frenar la
+respuesta. Con varios procesos (gunicorn, pool) cada uno tiene su escritor sobre el
+mismo archivo (WAL).
+"""
+
+import json
+import time
+import uuid
+import queue
+import sqlite3
+import threading
+from pathlib import Path
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Mapping, Optional, Tuple
+
+KEY_FIELDS = {"cuc": "CODIGO_UNICO_CATASTRAL", "dni": "NUMERO_DOCUMENTO", "ubigeo": "UBIGEO"}
+MAX_LIMIT = 500
+
+_STOP = object()
+
+_SCHEMA = (
+    "CREATE TABLE IF NOT EXISTS fichas ("
+    " id TEXT PRIMARY KEY, created_at REAL NOT NULL, source TEXT NOT NULL,"
+    " cuc TEXT, dni TEXT, ubigeo TEXT, result TEXT NOT NULL)",
+    # (clave, fecha): búsqueda exacta ya ordenada por fecha, sin ordenar en memoria
+    "CREATE INDEX IF NOT EXISTS ix_fichas_cuc ON fichas(cuc, created_at) WHERE cuc IS NOT NULL",
+    "CREATE INDEX IF NOT EXISTS ix_fichas_dni ON fichas(dni, created_at) WHERE dni IS NOT NULL",
+    "CREATE INDEX IF NOT EXISTS ix_fichas_ubigeo ON fichas(ubigeo, created_at) WHERE ubigeo IS NOT NULL",
+    "CREATE INDEX IF NOT EXISTS ix_fichas_created ON fichas(created_at)",
+)
+
+def normalize_key(value: Any) -> Optional[str]:
+    """ Misma forma al guardar y al consultar: sin espacios, guiones ni puntos, en mayúsculas. """
+    if value is None:
+        return None
+    s = "".join(ch for ch in str(value) if ch not in " \t-.").upper()
+    return s or None
+
+def _field_value(result: Mapping[str, Any], name: str) -> Optional[str]:
+    """ Acepta cualquier perfil de respuesta: {normalized, ...} o el valor directo. """
+    f = (result.get("fields") or {}).get(name)
+    return normalize_key(f.get("normalized") if isinstance(f, dict) else f)
+
+def parse_when(value: Optional[str], end: bool = False) -> Optional[float]:
+    """
+    Fecha ISO (2024-05-31) u hora ISO (2024-05-31T10:00) local -> timestamp.
+    end=True con sólo fecha => fin de ese día (límite exclusivo del día siguiente).
+    ValueError si no es ISO.
+    """
+    if not value:
+        return None
+    dt = datetime.fromisoformat(value)
+    if end and len(value) <= 10:
+        dt += timedelta(days=1)
+    return dt.timestamp()
+
+class FichaStore:
+    def __init__(self, path: Path, batch_size: int = 200, flush_ms: float = 200.0, max_pending: int = 10000):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.batch_size = max(1, batch_size)
+        self.flush_s = max(0.0, flush_ms) / 1000.0
+        self._q: "queue.Queue[Any]" = queue.Queue(maxsize=max(1, max_pending))
+        self._thread: Optional[threading.Thread] = None
+        self.written = self.dropped = self.batches = self.errors = 0
+        self.last_error: Optional[str] = None
+        self._stats_lock = threading.Lock()  # contadores: hilos de requests + escritor
+        self._reader = self._connect()
+        for stmt in _SCHEMA:
+            self._reader.execute(stmt)
+        self._read_lock = threading.Lock()
+
+    def _connect(self) -> sqlite3.Connection:
+        db = sqlite3.connect(str(self.path), check_same_thread=False, timeout=10.0, isolation_level=None)
+        db.execute("PRAGMA journal_mode=WAL")
+        db.execute("PRAGMA synchronous=NORMAL")
+        return db
+
+    # ----------
+    # Escritura
+    # ----------
+    def start(self) -> "FichaStore":
+        if self._thread is None or not self._thread.is_alive():
+            self._thread = threading.Thread(target=self._loop, name="ficha-store", daemon=True)
+            self._thread.start()
+        return self
+
+    def add(self, result: Dict[str, Any], source: str = "extract") -> Optional[str]:
+        """ Encola la ficha y devuelve su id; None si la cola está llena (no se guarda). """
+        fid = uuid.uuid4().hex
+        try:
+            self._q.put_nowait((fid, time.time(), source, result))
+        except queue.Full:
+            with self._stats_lock:
+                self.dropped += 1
+            return None
+        return fid
+
+    def flush(self, timeout: Optional[float] = 10.0) -> bool:
+        """ Espera a que lo encolado hasta ahora quede escrito. """
+        if self._thread is None:
+            return False
+        done = threading.Event()
+        self._q.put(done)
+        return done.wait(timeout)
+
+    def stop(self, timeout: Optional[float] = 10.0) -> None:
+        """ Escribe lo pendiente y termina el hilo. """
+        if self._thread is not None:
+            self._q.put(_STOP)
+            self._thread.join(timeout)
+            self._thread = None
+        with self._read_lock:
+            self._reader.close()
+
+    def _collect(self) -> Tuple[List[Any], List[threading.Event], bool]:
+        items, marks = [], []
+        first = self._q.get()
+        deadline = time.monotonic() + self.flush_s
+        nxt = first
+        while True:
+            if nxt is _STOP:
+                return items, marks, True
+            if isinstance(nxt, threading.Event):
+                marks.append(nxt)
+                return items, marks, False  # flush(): escribir ya lo anterior
+            items.append(nxt)
+            if len(items) >= self.batch_size:
+                return items, marks, False
+            remaining = deadline - time.monotonic()
+            try:
+                nxt = self._q.get(timeout=remaining) if remaining > 0 else self._q.get_nowait()
+            except queue.Empty:
+                return items, marks, False
+
+    def _rows(self, items: List[Any]) -> List[Tuple[Any, ...]]:
+        rows = []
+        for fid, ts, source, result in items:
+            keys = [_field_value(result, KEY_FIELDS[k]) for k in ("cuc", "dni", "ubigeo")]
+            rows.append((fid, ts, source, *keys, json.dumps(result, ensure_ascii=False, default=str)))
+        return rows
+
+    def _loop(self) -> None:
+        db = self._connect()
+        stop = False
+        try:
+            while not stop:
+                items, marks, stop = self._collect()
+                if items:
+                    try:
+                        rows = self._rows(items)
+                        db.execute("BEGIN")
+                        db.executemany("INSERT OR REPLACE INTO fichas VALUES (?, ?, ?, ?, ?, ?, ?)", rows)
+                        db.execute("COMMIT")
+                        with self._stats_lock:
+                            self.written += len(rows)
+                            self.batches += 1
+                    except Exception as e:
+                        if db.in_transaction:
+                            db.execute("ROLLBACK")
+                        with self._stats_lock:
+                            self.errors += len(items)
+                            self.last_error = str(e)
+                for m in marks:
+                    m.set()
+        finally:
+            db.close()
+
+    # ---------
+    # Consultas
+    # ---------
+    @staticmethod
+    def _row(row: Tuple[Any, ...]) -> Dict[str, Any]:
+        fid, ts, source, cuc, dni, ubigeo, result = row
+        return {"id": fid, "created_at": datetime.fromtimestamp(ts).isoformat(timespec="seconds"),
+                "source": source, "cuc": cuc, "dni": dni, "ubigeo": ubigeo, "result": json.loads(result)}
+
+    @staticmethod
+    def _keys_where(cuc: Optional[str], dni: Optional[str], ubigeo: Optional[str]) -> Tuple[List[str], List[Any]]:
+        where, args = [], []
+        for col, val in (("cuc", cuc), ("dni", dni), ("ubigeo", ubigeo)):
+            key = normalize_key(val)
+            if key is not None:
+                where.append(f"{col} = ?")
+                args.append(key)
+        return where, args
+
+    def get(self, fid: str) -> Optional[Dict[str, Any]]:
+        with self._read_lock:
+            row = self._reader.execute("SELECT * FROM fichas WHERE id = ?", (fid,)).fetchone()
+        return self._row(row) if row else None
+
+    def search(self, cuc: Optional[str] = None, dni: Optional[str] = None, ubigeo: Optional[str] = None,
+               since: Optional[float] = None, until: Optional[float] = None,
+               limit: int = 50, offset: int = 0) -> List[Dict[str, Any]]:
+        """ Filtros combinados con AND; más recientes primero. since/until: timestamps [since, until). """
+        where, args = self._keys_where(cuc, dni, ubigeo)
+        if since is not None:
+            where.append("created_at >= ?")
+            args.append(since)
+        if until is not None:
+            where.append("created_at < ?")
+            args.append(until)
+        sql = "SELECT * FROM fichas" + (" WHERE " + " AND ".join(where) if where else "")
+        sql += " ORDER BY created_at DESC LIMIT ? OFFSET ?"
+        args += [max(1, min(limit, MAX_LIMIT)), max(0, offset)]
+        with self._read_lock:
+            rows = self._reader.execute(sql, args).fetchall()
+        return [self._row(r) for r in rows]
+
+    def count(self, cuc: Optional[str] = None, dni: Optional[str] = None, ubigeo: Optional[str] = None) -> int:
+        """ Fichas con esa clave (usa el índice); p. ej. count(cuc=...) > 0 => CUC ya capturado. """
+        where, args = self._keys_where(cuc, dni, ubigeo)
+        sql = "SELECT COUNT(*) FROM fichas" + (" WHERE " + " AND ".join(where) if where else "")
+        with self._read_lock:
+            return self._reader.execute(sql, args).fetchone()[0]
+
+    def stats(self) -> Dict[str, Any]:
+        with self._stats_lock:
+            return {"path": str(self.path), "pending": self._q.qsize(), "written": self.written,
+                    "batches": self.batches, "dropped": self.dropped, "errors": self.errors,
+                    "last_error": self.last_error, "batch_size": self.batch_size,
+                    "flush_ms": self.flush_s * 1000.0}
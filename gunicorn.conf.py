@@ -0,0 +1,26 @@
+# -*- coding: utf-8 -*-
+"""
+Configuración de gunicorn con precarga (workers uvicorn).
+
+  CATASTRO_PRELOAD=1 gunicorn -c gunicorn.conf.py pipeline_catastral:app
+
+Con preload_app el master importa la app, carga modelo/catálogo y corre el lote de
+calentamiento (pipeline_catastral.preload) ANTES de hacer fork: los workers nacen
+listos y comparten esas páginas copy-on-write (gc.freeze evita que el GC las ensucie).
+Sin CATASTRO_PRELOAD cada worker carga todo perezosamente, como con uvicorn.
+"""
+
+import os
+
+bind = os.getenv("CATASTRO_BIND", "0.0.0.0:8000")
+workers = int(os.getenv("CATASTRO_HTTP_WORKERS", "2"))
+worker_class = "uvicorn.workers.UvicornWorker"
+preload_app = os.getenv("CATASTRO_PRELOAD", "0").lower() in {"1", "true", "si", "yes"}
+timeout = int(os.getenv("CATASTRO_HTTP_TIMEOUT", "120"))
+
+def on_starting(server):
+    if not preload_app:
+        return
+    import pipeline_catastral as pc
+    stats = pc.preload()
+    server.log.info("Precarga lista en el master: %s", stats)
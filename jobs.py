@@ -0,0 +1,216 @@
+# -*- coding: utf-8 -*-
+"""
+Trabajos asíncronos de transcripción + extracción.
+
+POST /jobs devuelve un job_id de inmediato; la transcripción (bloqueante) y el
+pipeline NER corren en un ThreadPoolExecutor acotado, fuera del event loop.
+GET /jobs/{id} consulta estado y resultado. Opcionalmente se notifica a un
+callback_url (POST JSON) al terminar.
+
+callback_url viene del cliente: sólo http/https, opcionalmente restringido a una
+lista de hosts, y se rechazan direcciones privadas, loopback, link-local, etc. (salvo
+que se permitan explícitamente) para que el servidor no haga POST a la red interna.
+Se valida al encolar y otra vez al notificar (la resolución DNS puede cambiar), y no se
+siguen redirecciones.
+
+Las funciones de transcripción y extracción se inyectan, así que el gestor se
+puede probar con un transcriptor falso local (sin AssemblyAI).
+"""
+
+import json
+import time
+import uuid
+import socket
+import ipaddress
+import threading
+import urllib.parse
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, Iterable, Optional
+
+QUEUED, RUNNING, DONE, ERROR = "queued", "running", "done", "error"
+
+class JobQueueFull(RuntimeError):
+    pass
+
+class CallbackRejected(ValueError):
+    """ callback_url no permitido (esquema, host fuera de la lista o dirección privada). """
+
+def _public_ip(ip: str) -> bool:
+    addr = ipaddress.ip_address(ip.split("%", 1)[0])
+    if getattr(addr, "ipv4_mapped", None):
+        addr = addr.ipv4_mapped
+    return addr.is_global and not addr.is_multicast
+
+def check_callback_url(url: str, allowed_hosts: Iterable[str] = (), allow_private: bool = False) -> str:
+    """
+    Devuelve la URL si se puede notificar; si no, CallbackRejected.
+    allowed_hosts: hosts exactos o sufijos ".dominio"; vacío => cualquier host.
+    """
+    try:
+        parts = urllib.parse.urlsplit(url)
+        port = parts.port
+    except ValueError as e:
+        raise CallbackRejected(f"callback_url inválido: {e}")
+    if parts.scheme not in ("http", "https"):
+        raise CallbackRejected("callback_url debe ser http o https.")
+    host = (parts.hostname or "").lower()
+    if not host:
+        raise CallbackRejected("callback_url sin host.")
+    allowed = [h.lower() for h in allowed_hosts if h]
+    if allowed and not any(host == h or (h.startswith(".") and host.endswith(h)) for h in allowed):
+        raise CallbackRejected(f"Host de callback no permitido: {host}")
+    if allow_private:
+        return url
+    try:
+        infos = socket.getaddrinfo(host, port or (443 if parts.scheme == "https" else 80), proto=socket.IPPROTO_TCP)
+    except OSError as e:
+        raise CallbackRejected(f"No se pudo resolver el host de callback {host}: {e}")
+    bad = sorted({info[4][0] for info in infos if not _public_ip(info[4][0])})
+    if bad:
+        raise CallbackRejected(f"callback_url apunta a una dirección no pública ({', '.join(bad)}).")
+    return url
+
+class _NoRedirect(urllib.request.HTTPRedirectHandler):
+    def redirect_request(self, *args, **kwargs):
+        return None  # el 3xx vuelve como error: una redirección no salta la validación
+
+_OPENER = urllib.request.build_opener(_NoRedirect)
+
+class JobManager:
+    def __init__(self, transcribe_fn: Callable[[Any], Dict[str, Any]],
+                 extract_fn: Callable[[str], Dict[str, Any]],
+                 max_workers: int = 2, max_pending: int = 100, ttl_s: float = 3600.0,
+                 callback_timeout_s: float = 10.0,
+                 finish_fn: Optional[Callable[[Dict[str, Any]], Dict[str, Any]]] = None,
+                 callback_hosts: Iterable[str] = (), callback_allow_private: bool = False):
+        """
+        finish_fn: se aplica al resultado ya completo (con "asr"), p. ej. guardarlo en el
+        almacén de fichas; lo que devuelve es el resultado del trabajo.
+        callback_hosts / callback_allow_private: ver check_callback_url.
+        """
+        self.transcribe_fn = transcribe_fn
+        self.extract_fn = extract_fn
+        self.finish_fn = finish_fn
+        self.max_pending = max_pending
+        self.ttl_s = ttl_s
+        self.callback_timeout_s = callback_timeout_s
+        self.callback_hosts = list(callback_hosts)
+        self.callback_allow_private = callback_allow_private
+        self._executor = ThreadPoolExecutor(max_workers=max(1, max_workers), thread_name_prefix="catastro-job")
+        self._jobs: Dict[str, Dict[str, Any]] = {}
+        self._lock = threading.Lock()
+
+    # -------------
+    # API pública
+    # -------------
+    def submit(self, audio: Any, callback_url: Optional[str] = None,
+               meta: Optional[Dict[str, Any]] = None,
+               on_done: Optional[Callable[[], None]] = None,
+               transcribe_kwargs: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        """
+        on_done: se llama al terminar el trabajo (p. ej. borrar el audio volcado a disco).
+        transcribe_kwargs: argumentos extra para transcribe_fn (p. ej. backend).
+        CallbackRejected si callback_url no está permitido.
+        """
+        if callback_url:
+            self.check_callback(callback_url)
+        self._purge()
+        with self._lock:
+            pending = sum(1 for j in self._jobs.values() if j["status"] in (QUEUED, RUNNING))
+            if pending >= self.max_pending:
+                raise JobQueueFull(f"Hay {pending} trabajos pendientes (máximo {self.max_pending}).")
+            job_id = uuid.uuid4().hex
+            job = {
+                "id": job_id,
+                "status": QUEUED,
+                "created_at": time.time(),
+                "started_at": None,
+                "finished_at": None,
+                "callback_url": callback_url,
+                "callback": None,
+                "meta": meta or {},
+                "result": None,
+                "error": None,
+            }
+            self._jobs[job_id] = job
+        self._executor.submit(self._run, job_id, audio, on_done, transcribe_kwargs or {})
+        return self.public_view(job)
+
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        self._purge()
+        with self._lock:
+            job = self._jobs.get(job_id)
+            return self.public_view(job) if job else None
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            counts: Dict[str, int] = {}
+            for j in self._jobs.values():
+                counts[j["status"]] = counts.get(j["status"], 0) + 1
+        return {"jobs": counts, "max_pending": self.max_pending}
+
+    def check_callback(self, url: str) -> str:
+        return check_callback_url(url, self.callback_hosts, self.callback_allow_private)
+
+    def shutdown(self, wait: bool = True) -> None:
+        self._executor.shutdown(wait=wait, cancel_futures=not wait)
+
+    @staticmethod
+    def public_view(job: Dict[str, Any]) -> Dict[str, Any]:
+        return {k: v for k, v in job.items() if k != "callback_url"}
+
+    # -------------
+    # Internos
+    # -------------
+    def _run(self, job_id: str, audio: Any, on_done: Optional[Callable[[], None]] = None,
+             transcribe_kwargs: Optional[Dict[str, Any]] = None) -> None:
+        with self._lock:
+            job = self._jobs[job_id]
+            job["status"] = RUNNING
+            job["started_at"] = time.time()
+        try:
+            t = self.transcribe_fn(audio, **(transcribe_kwargs or {}))
+            result = self.extract_fn(t.get("text") or "")
+            result["asr"] = {
+                "confidence": t.get("confidence"),
+                "num_words": len(t.get("words") or []),
+                "timing": t.get("timing"),
+            }
+            if self.finish_fn is not None:
+                result = self.finish_fn(result)
+            with self._lock:
+                job["status"], job["result"] = DONE, result
+        except Exception as e:
+            with self._lock:
+                job["status"], job["error"] = ERROR, str(e)
+        finally:
+            with self._lock:
+                job["finished_at"] = time.time()
+            if on_done is not None:
+                on_done()
+        if job.get("callback_url"):
+            callback = self._notify(job)
+            with self._lock:
+                job["callback"] = callback
+
+    def _notify(self, job: Dict[str, Any]) -> Dict[str, Any]:
+        with self._lock:
+            url = job["callback_url"]
+            payload = json.dumps(self.public_view(job), ensure_ascii=False, default=str).encode("utf-8")
+        try:
+            self.check_callback(url)
+            req = urllib.request.Request(url, data=payload, method="POST",
+                                         headers={"Content-Type": "application/json"})
+            with _OPENER.open(req, timeout=self.callback_timeout_s) as resp:
+                return {"ok": 200 <= resp.status < 300, "status_code": resp.status}
+        except Exception as e:
+            return {"ok": False, "error": str(e)}
+
+    def _purge(self) -> None:
+        limit = time.time() - self.ttl_s
+        with self._lock:
+            old = [k for k, j in self._jobs.items()
+                   if j["finished_at"] is not None and j["finished_at"] < limit]
+            for k in old:
+                del self._jobs[k]
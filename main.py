@@ -5,6 +5,5 @@ app = FastAPI()
 
 @app.post("/transcribir/")
 async def transcribir(file: UploadFile = File(...)):
-    audio_bytes = await file.read()
-    resultado = transcribe_audio(audio_bytes)
+    resultado = transcribe_audio(file.file)
     return resultado
@@ -0,0 +1,129 @@
+# -*- coding: utf-8 -*-
+"""
+Micro-batching dinámico para llamadas concurrentes de un solo documento.
+
+Un hilo dedicado consume una cola: toma la primera petición, espera como máximo
+`window_ms` a que lleguen más (hasta `max_batch`) y procesa todo el grupo con
+una sola llamada a `batch_fn` (que internamente usa nlp.pipe). Cada llamador
+recibe su propio resultado a través de un Future.
+"""
+
+import time
+import queue
+import threading
+from concurrent.futures import Future
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+_STOP = object()
+
+class MicroBatcher:
+    def __init__(self, batch_fn: Callable[[List[Any]], List[Any]],
+                 window_ms: float = 5.0, max_batch: int = 64, name: str = "ner-microbatch"):
+        """
+        batch_fn: recibe una lista de entradas y devuelve una lista alineada de
+                  resultados; si un elemento es una Exception se propaga a su llamador.
+                  Si la cantidad no coincide, todos los del grupo reciben un RuntimeError.
+        """
+        self.batch_fn = batch_fn
+        self.window = max(0.0, window_ms) / 1000.0
+        self.max_batch = max(1, max_batch)
+        self.name = name
+        self._q: "queue.Queue[Any]" = queue.Queue()
+        self._thread: Optional[threading.Thread] = None
+        self._closed = False
+        self._lock = threading.Lock()  # submit() vs stop(): nada entra a la cola detrás de _STOP
+        self.batches = 0
+        self.items = 0
+
+    def start(self) -> "MicroBatcher":
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._closed = False
+                self._thread = threading.Thread(target=self._loop, name=self.name, daemon=True)
+                self._thread.start()
+        return self
+
+    def submit(self, item: Any) -> Future:
+        fut: Future = Future()
+        with self._lock:
+            if self._closed:
+                fut.set_exception(RuntimeError("MicroBatcher detenido."))
+            elif self._thread is None:
+                fut.set_exception(RuntimeError("MicroBatcher no iniciado."))
+            else:
+                self._q.put((item, fut))
+        return fut
+
+    def _collect(self) -> Tuple[List[Tuple[Any, Future]], bool]:
+        first = self._q.get()
+        if first is _STOP:
+            return [], True
+        batch = [first]
+        deadline = time.monotonic() + self.window
+        while len(batch) < self.max_batch:
+            remaining = deadline - time.monotonic()
+            try:
+                nxt = self._q.get(timeout=remaining) if remaining > 0 else self._q.get_nowait()
+            except queue.Empty:
+                break
+            if nxt is _STOP:
+                return batch, True
+            batch.append(nxt)
+        return batch, False
+
+    def _loop(self) -> None:
+        stop = False
+        while not stop:
+            batch, stop = self._collect()
+            if not batch:
+                continue
+            inputs = [it for it, _ in batch]
+            try:
+                results = list(self.batch_fn(inputs))
+            except Exception as e:
+                results = [e] * len(batch)
+            if len(results) != len(batch):
+                # sin alineación confiable ningún resultado es seguro: fallan todos (nadie queda esperando)
+                err = RuntimeError(f"batch_fn devolvió {len(results)} resultados para {len(batch)} entradas.")
+                results = [err] * len(batch)
+            for (_, fut), res in zip(batch, results):
+                if isinstance(res, Exception):
+                    fut.set_exception(res)
+                else:
+                    fut.set_result(res)
+            self.batches += 1
+            self.items += len(batch)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "window_ms": self.window * 1000.0,
+            "max_batch": self.max_batch,
+            "queued": self._q.qsize(),
+            "batches": self.batches,
+            "items": self.items,
+            "avg_batch": (self.items / self.batches) if self.batches else 0.0,
+        }
+
+    def stop(self, timeout: Optional[float] = 5.0) -> None:
+        """
+        Termina el hilo tras procesar lo ya encolado; los submit() posteriores fallan de
+        inmediato. Si el hilo no termina a tiempo (o murió), lo que quede en la cola se
+        falla en vez de dejar a sus llamadores esperando para siempre.
+        """
+        with self._lock:
+            if self._thread is None or self._closed:
+                return
+            self._closed = True
+            self._q.put(_STOP)
+        thread = self._thread
+        thread.join(timeout)
+        if thread.is_alive():
+            return  # sigue vaciando la cola; termina al llegar a _STOP
+        self._thread = None
+        while True:
+            try:
+                nxt = self._q.get_nowait()
+            except queue.Empty:
+                break
+            if nxt is not _STOP:
+                nxt[1].set_exception(RuntimeError("MicroBatcher detenido antes de procesar el pedido."))
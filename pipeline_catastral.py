@@ -17,15 +17,46 @@ Notas:
 import re
 import os
 import json
-from typing import Dict, List, Any, Optional, Tuple
-from dataclasses import dataclass, field
+from typing import Dict, List, Any, Optional, Tuple, Iterable, Iterator, Mapping, Callable
+from dataclasses import dataclass, field, replace
+from bisect import bisect_left, bisect_right
 import csv
 import spacy
+from spacy.pipeline import EntityRuler
 import unicodedata
 from pathlib import Path
+from contextlib import asynccontextmanager
+import asyncio
+import time
+import io
+import gc
+import tempfile
+import threading
 from pydantic import BaseModel
-from fastapi import FastAPI, UploadFile, File, HTTPException
-from transcriber import transcribe_audio
+from fastapi import FastAPI, UploadFile, File, Form, HTTPException, Request, WebSocket, WebSocketDisconnect
+from fastapi.responses import PlainTextResponse, StreamingResponse, FileResponse, JSONResponse
+from starlette.background import BackgroundTask
+from starlette.concurrency import run_in_threadpool
+from transcriber import transcribe_audio, get_audio_cache, resolve_backend, asr_client_stats, stop_asr_client, BACKENDS, ASR_BACKEND
+from asr_client import TranscriptionUnavailable
+from worker_pool import NERWorkerPool
+from micro_batch import MicroBatcher
+from jobs import CallbackRejected, JobManager, JobQueueFull
+from uploads import UploadLimitMiddleware, spool_to_disk
+from serialization import NotAcceptable, render
+from bulk import iter_ndjson_lines, iter_results
+from export import MEDIA_TYPES as EXPORT_MEDIA_TYPES, columns_from_label_map, export_rows, iter_csv_chunks, resolve_format
+from asr_cleanup import CleanupEngine, DEFAULT_CORRECTIONS_PATH
+from ubigeo_index import DEFAULT_INDEX_PATH, open_index, write_index
+from ubigeo_fuzzy import UbigeoResolver
+from result_cache import ResultCache, compute_fingerprint
+from chunking import plan_windows, merge_spans, sentence_starts
+from revisions import Revision, RevisionStore, apply_edits, changed_region
+from ficha_store import FichaStore, parse_when
+from synthetic import generate_corpus
+from ruler_compiler import compile_ruler
+from streaming import AsrEvent, DictationSession, make_streaming_asr, parse_client_message
+from metrics import REGISTRY, STAGE_SECONDS, DOC_CHARS, DOC_SPANS, DOCUMENTS, CACHE_LOOKUPS, REQUEST_SECONDS, EXTRACTION_PATHS, INCREMENTAL_EDITS
 
 # =========================
 # 0) CONFIGURACIÓN / MAPEOS
@@ -34,6 +65,92 @@ from transcriber import transcribe_audio
 # Cambia a la ruta de tu modelo entrenado
 MODEL_PATH = "model-last-tuned"
 
+# Compila los patrones del entity_ruler al cargar el modelo (ruler_compiler.py): las regex
+# y listas IN por token pasan a atributos nativos, frases o flags del vocabulario.
+# Mismas coincidencias (compruébalo con `python ruler_compiler.py verify`).
+RULER_COMPILE = os.getenv("CATASTRO_RULER_COMPILE", "0").lower() in {"1", "true", "si", "yes"}
+
+# Tamaño de lote para nlp.pipe; None => usa [nlp] batch_size del config.cfg del modelo
+NLP_BATCH_SIZE: Optional[int] = int(os.getenv("CATASTRO_BATCH_SIZE", "0")) or None
+
+# Modo de ejecución de la API: "local" (un proceso, _NLP global) | "pool" (multi-proceso)
+EXEC_MODE = os.getenv("CATASTRO_EXEC_MODE", "local").lower()
+POOL_WORKERS: Optional[int] = int(os.getenv("CATASTRO_WORKERS", "0")) or None  # None => cpu_count
+
+# Arranque con precarga (opt-in): modelo, catálogo UBIGEO y patrones se cargan antes de
+# atender tráfico y se corre un lote de calentamiento; /health responde 503 hasta terminar.
+# Con gunicorn (gunicorn.conf.py, preload_app) se hace en el master antes del fork y los
+# workers comparten esas páginas copy-on-write.
+PRELOAD = os.getenv("CATASTRO_PRELOAD", "0").lower() in {"1", "true", "si", "yes"}
+WARMUP_DOCS = int(os.getenv("CATASTRO_WARMUP_DOCS", "16"))
+GC_FREEZE = os.getenv("CATASTRO_GC_FREEZE", "1").lower() in {"1", "true", "si", "yes"}
+
+# Micro-batching de /extract: agrupa peticiones concurrentes en un solo nlp.pipe
+MICROBATCH = os.getenv("CATASTRO_MICROBATCH", "0").lower() in {"1", "true", "si", "yes"}
+MICROBATCH_WINDOW_MS = float(os.getenv("CATASTRO_MICROBATCH_WINDOW_MS", "5"))
+MICROBATCH_MAX = int(os.getenv("CATASTRO_MICROBATCH_MAX", "64"))
+
+# Diccionario de correcciones ASR usado por clean_text (TSV o JSON)
+ASR_CORRECTIONS_PATH = Path(os.getenv("CATASTRO_ASR_CORRECTIONS", str(DEFAULT_CORRECTIONS_PATH)))
+
+# Caché de resultados de process_text (memoria LRU + disco opcional)
+RESULT_CACHE_ENABLED = os.getenv("CATASTRO_CACHE", "1").lower() in {"1", "true", "si", "yes"}
+RESULT_CACHE_MB = float(os.getenv("CATASTRO_CACHE_MB", "64"))
+RESULT_CACHE_DIR: Optional[str] = os.getenv("CATASTRO_CACHE_DIR") or None  # None => sin nivel en disco
+RESULT_CACHE_DISK_MB = float(os.getenv("CATASTRO_CACHE_DISK_MB", "1024"))
+
+# Trabajos asíncronos de transcripción (/jobs)
+JOB_WORKERS = int(os.getenv("CATASTRO_JOB_WORKERS", "2"))
+JOB_MAX_PENDING = int(os.getenv("CATASTRO_JOB_MAX_PENDING", "100"))
+JOB_TTL_S = float(os.getenv("CATASTRO_JOB_TTL_S", "3600"))
+# callback_url: hosts permitidos (coma; ".dominio" = subdominios; vacío = cualquiera) y
+# si se aceptan direcciones privadas/loopback (sólo para redes internas de confianza)
+JOB_CALLBACK_HOSTS: List[str] = [h.strip() for h in os.getenv("CATASTRO_JOB_CALLBACK_HOSTS", "").split(",") if h.strip()]
+JOB_CALLBACK_ALLOW_PRIVATE = os.getenv("CATASTRO_JOB_CALLBACK_ALLOW_PRIVATE", "0").lower() in {"1", "true", "si", "yes"}
+
+# Modo de extracción: "full" (tok2vec + ner + entity_ruler) | "rules-only" (solo entity_ruler)
+# | "auto" (reglas primero; pasada neuronal sólo si quedan vacíos campos obligatorios)
+EXTRACTION_MODES = ("full", "rules-only", "auto")
+EXTRACTION_MODE = os.getenv("CATASTRO_EXTRACTION_MODE", "full").lower()
+REQUIRED_FIELDS: List[str] = [
+    f.strip().upper() for f in os.getenv(
+        "CATASTRO_REQUIRED_FIELDS", "CODIGO_UNICO_CATASTRAL,NUMERO_DOCUMENTO,DISTRITO"
+    ).split(",") if f.strip()
+]
+
+# Perfil de respuesta: "full" (campos + fuentes + spans, para auditoría) | "fields-only"
+# (campos sin fuentes ni spans) | "normalized-values-only" ({campo: valor normalizado})
+RESPONSE_PROFILES = ("full", "fields-only", "normalized-values-only")
+RESPONSE_PROFILE = os.getenv("CATASTRO_RESPONSE_PROFILE", "full").lower()
+GZIP_MIN_KB = float(os.getenv("CATASTRO_GZIP_MIN_KB", "64"))  # /extract_batch: comprimir desde este tamaño
+
+# Transcripciones largas: el NER corre por ventanas solapadas (0 = nunca segmentar)
+CHUNK_CHARS = int(os.getenv("CATASTRO_CHUNK_CHARS", "20000"))
+CHUNK_OVERLAP = int(os.getenv("CATASTRO_CHUNK_OVERLAP", "400"))
+
+# Subidas de audio: tope de tamaño (413 temprano) y carpeta/bloque para volcar a disco
+MAX_UPLOAD_MB = float(os.getenv("CATASTRO_MAX_UPLOAD_MB", "200"))  # 0 = sin tope
+UPLOAD_DIR: Optional[str] = os.getenv("CATASTRO_UPLOAD_DIR") or None  # None => temp del sistema
+UPLOAD_CHUNK_KB = int(os.getenv("CATASTRO_UPLOAD_CHUNK_KB", "1024"))
+
+# Exportación (POST /export): fichas extraídas por lote mientras se escribe el archivo
+EXPORT_WINDOW = int(os.getenv("CATASTRO_EXPORT_WINDOW", "1000"))
+
+# Re-extracción incremental tras correcciones (POST /extract/{id}/edit)
+REVISIONS_ENABLED = os.getenv("CATASTRO_REVISIONS", "1").lower() in {"1", "true", "si", "yes"}
+REVISIONS_MAX = int(os.getenv("CATASTRO_REVISIONS_MAX", "1000"))
+REVISIONS_TTL_S = float(os.getenv("CATASTRO_REVISIONS_TTL_S", "3600"))
+EDIT_CONTEXT_SENTENCES = int(os.getenv("CATASTRO_EDIT_CONTEXT", "1"))  # oraciones vecinas re-analizadas
+EDIT_MAX_FRACTION = float(os.getenv("CATASTRO_EDIT_MAX_FRACTION", "0.5"))  # más que esto => pasada completa
+EDIT_VERIFY = os.getenv("CATASTRO_EDIT_VERIFY", "0").lower() in {"1", "true", "si", "yes"}
+
+# Almacén de fichas (ficha_store.py): ruta del archivo SQLite; vacío => no se guardan.
+# Escritura por lotes en un hilo propio, fuera del camino de la respuesta.
+STORE_PATH: Optional[str] = os.getenv("CATASTRO_STORE") or None
+STORE_BATCH = int(os.getenv("CATASTRO_STORE_BATCH", "200"))
+STORE_FLUSH_MS = float(os.getenv("CATASTRO_STORE_FLUSH_MS", "200"))
+STORE_MAX_PENDING = int(os.getenv("CATASTRO_STORE_MAX_PENDING", "10000"))
+
 # Mapeos estándar de etiquetas
 # Izquierda: label de tu modelo | Derecha: clave estándar del JSON final
 LABEL_MAP = {
@@ -173,8 +290,10 @@ LABEL_MAP.update({
 # -------------------------
 # 1) Normalizadores/Helpers
 # -------------------------
+_RX_SPACES = re.compile(r"\s+")
+
 def _normalize_upper(s: str) -> str:
-    return re.sub(r"\s+", " ", s).strip().upper()
+    return _RX_SPACES.sub(" ", s).strip().upper()
 
 def _digits_only(s: str) -> str:
     return re.sub(r"\D+", "", s)
@@ -201,6 +320,13 @@ MONTHS_ES = {
     "noviembre": "11", "diciembre": "12"
 }
 
+_RX_FECHA_PUNCT = re.compile(r"[,.]")
+_RX_FECHA_DD_DE_MES = re.compile(r"(\d{1,2})\s+de\s+([a-záéíóú]+)\s+(?:de\s+|del\s+)?(\d{4})")
+_RX_FECHA_DD_MES = re.compile(r"(\d{1,2})\s+([a-záéíóú]+)\s+(\d{4})")
+_RX_FECHA_MES = re.compile(r"([a-záéíóú]+)\s+(?:de\s+|del\s+)?(\d{4})")
+_RX_FECHA_YYYY = re.compile(r"\b(19|20)\d{2}\b")
+_RX_NOT_DIGIT = re.compile(r"[^\d]")
+
 def parse_fecha_es(s: str) -> Optional[str]:
     """
     '15 de junio del 2015' -> '2015-06-15'
@@ -208,11 +334,11 @@ def parse_fecha_es(s: str) -> Optional[str]:
     """
     if not s: return None
     t = s.strip().lower()
-    t = re.sub(r"[,.]", " ", t)
-    t = re.sub(r"\s+", " ", t)
+    t = _RX_FECHA_PUNCT.sub(" ", t)
+    t = _RX_SPACES.sub(" ", t)
 
     # dd de mes de(l) yyyy
-    m = re.search(r"(\d{1,2})\s+de\s+([a-záéíóú]+)\s+(?:de\s+|del\s+)?(\d{4})", t)
+    m = _RX_FECHA_DD_DE_MES.search(t)
     if m:
         dd, mes, yyyy = m.groups()
         mes = _strip_accents(mes).lower()
@@ -220,7 +346,7 @@ def parse_fecha_es(s: str) -> Optional[str]:
         if mm: return f"{yyyy}-{mm}-{int(dd):02d}"
 
     # dd mes yyyy
-    m = re.search(r"(\d{1,2})\s+([a-záéíóú]+)\s+(\d{4})", t)
+    m = _RX_FECHA_DD_MES.search(t)
     if m:
         dd, mes, yyyy = m.groups()
         mes = _strip_accents(mes).lower()
@@ -228,7 +354,7 @@ def parse_fecha_es(s: str) -> Optional[str]:
         if mm: return f"{yyyy}-{mm}-{int(dd):02d}"
 
     # mes de(l) yyyy  (acepta 'del')
-    m = re.search(r"([a-záéíóú]+)\s+(?:de\s+|del\s+)?(\d{4})", t)
+    m = _RX_FECHA_MES.search(t)
     if m:
         mes, yyyy = m.groups()
         mes = _strip_accents(mes).lower()
@@ -236,182 +362,286 @@ def parse_fecha_es(s: str) -> Optional[str]:
         if mm: return f"{yyyy}-{mm}-01"
 
     # yyyy
-    m = re.search(r"\b(19|20)\d{2}\b", t)
+    m = _RX_FECHA_YYYY.search(t)
     if m:
         yyyy = m.group(0)
         return f"{yyyy}-01-01"
 
-    raw_digits = re.sub(r"[^\d]", "", s)
+    raw_digits = _RX_NOT_DIGIT.sub("", s)
     return raw_digits or None
 
+_RX_CUC_12 = re.compile(r"\b(\d{12})\b")
+_PAT_PAIRS = r"(?:\d{2})"
+_RX_CUC_PAIRS = re.compile(
+    rf"(?:c[oó]digo\s+u[nm]ico\s+catastral|cuc).*?(({_PAT_PAIRS}[\s,]+){{5}}{_PAT_PAIRS})",
+    flags=re.IGNORECASE
+)
+_RX_DIGIT = re.compile(r"\d")
+
 def extract_cuc(text: str) -> Optional[str]:
     """ Extrae un CUC de 12 dígitos (contiguos o 6 pares cerca de 'código único catastral'). """
     if not text: return None
-    m = re.search(r"\b(\d{12})\b", text)
+    with STAGE_SECONDS.time(("extract_cuc",)):
+        return _scan_cuc(text)
+
+def _scan_cuc(text: str) -> Optional[str]:
+    m = _RX_CUC_12.search(text)
     if m: return m.group(1)
 
-    pat_pairs = r"(?:\d{2})"
-    m2 = re.search(
-        rf"(?:c[oó]digo\s+u[nm]ico\s+catastral|cuc).*?(({pat_pairs}[\s,]+){{5}}{pat_pairs})",
-        text, flags=re.IGNORECASE
-    )
+    m2 = _RX_CUC_PAIRS.search(text)
     if m2:
-        seq = re.sub(r"[^\d]", "", m2.group(1))
+        seq = _RX_NOT_DIGIT.sub("", m2.group(1))
         if len(seq) == 12:
             return seq
 
-    all_digits = re.findall(r"\d", text)
+    all_digits = _RX_DIGIT.findall(text)
     if len(all_digits) >= 12:
         return "".join(all_digits[:12])
     return None
 
+_RX_DIGITS = re.compile(r"\d+")
+
 def normalize_to_digits_first(s: str) -> Optional[str]:
     """ 'sector 35' -> '35' (si hay dígitos). """
     if not s: return None
-    m = re.search(r"\d+", s)
+    m = _RX_DIGITS.search(s)
     return m.group(0) if m else s.strip()
 
-# =========================
-# NORMALIZERS
-# =========================
-NORMALIZERS = {
-    # Documentos
-    "DNI": lambda x: re.sub(r"\D", "", x) if x else None,  # solo 8 dígitos
-    "NUMERO_DOCUMENTO": lambda x: re.sub(r"\D", "", x) if x else None,
-    "RUC": lambda x: re.sub(r"\D", "", x)[:11] if x else None,  # 11 dígitos
-
-    # Teléfono
-    "TELEFONO": lambda x: re.sub(r"\D", "", x) if x else None,  # limpia guiones/espacios
-
-    # Correos
-    "CORREO_ELECTRONICO": lambda x: x.strip().lower() if x else None,
-
-    # Códigos numéricos (Catastrales, contribuyente, predial)
-    "CODIGO_UNICO_CATASTRAL": lambda x: re.sub(r"\D", "", x)[:12] if x else None,
-    "CODIGO_CONTRIBUYENTE": lambda x: re.sub(r"\D", "", x) if x else None,
-    "CODIGO_PREDIAL": lambda x: re.sub(r"\D", "", x) if x else None,
-
-    # Ubicación
-    "DEPARTAMENTO": lambda x: x.strip().upper() if x else None,
-    "PROVINCIA": lambda x: x.strip().upper() if x else None,
-    "DISTRITO": lambda x: x.strip().upper() if x else None,
-    "NOMBRE_VIA": lambda x: x.strip().title() if x else None,
-    "NUMERO_MUNICIPAL": lambda x: re.sub(r"\D", "", x) if x else None,
-    "NUMERO_INTERIOR": lambda x: x.strip().upper() if x else None,
-    "NOMBRE_HABILITACION": lambda x: x.strip().title() if x else None,
-    "ZONA_SECTOR_ETAPA": lambda x: x.strip().upper() if x else None,
-    "MANZANA": lambda x: re.sub(r"\s+", "", x.upper()) if x else None,
-    "LOTE": lambda x: x.strip().upper() if x else None,
-    "SUBLOTE": lambda x: x.strip().upper() if x else None,
+# ---------------------------------------------
+# 2) Field specs (normalización + validación)
+# ---------------------------------------------
+# Cada campo estándar se describe de forma declarativa:
+#   type      -> tipo del valor normalizado ("text", "digits", "float", "bool", "date", "catalog")
+#   chain     -> pasos de normalización aplicados en orden (ver _STEPS)
+#   validator -> regex que debe cumplir el valor normalizado (None = basta con no estar vacío)
+#   catalog   -> [(VALOR, regex)] en orden de prioridad; gana la primera entrada presente
+#   empty     -> valor normalizado cuando la entrada viene vacía
+# Las specs se compilan UNA vez al importar (compile_field_specs) en callables con
+# las regex precompiladas.
+@dataclass(frozen=True)
+class FieldSpec:
+    type: str = "text"
+    chain: Tuple[str, ...] = ("strip",)
+    validator: Optional[str] = None
+    catalog: Tuple[Tuple[str, str], ...] = ()
+    empty: Any = None
+
+_RX_NON_DIGIT = re.compile(r"\D+")
+_RX_NON_NUMBER = re.compile(r"[^\d.]")
+_RX_NON_DATE = re.compile(r"[^0-9/.-]")
+_SI = frozenset({"1", "SI", "SÍ"})
+
+def _to_float(x: str) -> Optional[float]:
+    t = _RX_NON_NUMBER.sub("", x)
+    if not t:
+        return None
+    try:
+        return float(t)
+    except ValueError:  # p.ej. '1.2.3'
+        return None
 
-    # Titular
-    "NOMBRES": lambda x: x.strip().title() if x else None,
-    "APELLIDO_PATERNO": lambda x: x.strip().title() if x else None,
-    "APELLIDO_MATERNO": lambda x: x.strip().title() if x else None,
-    "RAZON_SOCIAL": lambda x: x.strip().upper() if x else None,
-
-    # Fechas
-    "FECHA_ADQUISICION": lambda x: re.sub(r"[^0-9/.-]", "", x) if x else None,
-    "FECHA_CONSTRUCCION": lambda x: re.sub(r"[^0-9/.-]", "", x) if x else None,
-    "OBRA_FECHA_CONSTRUCCION": lambda x: re.sub(r"[^0-9/.-]", "", x) if x else None,
-
-    # Áreas y medidas (convertir a float si posible)
-    "AREA_TERRENO_ADQUIRIDA": lambda x: float(re.sub(r"[^\d.]", "", x)) if re.sub(r"[^\d.]", "", x) else None,
-    "AREA_TERRENO_VERIFICADA": lambda x: float(re.sub(r"[^\d.]", "", x)) if re.sub(r"[^\d.]", "", x) else None,
-    "AREA_VERIFICADA": lambda x: float(re.sub(r"[^\d.]", "", x)) if re.sub(r"[^\d.]", "", x) else None,
-    "MEDIDA_FRENTE": lambda x: float(re.sub(r"[^\d.]", "", x)) if re.sub(r"[^\d.]", "", x) else None,
-    "MEDIDA_DERECHA": lambda x: float(re.sub(r"[^\d.]", "", x)) if re.sub(r"[^\d.]", "", x) else None,
-    "MEDIDA_IZQUIERDA": lambda x: float(re.sub(r"[^\d.]", "", x)) if re.sub(r"[^\d.]", "", x) else None,
-    "MEDIDA_FONDO": lambda x: float(re.sub(r"[^\d.]", "", x)) if re.sub(r"[^\d.]", "", x) else None,
-
-    # Servicios (1=Sí, 2=No → normalizar a bool)
-    "SERVICIO_LUZ": lambda x: True if str(x).strip().upper() in ["1", "SI", "SÍ"] else False,
-    "SERVICIO_AGUA": lambda x: True if str(x).strip().upper() in ["1", "SI", "SÍ"] else False,
-    "SERVICIO_TELEFONO": lambda x: True if str(x).strip().upper() in ["1", "SI", "SÍ"] else False,
-    "SERVICIO_DESAGUE": lambda x: True if str(x).strip().upper() in ["1", "SI", "SÍ"] else False,
-    "SERVICIO_GAS": lambda x: True if str(x).strip().upper() in ["1", "SI", "SÍ"] else False,
-    "SERVICIO_INTERNET": lambda x: True if str(x).strip().upper() in ["1", "SI", "SÍ"] else False,
-    "SERVICIO_TV": lambda x: True if str(x).strip().upper() in ["1", "SI", "SÍ"] else False,
+# Pasos atómicos de normalización (str -> valor)
+_STEPS: Dict[str, Any] = {
+    "strip": str.strip,
+    "upper": str.upper,
+    "lower": str.lower,
+    "title": str.title,
+    "digits": lambda x: _RX_NON_DIGIT.sub("", x),
+    "digits11": lambda x: _RX_NON_DIGIT.sub("", x)[:11],
+    "digits_first": normalize_to_digits_first,
+    "cuc": lambda x: extract_cuc(x) or _RX_NON_DIGIT.sub("", x)[:12],
+    "date_chars": lambda x: _RX_NON_DATE.sub("", x),
+    "date_iso": parse_fecha_es,
+    "float": _to_float,
+    "bool_si": lambda x: x.strip().upper() in _SI,
+    "upper_ws": _normalize_upper,
 }
 
-# Ajustes mejorados
-NORMALIZERS.update({
-    # CUC: usa extractor robusto
-    "CODIGO_UNICO_CATASTRAL": lambda x: extract_cuc(x) or (re.sub(r"\D", "", x)[:12] if x else None),
-
-    # Números de ubicación: tomar dígitos si existen
-    "SECTOR": lambda x: normalize_to_digits_first(x),
-    "MANZANA": lambda x: normalize_to_digits_first(x),
-    "LOTE": lambda x: normalize_to_digits_first(x),
-    "NUMERO_INTERIOR": lambda x: normalize_to_digits_first(x),
-
-    # Fecha adquisición a ISO
-    "FECHA_ADQUISICION": lambda x: parse_fecha_es(x),
-
-    # MEP/ECS/ECC: normaliza a catálogo (y resuelve conflictos simples)
-    "MEP": lambda x: (
-        "CONCRETO" if re.search(r"\bconcreto\b", x, flags=re.I) else
-        "LADRILLO" if re.search(r"\bladrillo(s)?\b", x, flags=re.I) else
-        "MADERA"   if re.search(r"\bmadera\b", x, flags=re.I) else
-        "ADOBE"    if re.search(r"\badobe\b", x, flags=re.I) else
-        "QUINCHA"  if re.search(r"\bquincha\b", x, flags=re.I) else
-        _normalize_upper(x)
-    ),
-
-    # Dirección/HU en bonito
-    "NOMBRE_HABILITACION": lambda x: x.strip().title() if x else None,
-})
+_DIGITS = FieldSpec(type="digits", chain=("digits",))
+_UPPER = FieldSpec(chain=("strip", "upper"))
+_TITLE = FieldSpec(chain=("strip", "title"))
+_DIGITS_FIRST = FieldSpec(chain=("digits_first",))
+_DATE_CHARS = FieldSpec(type="date", chain=("date_chars",))
+_MEASURE = FieldSpec(type="float", chain=("float",), validator=r"^\d+(\.\d{1,2})?$")
+_SERVICE = FieldSpec(type="bool", chain=("bool_si",), empty=False)
 
-# --------------------
-# 2) Validadores/RegEx
-# --------------------
-VALIDATORS = {
-    # Documentos (ya mapeados por LABEL_MAP)
-    "NUMERO_DOCUMENTO": re.compile(r"^\d{8}$"),        # DNI: 8 dígitos
-    "NUMERO_RUC": re.compile(r"^\d{11}$"),             # RUC: 11 dígitos
+FIELD_SPECS: Dict[str, FieldSpec] = {
+    # Documentos
+    "DNI": _DIGITS,                                                     # solo 8 dígitos
+    "NUMERO_DOCUMENTO": FieldSpec(type="digits", chain=("digits",), validator=r"^\d{8}$"),
+    "RUC": FieldSpec(type="digits", chain=("digits11",)),               # 11 dígitos
+    "NUMERO_RUC": FieldSpec(validator=r"^\d{11}$", empty=""),
 
     # Teléfono / correo
-    "TELEFONO": re.compile(r"^9\d{8}$"),               # Perú: 9 + 8 dígitos
-    "CORREO_ELECTRONICO": re.compile(r"^[A-Za-z0-9._%+-]+@[A-Za-z0-9.-]+\.[A-Za-z]{2,}$"),
-
-    # Códigos catastrales
-    "CODIGO_UNICO_CATASTRAL": re.compile(r"^\d{12}$"), # 12 exactos
-    "CODIGO_CONTRIBUYENTE": re.compile(r"^\d{6,10}$"),
-    "CODIGO_PREDIAL": re.compile(r"^\d{6,10}$"),
+    "TELEFONO": FieldSpec(type="digits", chain=("digits",), validator=r"^9\d{8}$"),  # Perú: 9 + 8 dígitos
+    "CORREO_ELECTRONICO": FieldSpec(chain=("strip", "lower"),
+                                    validator=r"^[A-Za-z0-9._%+-]+@[A-Za-z0-9.-]+\.[A-Za-z]{2,}$"),
+
+    # Códigos catastrales (CUC: usa extractor robusto)
+    "CODIGO_UNICO_CATASTRAL": FieldSpec(type="digits", chain=("cuc",), validator=r"^\d{12}$"),
+    "CODIGO_CONTRIBUYENTE": FieldSpec(type="digits", chain=("digits",), validator=r"^\d{6,10}$"),
+    "CODIGO_PREDIAL": FieldSpec(type="digits", chain=("digits",), validator=r"^\d{6,10}$"),
+
+    # Ubicación (números: tomar dígitos si existen)
+    "DEPARTAMENTO": _UPPER,
+    "PROVINCIA": _UPPER,
+    "DISTRITO": _UPPER,
+    "NOMBRE_VIA": _TITLE,
+    "NUMERO_MUNICIPAL": FieldSpec(type="digits", chain=("digits",), validator=r"^[0-9A-Za-z\-\/\. ]{1,15}$"),
+    "NUMERO_INTERIOR": FieldSpec(chain=("digits_first",), validator=r"^[0-9A-Za-z\-\/\. ]{1,10}$"),
+    "NOMBRE_HABILITACION": _TITLE,
+    "ZONA_SECTOR_ETAPA": _UPPER,
+    "SECTOR": FieldSpec(chain=("digits_first",), validator=r"^[0-9A-Za-z\- ]{1,10}$"),
+    "MANZANA": FieldSpec(chain=("digits_first",), validator=r"^[0-9A-Za-z\- ]{1,10}$"),
+    "LOTE": FieldSpec(chain=("digits_first",), validator=r"^[0-9A-Za-z\- ]{1,10}$"),
+    "SUBLOTE": _UPPER,
 
-    # Numeraciones
-    "NUMERO_MUNICIPAL": re.compile(r"^[0-9A-Za-z\-\/\. ]{1,15}$"),
-    "NUMERO_INTERIOR": re.compile(r"^[0-9A-Za-z\-\/\. ]{1,10}$"),
-
-    # Ubicación simple
-    "SECTOR": re.compile(r"^[0-9A-Za-z\- ]{1,10}$"),
-    "MANZANA": re.compile(r"^[0-9A-Za-z\- ]{1,10}$"),
-    "LOTE": re.compile(r"^[0-9A-Za-z\- ]{1,10}$"),
+    # Titular
+    "NOMBRES": _TITLE,
+    "APELLIDO_PATERNO": _TITLE,
+    "APELLIDO_MATERNO": _TITLE,
+    "RAZON_SOCIAL": _UPPER,
 
     # Zonificación (evita ‘DNI’)
-    "ZONIFICACION": re.compile(r"^(?!DNI$)[A-Z0-9\-\/]{2,10}$"),
-
-    # Áreas / medidas (decimales opcionales)
-    "AREA_TERRENO_ADQUIRIDA": re.compile(r"^\d+(\.\d{1,2})?$"),
-    "AREA_TERRENO_VERIFICADA": re.compile(r"^\d+(\.\d{1,2})?$"),
-    "AREA_VERIFICADA": re.compile(r"^\d+(\.\d{1,2})?$"),
-    "MEDIDA_FRENTE": re.compile(r"^\d+(\.\d{1,2})?$"),
-    "MEDIDA_DERECHA": re.compile(r"^\d+(\.\d{1,2})?$"),
-    "MEDIDA_IZQUIERDA": re.compile(r"^\d+(\.\d{1,2})?$"),
-    "MEDIDA_FONDO": re.compile(r"^\d+(\.\d{1,2})?$"),
-
-    # Fecha ISO
-    "FECHA_ADQUISICION": re.compile(r"^\d{4}-\d{2}-\d{2}$"),
+    "ZONIFICACION": FieldSpec(validator=r"^(?!DNI$)[A-Z0-9\-\/]{2,10}$", empty=""),
+
+    # Fechas (adquisición a ISO)
+    "FECHA_ADQUISICION": FieldSpec(type="date", chain=("date_iso",), validator=r"^\d{4}-\d{2}-\d{2}$"),
+    "FECHA_CONSTRUCCION": _DATE_CHARS,
+    "OBRA_FECHA_CONSTRUCCION": _DATE_CHARS,
+
+    # Áreas y medidas (float si es posible; decimales opcionales)
+    "AREA_TERRENO_ADQUIRIDA": _MEASURE,
+    "AREA_TERRENO_VERIFICADA": _MEASURE,
+    "AREA_VERIFICADA": _MEASURE,
+    "MEDIDA_FRENTE": _MEASURE,
+    "MEDIDA_DERECHA": _MEASURE,
+    "MEDIDA_IZQUIERDA": _MEASURE,
+    "MEDIDA_FONDO": _MEASURE,
+
+    # Servicios (1=Sí, 2=No → bool)
+    "SERVICIO_LUZ": _SERVICE,
+    "SERVICIO_AGUA": _SERVICE,
+    "SERVICIO_TELEFONO": _SERVICE,
+    "SERVICIO_DESAGUE": _SERVICE,
+    "SERVICIO_GAS": _SERVICE,
+    "SERVICIO_INTERNET": _SERVICE,
+    "SERVICIO_TV": _SERVICE,
+
+    # MEP: normaliza a catálogo (y resuelve conflictos simples)
+    "MEP": FieldSpec(type="catalog", chain=("upper_ws",), empty="", catalog=(
+        ("CONCRETO", r"\bconcreto\b"),
+        ("LADRILLO", r"\bladrillo(s)?\b"),
+        ("MADERA", r"\bmadera\b"),
+        ("ADOBE", r"\badobe\b"),
+        ("QUINCHA", r"\bquincha\b"),
+    )),
 }
 
+# Campos sin spec: strip y válido si no está vacío
+DEFAULT_FIELD_SPEC = FieldSpec(empty="")
+
+@dataclass(frozen=True)
+class CompiledField:
+    spec: FieldSpec
+    normalize: Any  # Callable[[str], Any]
+    validate: Any   # Callable[[Any], Tuple[bool, Optional[str]]]
+    pattern: Optional["re.Pattern"] = None
+
+def _compile_chain(spec: FieldSpec):
+    steps = tuple(_STEPS[name] for name in spec.chain)
+    empty = spec.empty
+    if spec.catalog:
+        # Una sola pasada: alternancia con un grupo nombrado por entrada; gana la de menor índice
+        values = [v for v, _ in spec.catalog]
+        rx = re.compile("|".join(f"(?P<c{i}>{p})" for i, (_, p) in enumerate(spec.catalog)), flags=re.I)
+        fallback = steps
+
+        def normalize(x: str):
+            if not x:
+                return empty
+            best = None
+            for m in rx.finditer(x):
+                i = int(m.lastgroup[1:])
+                if best is None or i < best:
+                    best = i
+                    if i == 0:
+                        break
+            if best is not None:
+                return values[best]
+            for fn in fallback:
+                x = fn(x)
+            return x
+        return normalize
+
+    if len(steps) == 1:
+        only = steps[0]
+
+        def normalize(x: str):
+            return only(x) if x else empty
+        return normalize
+
+    def normalize(x: str):
+        if not x:
+            return empty
+        for fn in steps:
+            x = fn(x)
+            if x is None:
+                return None
+        return x
+    return normalize
+
+def _compile_validator(spec: FieldSpec):
+    if spec.validator is None:
+        def validate(v):
+            return (True, None) if v else (False, "VACIO")
+        return validate, None
+    pattern = re.compile(spec.validator)
+    match = pattern.match
+
+    def validate(v):
+        if not v:
+            return False, "VACIO"
+        # floats/bools se validan sobre su representación textual
+        ok = match(v if isinstance(v, str) else str(v)) is not None
+        return ok, (None if ok else "FORMATO_INVALIDO")
+    return validate, pattern
+
+def compile_field_specs(specs: Dict[str, FieldSpec]) -> Dict[str, CompiledField]:
+    compiled: Dict[str, CompiledField] = {}
+    cache: Dict[int, CompiledField] = {}  # las specs compartidas se compilan una vez
+    for key, spec in specs.items():
+        cf = cache.get(id(spec))
+        if cf is None:
+            validate, pattern = _compile_validator(spec)
+            cf = CompiledField(spec, _compile_chain(spec), validate, pattern)
+            cache[id(spec)] = cf
+        compiled[key] = cf
+    return compiled
+
+COMPILED_FIELDS: Dict[str, CompiledField] = compile_field_specs(FIELD_SPECS)
+_DEFAULT_COMPILED = compile_field_specs({"": DEFAULT_FIELD_SPEC})[""]
+
+# Vistas de compatibilidad con las tablas anteriores
+NORMALIZERS = {k: cf.normalize for k, cf in COMPILED_FIELDS.items()}
+VALIDATORS = {k: cf.pattern for k, cf in COMPILED_FIELDS.items() if cf.pattern is not None}
+
 # -----------------------------------
 # 3) Catálogo UBIGEO
 # -----------------------------------
-UBIGEO_CACHE: Dict[str, str] = {}
+UBIGEO_CACHE: Mapping[str, str] = {}
 UBIGEO_PATHS = [
     Path(__file__).parent / "ubigeo.xlsx",  # producción
     Path(__file__).parent / "ubigeo.csv",   # fallback CSV
 ]
+# Índice binario precompilado (python ubigeo_index.py build); se usa si está vigente
+UBIGEO_INDEX_PATH = Path(os.getenv("CATASTRO_UBIGEO_INDEX", str(DEFAULT_INDEX_PATH)))
+# Si el índice falta o está desactualizado, regenerarlo tras leer Excel/CSV
+UBIGEO_INDEX_AUTOBUILD = os.getenv("CATASTRO_UBIGEO_AUTOBUILD", "0").lower() in {"1", "true", "si", "yes"}
+# Similitud mínima (0..1) para aceptar un UBIGEO resuelto de forma difusa
+UBIGEO_FUZZY_MIN_SCORE = float(os.getenv("CATASTRO_UBIGEO_FUZZY_MIN", "0.8"))
+# Por debajo del mínimo y hasta este piso el candidato se reporta sin confirmar (no válido)
+UBIGEO_FUZZY_REVIEW_SCORE = float(os.getenv("CATASTRO_UBIGEO_FUZZY_REVIEW_MIN", "0.6"))
 
 def _detect_headers(headers: List[str]) -> Tuple[Optional[str], Optional[str], Optional[str], Optional[str]]:
     # Devuelve nombres canónicos de columnas
@@ -423,7 +653,7 @@ def _detect_headers(headers: List[str]) -> Tuple[Optional[str], Optional[str], O
     col_dep  = pick("DEPARTAMENTO", "DPTO", "DEPA", "DEPART")
     col_prov = pick("PROVINCIA", "PROV")
     col_dist = pick("DISTRITO", "DIST")
-    col_ubi  = pick("UBIGEO", "COD_UBIGEO", "UBI")
+    col_ubi  = pick("UBIGEO", "COD_UBIGEO", "COD. UBIGEO", "CODIGO UBIGEO", "UBI")
     return col_dep, col_prov, col_dist, col_ubi
 
 def _load_ubigeo_from_excel(path: Path) -> Dict[str, str]:
@@ -469,43 +699,79 @@ def _load_ubigeo_from_csv(path: Path) -> Dict[str, str]:
                 cat[key] = ubi
         return cat
 
-def load_ubigeo_catalog() -> Dict[str, str]:
+def ubigeo_source_path() -> Optional[Path]:
+    """ Primer catálogo fuente disponible (Excel, luego CSV). """
+    for p in UBIGEO_PATHS:
+        if p.exists() and p.suffix.lower() in {".xlsx", ".xls", ".csv"}:
+            return p
+    return None
+
+def load_ubigeo_from_source(p: Path) -> Dict[str, str]:
+    if p.suffix.lower() in {".xlsx", ".xls"}:
+        return _load_ubigeo_from_excel(p)
+    if p.suffix.lower() == ".csv":
+        return _load_ubigeo_from_csv(p)
+    return {}
+
+def load_ubigeo_catalog() -> Mapping[str, str]:
     global UBIGEO_CACHE
     if UBIGEO_CACHE:
         return UBIGEO_CACHE
+    # 1) índice binario (mmap) si existe y corresponde a la fuente actual
+    idx = open_index(UBIGEO_INDEX_PATH, source=ubigeo_source_path())
+    if idx is not None and len(idx):
+        UBIGEO_CACHE = idx
+        return UBIGEO_CACHE
+    # 2) fallback: Excel / CSV
     for p in UBIGEO_PATHS:
-        if p.suffix.lower() in {".xlsx", ".xls"} and p.exists():
-            cat = _load_ubigeo_from_excel(p)
-            if cat:
-                UBIGEO_CACHE = cat
-                return UBIGEO_CACHE
-        if p.suffix.lower() == ".csv" and p.exists():
-            cat = _load_ubigeo_from_csv(p)
-            if cat:
-                UBIGEO_CACHE = cat
-                return UBIGEO_CACHE
+        if not p.exists():
+            continue
+        cat = load_ubigeo_from_source(p)
+        if cat:
+            if UBIGEO_INDEX_AUTOBUILD:
+                try:
+                    write_index(cat, UBIGEO_INDEX_PATH, p)
+                except OSError:
+                    pass  # directorio de solo lectura: seguimos con el dict en memoria
+            UBIGEO_CACHE = cat
+            return UBIGEO_CACHE
     UBIGEO_CACHE = {}
     return UBIGEO_CACHE
 
+_UBIGEO_RESOLVER: Optional[UbigeoResolver] = None
+def get_ubigeo_resolver() -> Optional[UbigeoResolver]:
+    """ Resolver difuso (trigramas + jerarquía) construido una vez desde el catálogo. """
+    global _UBIGEO_RESOLVER
+    if _UBIGEO_RESOLVER is None:
+        cat = load_ubigeo_catalog()
+        if not cat:
+            return None
+        items = cat.iter_items() if hasattr(cat, "iter_items") else cat.items()
+        _UBIGEO_RESOLVER = UbigeoResolver(items, _normalize_place)
+    return _UBIGEO_RESOLVER
+
 # -----------------------------------------
 # 4) Limpieza previa (antes de pasar a NER)
 # -----------------------------------------
+_CLEANUP: Optional[CleanupEngine] = None
+def get_cleanup_engine() -> CleanupEngine:
+    global _CLEANUP
+    if _CLEANUP is None:
+        if ASR_CORRECTIONS_PATH.exists():
+            _CLEANUP = CleanupEngine.from_file(ASR_CORRECTIONS_PATH)
+        else:
+            _CLEANUP = CleanupEngine()  # reglas históricas incluidas en asr_cleanup
+    return _CLEANUP
+
 def clean_text(raw: str) -> str:
     """
-    Limpieza ligera pensada para texto con ruido ASR/OCR:
+    Limpieza ligera pensada para texto con ruido ASR/OCR (una sola pasada, ver asr_cleanup):
     - Colapsa números tipo "15, 000, 23" -> "1500023"
     - Normaliza comas repetidas y espacios
-    - Arregla 'soviquado'/'sovicado' -> 'ubicado' (ejemplo típico)
+    - Corrige palabras del diccionario ASR_CORRECTIONS_PATH ('soviquado' -> 'ubicado', ...)
     - Mantiene tildes; el modelo suele beneficiarse del texto original
     """
-    s = raw
-    s = re.sub(r"(?:(?<=\d)[\s,]+(?=\d))+", "", s)  # unir números partidos
-    s = re.sub(r"\bso[vb]i[cq]uado\b", "ubicado", s, flags=re.IGNORECASE)
-    s = re.sub(r"\bhablicaci[oó]n\b", "habilitacion", s, flags=re.IGNORECASE)
-    s = re.sub(r"\bproe?dial\b", "predial", s, flags=re.IGNORECASE)
-    s = re.sub(r"\brantas\b", "rentas", s, flags=re.IGNORECASE)
-    s = re.sub(r"\s+", " ", s).strip()
-    return s
+    return get_cleanup_engine().clean(raw)
 
 # ---------------------------------------
 # 5) Inferencia NER y fusión de entidades
@@ -518,27 +784,130 @@ class SpanInfo:
     end: int
     score: Optional[float] = None
 
+def stable_ruler_ties(nlp) -> None:
+    """
+    El EntityRuler deduplica sus coincidencias con un set: entre dos del mismo largo e
+    inicio ("Sector 34": SECTOR y ZONA_SECTOR_ETAPA) gana una u otra según el resto del
+    documento, así que una ventana de chunking y el texto completo podían etiquetar
+    distinto. Desempate fijo: la etiqueta que aparece antes en ruler.patterns (se toma
+    antes de compile_ruler, que no cambia etiquetas).
+    """
+    strings = nlp.vocab.strings
+    for _, proc in nlp.pipeline:
+        if not isinstance(proc, EntityRuler):
+            continue
+        rank: Dict[str, int] = {}
+        for p in proc.patterns:
+            rank.setdefault(proc._create_label(p["label"], p["id"]) if "id" in p else p["label"], len(rank))
+        base = proc.match
+
+        def match(doc, base=base, rank=rank):
+            return sorted(base(doc), key=lambda m: (m[1] - m[2], m[1], rank.get(strings[m[0]], len(rank))))
+        proc.match = match
+
 def load_model(model_path: str = MODEL_PATH):
     try:
         nlp = spacy.load(model_path)
     except Exception as e:
         raise RuntimeError(f"No se pudo cargar el modelo spaCy en '{model_path}': {e}")
+    stable_ruler_ties(nlp)
+    if RULER_COMPILE:
+        compile_ruler(nlp)
     return nlp
 
 _NLP: Optional[spacy.Language] = None
+_NLP_LOCK = threading.Lock()
 def get_nlp():
     global _NLP
     if _NLP is None:
-        _NLP = load_model(MODEL_PATH)
+        with _NLP_LOCK:  # el calentamiento y el primer request pueden llegar a la vez
+            if _NLP is None:
+                _NLP = load_model(MODEL_PATH)
     return _NLP
 
-def run_ner(text: str) -> List[SpanInfo]:
+def _doc_to_spans(doc) -> List[SpanInfo]:
+    return [
+        SpanInfo(ent.label_, ent.text, ent.start_char, ent.end_char, getattr(ent, "kb_id_", None))
+        for ent in doc.ents
+    ]
+
+def resolve_mode(mode: Optional[str] = None) -> str:
+    """ Prioridad: argumento > CATASTRO_EXTRACTION_MODE; ValueError si no es un modo conocido. """
+    m = (mode or EXTRACTION_MODE or "full").lower()
+    if m not in EXTRACTION_MODES:
+        raise ValueError(f"Modo de extracción desconocido: '{mode}' (usa {', '.join(EXTRACTION_MODES)})")
+    return m
+
+def neural_pipes(nlp) -> List[str]:
+    """ Componentes con modelo entrenable (tok2vec, ner...): los que salta el modo rules-only. """
+    return [name for name, proc in nlp.pipeline if hasattr(proc, "model")]
+
+def run_ner(text: str, mode: str = "full") -> List[SpanInfo]:
+    """ mode: "full" (pipeline completo) o "rules-only" (solo entity_ruler). """
+    if _CHUNK_RUNNER is not None or (CHUNK_CHARS and len(text) > CHUNK_CHARS):
+        return run_ner_chunked(text, mode)
+    nlp = get_nlp()
+    if mode == "rules-only":
+        return _doc_to_spans(nlp(text, disable=neural_pipes(nlp)))
+    return _doc_to_spans(nlp(text))
+
+def _ner_chunks_local(chunks: List[str], mode: str) -> List[List[SpanInfo]]:
     nlp = get_nlp()
-    doc = nlp(text)
-    spans: List[SpanInfo] = []
-    for ent in doc.ents:
-        spans.append(SpanInfo(ent.label_, ent.text, ent.start_char, ent.end_char, getattr(ent, "kb_id_", None)))
-    return spans
+    disable = neural_pipes(nlp) if mode == "rules-only" else []
+    return [_doc_to_spans(nlp(c, disable=disable)) for c in chunks]
+
+# En el proceso de la API con pool: reparte las ventanas entre los workers (ver start_pool)
+_CHUNK_RUNNER: Optional[Callable[[List[str], str], List[List[SpanInfo]]]] = None
+
+def run_ner_chunked(text: str, mode: str = "full") -> List[SpanInfo]:
+    """
+    NER por ventanas solapadas alineadas a oraciones (chunking.py), con offsets globales y
+    sin duplicados en los solapes. Un texto que cabe en una ventana da el mismo resultado
+    que nlp(text). Las ventanas corren en paralelo si hay pool; si no, una tras otra
+    (memoria acotada por ventana).
+    """
+    windows = plan_windows(text, CHUNK_CHARS or len(text) or 1, CHUNK_OVERLAP)
+    chunks = [text[a:b] for a, b in windows]
+    per_window = (_CHUNK_RUNNER or _ner_chunks_local)(chunks, mode)
+    return merge_spans(windows, per_window, len(text))
+
+def resolve_batch_size(batch_size: Optional[int] = None) -> int:
+    """ Prioridad: argumento > CATASTRO_BATCH_SIZE > [nlp] batch_size del modelo (1000). """
+    bs = batch_size or NLP_BATCH_SIZE or getattr(get_nlp(), "batch_size", None) or 1000
+    return max(1, int(bs))
+
+def run_ner_batch(texts: List[str], batch_size: Optional[int] = None, mode: str = "full") -> List[Any]:
+    """
+    NER en lote con nlp.pipe. Devuelve una lista alineada con `texts`:
+    cada elemento es List[SpanInfo] o la excepción que produjo ese documento.
+    Si el lote completo falla, se reintenta documento a documento para aislar al culpable.
+    """
+    if CHUNK_CHARS and any(len(t) > CHUNK_CHARS for t in texts):
+        # los largos van por ventanas; el resto sigue en un solo nlp.pipe
+        out: List[Any] = [None] * len(texts)
+        short = [i for i, t in enumerate(texts) if len(t) <= CHUNK_CHARS]
+        for i, spans in zip(short, run_ner_batch([texts[i] for i in short], batch_size, mode) if short else []):
+            out[i] = spans
+        for i, t in enumerate(texts):
+            if out[i] is None and len(t) > CHUNK_CHARS:
+                try:
+                    out[i] = run_ner_chunked(t, mode)
+                except Exception as e:
+                    out[i] = e
+        return out
+    nlp = get_nlp()
+    bs = resolve_batch_size(batch_size)
+    disable = neural_pipes(nlp) if mode == "rules-only" else []
+    try:
+        return [_doc_to_spans(doc) for doc in nlp.pipe(texts, batch_size=bs, disable=disable)]
+    except Exception:
+        out: List[Any] = []
+        for t in texts:
+            try:
+                out.append(_doc_to_spans(nlp(t, disable=disable)))
+            except Exception as e:
+                out.append(e)
+        return out
 
 def map_and_merge(spans: List[SpanInfo]) -> Tuple[Dict[str, List[SpanInfo]], Dict[str, List[SpanInfo]]]:
     """
@@ -571,18 +940,12 @@ class FieldResult:
     errors: List[str] = field(default_factory=list)
     sources: List[Dict[str, Any]] = field(default_factory=list)  # spans
 
-def normalize_field(key: str, value: str) -> str:
-    fn = NORMALIZERS.get(key, lambda x: x.strip() if isinstance(x, str) else x)
-    return fn(value or "")
+def normalize_field(key: str, value: str) -> Any:
+    return COMPILED_FIELDS.get(key, _DEFAULT_COMPILED).normalize(value or "")
 
-def validate_field(key: str, normalized: str) -> Tuple[bool, Optional[str]]:
-    if not normalized:
-        return False, "VACIO"
-    rx = VALIDATORS.get(key)
-    if rx is None:
-        return True, None  # sin regex dura -> lo damos por válido si no está vacío
-    ok = bool(rx.match(normalized))
-    return ok, (None if ok else "FORMATO_INVALIDO")
+def validate_field(key: str, normalized: Any) -> Tuple[bool, Optional[str]]:
+    # sin regex dura -> lo damos por válido si no está vacío
+    return COMPILED_FIELDS.get(key, _DEFAULT_COMPILED).validate(normalized)
 
 def pick_best_text(candidates: List[SpanInfo]) -> Optional[str]:
     if not candidates:
@@ -590,38 +953,69 @@ def pick_best_text(candidates: List[SpanInfo]) -> Optional[str]:
     # ya vienen ordenados por map_and_merge => tomamos el primero
     return candidates[0].text.strip()
 
-def infer_ubigeo(fields: Dict[str, FieldResult]) -> Optional[str]:
+def resolve_ubigeo(fields: Dict[str, FieldResult]) -> Optional[Dict[str, Any]]:
     """
-    Si tenemos DEPARTAMENTO / PROVINCIA / DISTRITO, intenta construir UBIGEO (6 dígitos)
-    desde el catálogo cargado.
+    1) Coincidencia exacta DEPARTAMENTO|PROVINCIA|DISTRITO en el catálogo.
+    2) Si falla (ASR: "Chorrios", palabras omitidas, sólo distrito...), resolver difuso
+       jerárquico. El resultado difuso lleva "confirmed": True si es único y su score
+       >= UBIGEO_FUZZY_MIN_SCORE (basta el distrito: "Chorrios" -> CHORRILLOS).
+       Empates reales ("Miraflores" sólo distrito: Lima y Arequipa) o score entre
+       UBIGEO_FUZZY_REVIEW_SCORE y el mínimo vuelven con "confirmed": False.
     """
     dep = (fields.get("DEPARTAMENTO") or FieldResult()).normalized or ""
     prov = (fields.get("PROVINCIA") or FieldResult()).normalized or ""
     dist = (fields.get("DISTRITO") or FieldResult()).normalized or ""
-    if not (dep and prov and dist):
+    if dep and prov and dist:
+        cat = load_ubigeo_catalog()
+        if cat:
+            key = f"{_normalize_place(dep)}|{_normalize_place(prov)}|{_normalize_place(dist)}"
+            ub = cat.get(key)
+            if ub:
+                return {"ubigeo": ub, "score": 1.0, "exact": True}
+    if not dist:
         return None
-    cat = load_ubigeo_catalog()
-    if not cat:
+    resolver = get_ubigeo_resolver()
+    if resolver is None:
         return None
-    key = f"{_normalize_place(dep)}|{_normalize_place(prov)}|{_normalize_place(dist)}"
-    return cat.get(key)
+    res = resolver.resolve(dep, prov, dist)
+    if res and res["score"] >= min(UBIGEO_FUZZY_REVIEW_SCORE, UBIGEO_FUZZY_MIN_SCORE):
+        return {**res, "confirmed": res["score"] >= UBIGEO_FUZZY_MIN_SCORE and not res["ambiguous"]}
+    return None
+
+def infer_ubigeo(fields: Dict[str, FieldResult]) -> Optional[str]:
+    """
+    Si tenemos DEPARTAMENTO / PROVINCIA / DISTRITO (o al menos DISTRITO), intenta construir
+    UBIGEO (6 dígitos) desde el catálogo cargado.
+    """
+    res = resolve_ubigeo(fields)
+    return res["ubigeo"] if res and (res["exact"] or res["confirmed"]) else None
 
-def build_fields(por_campo: Dict[str, List[SpanInfo]], full_text: Optional[str] = None) -> Dict[str, FieldResult]:
+def build_fields(por_campo: Dict[str, List[SpanInfo]], full_text: Optional[str] = None,
+                 memo: Optional[Dict[Tuple[str, Optional[str]], Any]] = None,
+                 audit: bool = True) -> Dict[str, FieldResult]:
+    """
+    memo : (campo, raw) -> (normalizado, válido, error); reutiliza lo ya normalizado en una revisión previa.
+    audit: False => no arma `sources` con los spans candidatos (perfiles sin auditoría).
+    """
     result: Dict[str, FieldResult] = {}
+    specs, default = COMPILED_FIELDS, _DEFAULT_COMPILED
     for key, candidates in por_campo.items():
-        fr = FieldResult()
-        fr.raw = pick_best_text(candidates)
-        fr.normalized = normalize_field(key, fr.raw or "")
-        ok, err = validate_field(key, fr.normalized or "")
-        fr.valid = ok
-        if err:
-            fr.errors.append(err)
-        # auditar spans
-        fr.sources = [
-            {"label": c.label, "text": c.text, "start": c.start, "end": c.end}
-            for c in candidates
-        ]
-        result[key] = fr
+        cf = specs.get(key, default)
+        raw = pick_best_text(candidates)
+        hit = memo.get((key, raw)) if memo is not None else None
+        if hit is None:
+            norm = cf.normalize(raw or "")
+            ok, err = cf.validate(norm or "")
+            if memo is not None:
+                memo[(key, raw)] = (norm, ok, err)
+        else:
+            norm, ok, err = hit
+        result[key] = FieldResult(
+            raw=raw, normalized=norm, valid=ok,
+            errors=[err] if err else [],
+            # auditar spans
+            sources=[{"label": c.label, "text": c.text, "start": c.start, "end": c.end} for c in candidates] if audit else [],
+        )
 
     # Protección específica
     if "ZONIFICACION" in result and (result["ZONIFICACION"].normalized or "").upper() == "DNI":
@@ -630,10 +1024,24 @@ def build_fields(por_campo: Dict[str, List[SpanInfo]], full_text: Optional[str]
 
     # UBIGEO (si no vino del modelo, inferir con catálogo)
     if "UBIGEO" not in result:
-        ub = infer_ubigeo(result)
-        if ub:
-            result["UBIGEO"] = FieldResult(raw=ub, normalized=ub, valid=True, errors=[],
-                                           sources=[{"label": "INFERIDO", "text": ub}])
+        with STAGE_SECONDS.time(("infer_ubigeo",)):
+            res = resolve_ubigeo(result)
+        if res:
+            ub = res["ubigeo"]
+            src: Dict[str, Any] = {"label": "INFERIDO", "text": ub}
+            if not res["exact"]:
+                src.update({
+                    "label": "INFERIDO_DIFUSO", "score": res["score"], "ambiguous": res["ambiguous"],
+                    "match": f"{res['departamento']}|{res['provincia']}|{res['distrito']}",
+                })
+            if res["exact"] or res["confirmed"]:
+                # difuso aceptado: la confianza queda en sources[0]["score"]
+                result["UBIGEO"] = FieldResult(raw=ub, normalized=ub, valid=True, errors=[], sources=[src])
+            else:
+                # empate o score bajo: se reporta para revisión, no como código válido
+                err = "UBIGEO_AMBIGUO" if res["ambiguous"] else "UBIGEO_SIN_CONFIRMAR"
+                result["UBIGEO"] = FieldResult(raw=ub, normalized=None, valid=False,
+                                               errors=[err], sources=[src])
 
     # Combinar MES + ANIO en FECHA_CONSTRUCCION si aplica
     if "FECHA_CONSTRUCCION" not in result:
@@ -676,7 +1084,17 @@ def build_fields(por_campo: Dict[str, List[SpanInfo]], full_text: Optional[str]
 # --------------------------------------------
 # 7) Salida JSON canónica + campos complementos
 # --------------------------------------------
-def assemble_output(text: str, spans: List[SpanInfo], fields: Dict[str, FieldResult]) -> Dict[str, Any]:
+def resolve_profile(profile: Optional[str] = None) -> str:
+    """ Prioridad: argumento > CATASTRO_RESPONSE_PROFILE; ValueError si no es un perfil conocido. """
+    p = (profile or RESPONSE_PROFILE or "full").lower()
+    if p not in RESPONSE_PROFILES:
+        raise ValueError(f"Perfil de respuesta desconocido: '{profile}' (usa {', '.join(RESPONSE_PROFILES)})")
+    return p
+
+def assemble_output(text: str, spans: List[SpanInfo], fields: Dict[str, FieldResult],
+                    profile: str = "full") -> Dict[str, Any]:
+    if profile == "normalized-values-only":
+        return {"fields": {k: fr.normalized for k, fr in fields.items()}}
     out = {
         "input_length": len(text),
         "fields": {},
@@ -685,11 +1103,12 @@ def assemble_output(text: str, spans: List[SpanInfo], fields: Dict[str, FieldRes
             "invalid_count": 0,
             "empty_count": 0
         },
-        "spans": [
+    }
+    if profile == "full":
+        out["spans"] = [
             {"label": s.label, "text": s.text, "start": s.start, "end": s.end}
             for s in spans
-        ],
-    }
+        ]
     valid_cnt = invalid_cnt = empty_cnt = 0
     for k, fr in fields.items():
         out["fields"][k] = {
@@ -697,8 +1116,9 @@ def assemble_output(text: str, spans: List[SpanInfo], fields: Dict[str, FieldRes
             "normalized": fr.normalized,
             "valid": fr.valid,
             "errors": fr.errors,
-            "sources": fr.sources
         }
+        if profile == "full":
+            out["fields"][k]["sources"] = fr.sources
         if (fr.normalized or "") == "":
             empty_cnt += 1
         elif fr.valid:
@@ -712,77 +1132,1096 @@ def assemble_output(text: str, spans: List[SpanInfo], fields: Dict[str, FieldRes
     })
     return out
 
+def project_output(out: Dict[str, Any], profile: str) -> Dict[str, Any]:
+    """ Salida completa -> perfil pedido (para caminos que necesitan la completa igual, p. ej. ediciones). """
+    if profile == "full":
+        return out
+    extra = {k: v for k, v in out.items() if k not in ("input_length", "fields", "summary", "spans")}
+    if profile == "normalized-values-only":
+        return {"fields": {k: f["normalized"] for k, f in out["fields"].items()}, **extra}
+    fields = {k: {kk: f[kk] for kk in ("raw", "normalized", "valid", "errors")} for k, f in out["fields"].items()}
+    return {"input_length": out["input_length"], "fields": fields, "summary": out["summary"], **extra}
+
 # ---------------------------------------
 # 8) Función principal de procesamiento
 # ---------------------------------------
-def process_text(raw_text: str) -> Dict[str, Any]:
-    cleaned = clean_text(raw_text)
-    spans = run_ner(cleaned)
-    por_campo, _ = map_and_merge(spans)
-    fields = build_fields(por_campo, full_text=cleaned)  # <-- pasa el texto completo
-    return assemble_output(cleaned, spans, fields)
+def _finish(cleaned: str, spans: List[SpanInfo], memo: Optional[Dict[Any, Any]] = None,
+            profile: str = "full") -> Dict[str, Any]:
+    DOC_CHARS.observe(len(cleaned))
+    DOC_SPANS.observe(len(spans))
+    with STAGE_SECONDS.time(("map_and_merge",)):
+        por_campo, _ = map_and_merge(spans)
+    with STAGE_SECONDS.time(("build_fields",)):
+        fields = build_fields(por_campo, full_text=cleaned, memo=memo,  # <-- pasa el texto completo
+                              audit=profile == "full")
+    with STAGE_SECONDS.time(("assemble_output",)):
+        return assemble_output(cleaned, spans, fields, profile)
+
+def _cache_config() -> Dict[str, Any]:
+    """ Configuración (env) que cambia la salida de process_text: entra en la huella de la caché. """
+    return {
+        "required_fields": REQUIRED_FIELDS,
+        "ubigeo_fuzzy": [UBIGEO_FUZZY_MIN_SCORE, UBIGEO_FUZZY_REVIEW_SCORE],
+        "chunk": [CHUNK_CHARS, CHUNK_OVERLAP],
+        "asr_corrections": str(ASR_CORRECTIONS_PATH),
+        "ruler_compile": RULER_COMPILE,
+    }
+
+_RESULT_CACHE: Optional[ResultCache] = None
+def get_result_cache() -> Optional[ResultCache]:
+    global _RESULT_CACHE
+    if not RESULT_CACHE_ENABLED:
+        return None
+    if _RESULT_CACHE is None:
+        here = Path(__file__).parent
+        fingerprint = compute_fingerprint(
+            Path(MODEL_PATH),
+            extra_files=[*UBIGEO_PATHS, Path(__file__), here / "asr_cleanup.py", here / "ubigeo_fuzzy.py",
+                         ASR_CORRECTIONS_PATH, *([here / "ruler_compiler.py"] if RULER_COMPILE else [])],
+            config=_cache_config(),
+        )
+        _RESULT_CACHE = ResultCache(
+            fingerprint,
+            max_bytes=int(RESULT_CACHE_MB * (1 << 20)),
+            disk_dir=Path(RESULT_CACHE_DIR) if RESULT_CACHE_DIR else None,
+            max_disk_bytes=int(RESULT_CACHE_DISK_MB * (1 << 20)),
+        )
+    return _RESULT_CACHE
+
+def _cache_get(cache: ResultCache, key: str) -> Optional[Dict[str, Any]]:
+    hit = cache.get(key)
+    CACHE_LOOKUPS.inc(("result", "miss" if hit is None else "hit"))
+    return hit
+
+def missing_required(out: Dict[str, Any]) -> List[str]:
+    """ Campos de REQUIRED_FIELDS sin valor normalizado en una salida de _finish. """
+    fields = out.get("fields") or {}
+    # en el perfil normalized-values-only cada campo ya es el valor normalizado
+    norm = lambda v: v.get("normalized") if isinstance(v, dict) else v
+    return [k for k in REQUIRED_FIELDS if norm(fields.get(k)) in (None, "")]
+
+def _tag(out: Dict[str, Any], mode: str, path: str, missing: Optional[List[str]] = None) -> Dict[str, Any]:
+    out["extraction"] = {"mode": mode, "path": path}
+    if missing:
+        out["extraction"]["missing_after_rules"] = missing
+    EXTRACTION_PATHS.inc((mode, path))
+    return out
+
+def _ner_stage(mode: str) -> Tuple[str]:
+    return ("run_ner_rules",) if mode == "rules-only" else ("run_ner",)
+
+def _extract(cleaned: str, mode: str, profile: str = "full") -> Dict[str, Any]:
+    """ NER según el modo + armado de la salida (con out["extraction"] = camino ejecutado). """
+    first = "rules-only" if mode == "auto" else mode
+    with STAGE_SECONDS.time(_ner_stage(first)):
+        spans = run_ner(cleaned, first)
+    out = _finish(cleaned, spans, profile=profile)
+    if mode != "auto":
+        return _tag(out, mode, mode)
+    missing = missing_required(out)
+    if not missing:
+        return _tag(out, mode, "rules-only")
+    with STAGE_SECONDS.time(_ner_stage("full")):
+        spans = run_ner(cleaned, "full")
+    return _tag(_finish(cleaned, spans, profile=profile), mode, "full", missing)
+
+def process_text(raw_text: str, mode: Optional[str] = None, profile: Optional[str] = None) -> Dict[str, Any]:
+    """
+    mode   : "full" | "rules-only" | "auto" (None => CATASTRO_EXTRACTION_MODE).
+    profile: "full" | "fields-only" | "normalized-values-only" (None => CATASTRO_RESPONSE_PROFILE).
+    """
+    mode = resolve_mode(mode)
+    profile = resolve_profile(profile)
+    try:
+        with STAGE_SECONDS.time(("total",)):
+            out = _process_text(raw_text, mode, profile)
+    except Exception:
+        DOCUMENTS.inc(("error",))
+        raise
+    DOCUMENTS.inc(("ok",))
+    return out
+
+def _cache_variant(mode: str, profile: str) -> str:
+    return mode if profile == "full" else f"{mode}|{profile}"
+
+def _process_text(raw_text: str, mode: str, profile: str = "full") -> Dict[str, Any]:
+    with STAGE_SECONDS.time(("clean_text",)):
+        cleaned = clean_text(raw_text)
+    cache = get_result_cache()
+    key = None
+    if cache is not None:
+        key = cache.key(cleaned, _cache_variant(mode, profile))
+        hit = _cache_get(cache, key)
+        if hit is not None:
+            return hit
+    out = _extract(cleaned, mode, profile)
+    if key is not None:
+        cache.put(key, out)
+    return out
+
+def _chunked(items: Iterable[Any], size: int) -> Iterator[List[Any]]:
+    buf: List[Any] = []
+    for it in items:
+        buf.append(it)
+        if len(buf) >= size:
+            yield buf
+            buf = []
+    if buf:
+        yield buf
+
+def _finish_batch(cleaned: List[Optional[str]], idx: List[int], mode: str, bs: int,
+                  profile: str = "full") -> Dict[int, Any]:
+    """ NER en lote para los índices `idx` + _finish; en "auto" re-pasa en lote sólo los incompletos. """
+    first = "rules-only" if mode == "auto" else mode
+    with STAGE_SECONDS.time((_ner_stage(first)[0] + "_batch",)):
+        ner_out = run_ner_batch([cleaned[i] for i in idx], batch_size=bs, mode=first)
+    outs: Dict[int, Any] = {}
+    retry: Dict[int, List[str]] = {}
+    for i, spans in zip(idx, ner_out):
+        if isinstance(spans, Exception):
+            outs[i] = spans
+            continue
+        try:
+            out = _finish(cleaned[i], spans, profile=profile)
+        except Exception as e:
+            outs[i] = e
+            continue
+        missing = missing_required(out) if mode == "auto" else None
+        if missing:
+            retry[i] = missing
+        else:
+            outs[i] = _tag(out, mode, first)
+    if retry:
+        todo = list(retry)
+        with STAGE_SECONDS.time(("run_ner_batch",)):
+            ner_out = run_ner_batch([cleaned[i] for i in todo], batch_size=bs, mode="full")
+        for i, spans in zip(todo, ner_out):
+            if isinstance(spans, Exception):
+                outs[i] = spans
+                continue
+            try:
+                outs[i] = _tag(_finish(cleaned[i], spans, profile=profile), mode, "full", retry[i])
+            except Exception as e:
+                outs[i] = e
+    return outs
+
+def process_texts(raw_texts: Iterable[str], batch_size: Optional[int] = None,
+                  mode: Optional[str] = None, profile: Optional[str] = None) -> Iterator[Dict[str, Any]]:
+    """
+    Versión en lote de process_text: limpia, pasa por nlp.pipe y arma la salida.
+    - Genera los resultados en el mismo orden de entrada (consume el iterable por lotes).
+    - Un documento con error produce {"error": "..."} sin tumbar el resto del lote.
+    """
+    mode = resolve_mode(mode)
+    profile = resolve_profile(profile)
+    bs = resolve_batch_size(batch_size)
+    cache = get_result_cache()
+    for chunk in _chunked(raw_texts, bs):
+        cleaned: List[Optional[str]] = []
+        errors: Dict[int, str] = {}
+        keys: Dict[int, str] = {}
+        hits: Dict[int, Dict[str, Any]] = {}
+        for i, raw in enumerate(chunk):
+            try:
+                with STAGE_SECONDS.time(("clean_text",)):
+                    c = clean_text(raw)
+            except Exception as e:
+                cleaned.append(None)
+                errors[i] = str(e)
+                continue
+            cleaned.append(c)
+            if cache is not None:
+                keys[i] = cache.key(c, _cache_variant(mode, profile))
+                hit = _cache_get(cache, keys[i])
+                if hit is not None:
+                    hits[i] = hit
+        todo = [i for i, c in enumerate(cleaned) if c is not None and i not in hits]
+        outs = _finish_batch(cleaned, todo, mode, bs, profile) if todo else {}
+        for i in range(len(chunk)):
+            if i in errors:
+                DOCUMENTS.inc(("error",))
+                yield {"error": errors[i]}
+                continue
+            if i in hits:
+                DOCUMENTS.inc(("ok",))
+                yield hits[i]
+                continue
+            out = outs[i]
+            if isinstance(out, Exception):
+                DOCUMENTS.inc(("error",))
+                yield {"error": str(out)}
+                continue
+            if cache is not None:
+                cache.put(keys[i], out)
+            DOCUMENTS.inc(("ok",))
+            yield out
+
+# --- Re-extracción incremental (transcripción corregida) ---
+def revision_from_output(raw_text: str, mode: str, out: Dict[str, Any]) -> Revision:
+    """ Revisión a partir de una salida de process_text (sirve también para resultados del pool/caché). """
+    spans = [SpanInfo(s["label"], s["text"], s["start"], s["end"]) for s in out.get("spans") or []]
+    path = (out.get("extraction") or {}).get("path") or ("full" if mode == "auto" else mode)
+    return Revision(raw=raw_text, cleaned=clean_text(raw_text), spans=spans, mode=mode, path=path)
+
+def _edit_region(text: str, a: int, b: int, context: int = EDIT_CONTEXT_SENTENCES) -> Tuple[int, int]:
+    """ [a, b) ampliado a oraciones completas + `context` oraciones a cada lado. """
+    cuts = [0] + sentence_starts(text) + [len(text)]
+    i = max(0, bisect_right(cuts, a) - 1 - context)
+    j = min(len(cuts) - 1, bisect_left(cuts, b) + context)
+    return cuts[i], cuts[j]
+
+def _rule_pipes(nlp) -> List[str]:
+    neural = set(neural_pipes(nlp))
+    return [name for name, _ in nlp.pipeline if name not in neural]
+
+def _apply_rules(cleaned: str, ner_spans: List[SpanInfo]) -> Optional[List[SpanInfo]]:
+    """
+    entity_ruler sobre el texto completo con doc.ents = `ner_spans`: lo mismo que hace
+    nlp(cleaned) tras el NER neuronal. None si un span no alinea con los tokens.
+    """
+    nlp = get_nlp()
+    doc = nlp.make_doc(cleaned)
+    ents = []
+    for sp in ner_spans:
+        span = doc.char_span(sp.start, sp.end, label=sp.label)
+        if span is None:
+            return None
+        ents.append(span)
+    doc.ents = ents
+    for name in _rule_pipes(nlp):
+        doc = nlp.get_pipe(name)(doc)
+    return _doc_to_spans(doc)
+
+def _old_ner_spans(rev: Revision) -> List[SpanInfo]:
+    """
+    Spans neuronales de la revisión anterior. Si no se guardaron (resultado de /extract),
+    con overwrite_ents son los spans finales que no ocupan la posición de una coincidencia
+    del ruler: las que se solapaban con una coincidencia ya no están en la salida y,
+    fuera de la zona editada, tampoco estarán en la nueva.
+    """
+    if rev.ner_spans is not None:
+        return rev.ner_spans
+    nlp = get_nlp()
+    if not all(getattr(nlp.get_pipe(n), "overwrite", True) for n in _rule_pipes(nlp)):
+        return _doc_to_spans(nlp(rev.cleaned, disable=_rule_pipes(nlp)))
+    ruled = {(sp.start, sp.end) for sp in run_ner(rev.cleaned, "rules-only")}
+    return [sp for sp in rev.spans if (sp.start, sp.end) not in ruled]
+
+def _splice(rev: Revision, cleaned: str) -> Tuple[List[SpanInfo], Optional[List[SpanInfo]], Dict[str, Any]]:
+    """
+    Spans del texto editado (camino "full") -> (spans, spans neuronales, stats).
+    El NER neuronal corre sólo sobre las oraciones tocadas: sus spans anteriores a la zona
+    se conservan y los posteriores se desplazan por la diferencia de largo. El entity_ruler
+    vuelve a correr sobre el texto completo (es la parte barata), así el desempate de
+    etiquetas entre coincidencias iguales es el mismo que en una pasada completa.
+    Con pool o ventanas (el modelo no corre entero en este proceso) se hace la pasada completa.
+    """
+    p, q_old, q_new = changed_region(rev.cleaned, cleaned)
+    stats = {"changed_chars": [p, q_new], "reanalyzed_chars": [0, len(cleaned)], "reused_spans": 0}
+    if _CHUNK_RUNNER is not None or _is_long(cleaned) or _is_long(rev.cleaned):
+        return run_ner(cleaned, "full"), None, stats
+    old_ner = _old_ner_spans(rev)
+    delta = len(cleaned) - len(rev.cleaned)
+    s, e = _edit_region(cleaned, p, q_new)
+    e_old = e - delta
+    # un span viejo que cruce el borde de la zona se re-analiza entero
+    for sp in old_ner:
+        if sp.start < s < sp.end:
+            s = sp.start
+        if sp.start < e_old < sp.end:
+            e_old = sp.end
+    e = e_old + delta
+    if e - s > EDIT_MAX_FRACTION * len(cleaned):
+        return run_ner(cleaned, "full"), None, stats
+    stats["reanalyzed_chars"] = [s, e]
+    nlp = get_nlp()
+    mid: List[SpanInfo] = []
+    if s < e:
+        # una oración más de contexto a cada lado (tok2vec mira tokens vecinos); sólo se
+        # toman los spans dentro de [s, e), el resto sigue siendo el de la revisión anterior
+        cs, ce = _edit_region(cleaned, s, e, 1)
+        with STAGE_SECONDS.time(("run_ner_edit",)):
+            for sp in _doc_to_spans(nlp(cleaned[cs:ce], disable=_rule_pipes(nlp))):
+                if s <= sp.start + cs and sp.end + cs <= e:
+                    mid.append(replace(sp, start=sp.start + cs, end=sp.end + cs))
+    before = [replace(sp) for sp in old_ner if sp.end <= s]
+    after = [replace(sp, start=sp.start + delta, end=sp.end + delta) for sp in old_ner if sp.start >= e_old]
+    ner_spans = before + mid + after
+    with STAGE_SECONDS.time(_ner_stage("rules-only")):
+        spans = _apply_rules(cleaned, ner_spans)
+    if spans is None:
+        return run_ner(cleaned, "full"), None, {**stats, "reanalyzed_chars": [0, len(cleaned)]}
+    stats["reused_spans"] = len(before) + len(after)
+    return spans, ner_spans, stats
+
+def reextract(rev: Revision, new_raw: str, verify: Optional[bool] = None) -> Tuple[Dict[str, Any], Revision, Dict[str, Any]]:
+    """
+    Resultado del texto editado `new_raw` reutilizando la revisión anterior.
+    Debe coincidir con process_text(new_raw, rev.mode); con verify=True se compara contra
+    una pasada completa y, si difiere, se devuelve la completa.
+    """
+    verify = EDIT_VERIFY if verify is None else verify
+    mode = rev.mode
+    with STAGE_SECONDS.time(("clean_text",)):
+        cleaned = clean_text(new_raw)
+    memo = rev.memo if len(rev.memo) < 4096 else {}
+    computed = len(memo)
+    missing: Optional[List[str]] = None
+    ner_spans: Optional[List[SpanInfo]] = None
+    if mode == "auto" and rev.path == "full":
+        # ¿las reglas bastan ahora? (pasada de reglas completa: es la parte barata)
+        with STAGE_SECONDS.time(_ner_stage("rules-only")):
+            rule_spans = run_ner(cleaned, "rules-only")
+        out = _finish(cleaned, rule_spans, memo)
+        missing = missing_required(out)
+        if missing:
+            spans, ner_spans, stats = _splice(rev, cleaned)
+            path, out = "full", _finish(cleaned, spans, memo)
+        else:
+            spans, stats, path = rule_spans, {"reanalyzed_chars": [0, len(cleaned)]}, "rules-only"
+    elif rev.path == "full":
+        path = "full"
+        spans, ner_spans, stats = _splice(rev, cleaned)
+        out = _finish(cleaned, spans, memo)
+    else:
+        # sólo reglas: la pasada completa del ruler es lo barato y da el mismo desempate
+        path = rev.path
+        with STAGE_SECONDS.time(_ner_stage("rules-only")):
+            spans = run_ner(cleaned, "rules-only")
+        p, _, q_new = changed_region(rev.cleaned, cleaned)
+        stats = {"changed_chars": [p, q_new], "reanalyzed_chars": [0, len(cleaned)], "reused_spans": 0}
+        out = _finish(cleaned, spans, memo)
+        if mode == "auto":
+            missing = missing_required(out)
+            if missing:
+                with STAGE_SECONDS.time(_ner_stage("full")):
+                    spans = run_ner(cleaned, "full")
+                path, out = "full", _finish(cleaned, spans, memo)
+    out = _tag(out, mode, path, missing if path == "full" else None)
+    stats["normalized_fields"] = len(memo) - computed
+    outcome = "incremental"
+    if verify:
+        ref = _extract(cleaned, mode)
+        stats["verified"] = json.dumps(ref, sort_keys=True, default=str) == json.dumps(out, sort_keys=True, default=str)
+        if not stats["verified"]:
+            outcome, out, ner_spans = "mismatch", ref, None
+            spans = [SpanInfo(s["label"], s["text"], s["start"], s["end"]) for s in ref["spans"]]
+            path = ref["extraction"]["path"]
+    INCREMENTAL_EDITS.inc((outcome,))
+    return out, Revision(raw=new_raw, cleaned=cleaned, spans=spans, mode=mode, path=path, memo=memo,
+                         ner_spans=ner_spans if path == "full" else None), stats
 
 # ---------------
 # 9) FastAPI App
 # ---------------
 class ExtractRequest(BaseModel):
     text: str
+    mode: Optional[str] = None  # "full" | "rules-only" | "auto"; None => CATASTRO_EXTRACTION_MODE
+    profile: Optional[str] = None  # "full" | "fields-only" | "normalized-values-only"; None => CATASTRO_RESPONSE_PROFILE
+
+class ExtractBatchRequest(BaseModel):
+    texts: List[str]
+    batch_size: Optional[int] = None  # None => batch_size del modelo (config.cfg)
+    mode: Optional[str] = None
+    profile: Optional[str] = None
+
+class TextEdit(BaseModel):
+    start: int  # offsets sobre el texto crudo enviado en la revisión anterior
+    end: int
+    text: str = ""
+
+class EditRequest(BaseModel):
+    edits: Optional[List[TextEdit]] = None
+    text: Optional[str] = None  # alternativa a `edits`: el texto corregido completo
+    verify: Optional[bool] = None  # None => CATASTRO_EDIT_VERIFY
+    profile: Optional[str] = None
+
+_POOL: Optional[NERWorkerPool] = None
+
+def start_pool(workers: Optional[int] = POOL_WORKERS) -> NERWorkerPool:
+    global _POOL, _CHUNK_RUNNER
+    if _POOL is None:
+        _POOL = NERWorkerPool(workers=workers, model_path=MODEL_PATH).start()
+        pool = _POOL
+        _CHUNK_RUNNER = lambda chunks, mode: pool.run_ner_chunks(chunks, mode)
+    return _POOL
+
+def stop_pool() -> None:
+    global _POOL, _CHUNK_RUNNER
+    if _POOL is not None:
+        _CHUNK_RUNNER = None
+        _POOL.shutdown(wait=True)
+        _POOL = None
+
+def _is_long(text: str) -> bool:
+    return bool(CHUNK_CHARS) and len(text) > CHUNK_CHARS
+
+def _batch_extract(items: List[Tuple[str, str, str]]) -> List[Any]:
+    """
+    batch_fn del MicroBatcher: items (texto, modo, perfil), agrupados por (modo, perfil)
+    en un lote cada uno. Un error por documento se devuelve como excepción.
+    """
+    groups: Dict[Tuple[str, str], List[int]] = {}
+    for i, (_, mode, profile) in enumerate(items):
+        groups.setdefault((mode, profile), []).append(i)
+    out: List[Any] = [None] * len(items)
+    for (mode, profile), idx in groups.items():
+        if _POOL is not None:
+            # las transcripciones largas reparten sus ventanas entre todos los workers
+            for i in [i for i in idx if _is_long(items[i][0])]:
+                try:
+                    out[i] = extract_one(items[i][0], mode, profile)
+                except Exception as e:
+                    out[i] = e
+            idx = [i for i in idx if out[i] is None]
+        texts = [items[i][0] for i in idx]
+        if not texts:
+            continue
+        if _POOL is not None:
+            results = _POOL.process_texts(texts, mode=mode, profile=profile)
+        else:
+            results = list(process_texts(texts, mode=mode, profile=profile))
+        for i, r in zip(idx, results):
+            out[i] = RuntimeError(r["error"]) if "error" in r else r
+    return out
+
+def extract_one(text: str, mode: Optional[str] = None, profile: Optional[str] = None) -> Dict[str, Any]:
+    """
+    process_text respetando el modo de ejecución activo (pool o local).
+    Con pool, una transcripción larga se limpia/arma en este proceso y sus ventanas NER
+    se reparten entre los workers (_CHUNK_RUNNER).
+    """
+    if _POOL is not None and not _is_long(text):
+        return _POOL.process_text(text, mode=mode, profile=profile)
+    return process_text(text, mode=mode, profile=profile)
+
+def extract_many(texts: List[str], mode: Optional[str] = None, profile: Optional[str] = None) -> List[Dict[str, Any]]:
+    """ process_texts respetando el modo de ejecución activo (pool o local); errores como {"error": ...}. """
+    if _POOL is not None:
+        return _POOL.process_texts(texts, mode=mode, profile=profile)
+    return list(process_texts(texts, mode=mode, profile=profile))
+
+def _check_mode(mode: Optional[str]) -> str:
+    try:
+        return resolve_mode(mode)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
 
-app = FastAPI(title="Pipeline Catastral NER -> JSON", version="1.0")
+def _check_profile(profile: Optional[str]) -> str:
+    try:
+        return resolve_profile(profile)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+def _respond(request: Request, payload: Any, gzip_min_bytes: int = 0):
+    """ JSON (orjson si está) o MessagePack según Accept; gzip sólo si se pide y el cuerpo es grande. """
+    try:
+        return render(payload, request.headers.get("accept"), request.headers.get("accept-encoding"),
+                      gzip_min_bytes=gzip_min_bytes)
+    except NotAcceptable as e:
+        raise HTTPException(status_code=406, detail=str(e))
+
+_BATCHER: Optional[MicroBatcher] = None
+
+def start_batcher(window_ms: float = MICROBATCH_WINDOW_MS, max_batch: int = MICROBATCH_MAX) -> MicroBatcher:
+    global _BATCHER
+    if _BATCHER is None:
+        _BATCHER = MicroBatcher(_batch_extract, window_ms=window_ms, max_batch=max_batch).start()
+    return _BATCHER
+
+def stop_batcher() -> None:
+    global _BATCHER
+    if _BATCHER is not None:
+        _BATCHER.stop()
+        _BATCHER = None
+
+_REVISIONS: Optional[RevisionStore] = None
+
+def get_revisions() -> Optional[RevisionStore]:
+    global _REVISIONS
+    if not REVISIONS_ENABLED:
+        return None
+    if _REVISIONS is None:
+        _REVISIONS = RevisionStore(max_items=REVISIONS_MAX, ttl_s=REVISIONS_TTL_S)
+    return _REVISIONS
+
+def _with_revision(raw_text: str, mode: str, out: Dict[str, Any]) -> Dict[str, Any]:
+    """ Guarda la revisión (para /extract/{id}/edit) y agrega su result_id a la respuesta. """
+    store = get_revisions()
+    if store is None or "spans" not in out:  # los perfiles livianos no traen spans para reutilizar
+        return out
+    return {**out, "result_id": store.put(revision_from_output(raw_text, mode, out))}
+
+_STORE: Optional[FichaStore] = None
+_STORE_LOCK = threading.Lock()
+
+def get_store() -> Optional[FichaStore]:
+    global _STORE
+    if STORE_PATH is None:
+        return None
+    if _STORE is None:
+        with _STORE_LOCK:
+            if _STORE is None:
+                _STORE = FichaStore(Path(STORE_PATH), batch_size=STORE_BATCH, flush_ms=STORE_FLUSH_MS,
+                                    max_pending=STORE_MAX_PENDING).start()
+    return _STORE
+
+def stop_store() -> None:
+    global _STORE
+    if _STORE is not None:
+        _STORE.stop()
+        _STORE = None
+
+def _persist(out: Dict[str, Any], source: str) -> Dict[str, Any]:
+    """ Encola la ficha en el almacén (si está activo) y agrega su ficha_id a la respuesta. """
+    store = get_store()
+    if store is None or "error" in out:
+        return out
+    # sin spans ni fuentes: lo que sirve para consultar, no para re-extraer
+    fid = store.add(project_output(out, "fields-only") if "summary" in out else out, source)
+    return {**out, "ficha_id": fid} if fid else out
+
+def _persist_job(out: Dict[str, Any]) -> Dict[str, Any]:
+    return _persist(out, "job")  # ya con "asr": la ficha guardada es la misma que devuelve GET /jobs/{id}
+
+_JOBS: Optional[JobManager] = None
+
+def get_jobs() -> JobManager:
+    global _JOBS
+    if _JOBS is None:
+        _JOBS = JobManager(transcribe_audio, extract_one, max_workers=JOB_WORKERS,
+                           max_pending=JOB_MAX_PENDING, ttl_s=JOB_TTL_S, finish_fn=_persist_job,
+                           callback_hosts=JOB_CALLBACK_HOSTS, callback_allow_private=JOB_CALLBACK_ALLOW_PRIVATE)
+    return _JOBS
+
+def stop_jobs() -> None:
+    global _JOBS
+    if _JOBS is not None:
+        _JOBS.shutdown(wait=True)
+        _JOBS = None
+
+# Precarga y calentamiento (CATASTRO_PRELOAD)
+_READY = threading.Event()
+_STARTUP: Dict[str, Any] = {}
+
+def warmup(docs: int = WARMUP_DOCS) -> int:
+    """
+    Lote sintético por ambos modos de NER + normalización/validación + resolver UBIGEO,
+    sin pasar por la caché de resultados (un reinicio con caché en disco no lo saltea).
+    """
+    texts = [clean_text(t) for t in generate_corpus(docs, seed=0)]
+    nlp = get_nlp()
+    for disable in ([], neural_pipes(nlp)):
+        for cleaned, doc in zip(texts, nlp.pipe(texts, disable=disable)):
+            spans = _doc_to_spans(doc)
+            por_campo, _ = map_and_merge(spans)
+            assemble_output(cleaned, spans, build_fields(por_campo, full_text=cleaned))
+    return len(texts)
+
+def preload(warmup_docs: int = WARMUP_DOCS) -> Dict[str, Any]:
+    """
+    Carga lo que normalmente es perezoso (modelo, catálogo, resolver, limpieza), calienta
+    y congela el heap (gc.freeze) para que el GC no toque las páginas compartidas tras el
+    fork. Con pool, el modelo y el calentamiento van en los workers.
+    """
+    t0 = time.perf_counter()
+    get_cleanup_engine()
+    load_ubigeo_catalog()
+    get_ubigeo_resolver()
+    if _POOL is None:
+        get_nlp()
+    t1 = time.perf_counter()
+    if warmup_docs:
+        if _POOL is not None:
+            _POOL.warmup(warmup_docs)
+        else:
+            warmup(warmup_docs)
+    t2 = time.perf_counter()
+    if GC_FREEZE:
+        gc.collect()
+        gc.freeze()
+    _STARTUP.update({"pid": os.getpid(), "load_s": round(t1 - t0, 3), "warmup_s": round(t2 - t1, 3),
+                     "warmup_docs": warmup_docs, "gc_frozen": gc.get_freeze_count() if GC_FREEZE else 0})
+    _READY.set()
+    return dict(_STARTUP)
+
+def _preload_in_background() -> None:
+    try:
+        preload()
+    except Exception as e:
+        _STARTUP["error"] = str(e)
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    if EXEC_MODE == "pool":
+        start_pool()
+    if MICROBATCH:
+        start_batcher()
+    if PRELOAD and not _READY.is_set():
+        # bajo gunicorn --preload el master ya lo hizo (el Event llega marcado tras el fork)
+        threading.Thread(target=_preload_in_background, name="catastro-preload", daemon=True).start()
+    try:
+        yield
+    finally:
+        stop_jobs()
+        stop_asr_client()
+        stop_batcher()
+        stop_pool()
+        stop_store()  # al final: los trabajos que terminan todavía encolan fichas
+
+app = FastAPI(title="Pipeline Catastral NER -> JSON", version="1.0", lifespan=lifespan)
+
+def _runtime_gauges():
+    """ Estado al momento del scrape: pool, micro-batching, trabajos y cachés. """
+    out = []
+    if _POOL is not None:
+        st = _POOL.stats()
+        out.append(("catastro_pool_workers", "Procesos NER del pool", {(): st["workers"]}, ()))
+        out.append(("catastro_pool_restarts", "Reinicios del pool por caída de un worker", {(): st["restarts"]}, ()))
+    if _BATCHER is not None:
+        st = _BATCHER.stats()
+        out.append(("catastro_microbatch_queued", "Pedidos esperando micro-lote", {(): st["queued"]}, ()))
+        out.append(("catastro_microbatch_avg_batch", "Tamaño medio de micro-lote", {(): st["avg_batch"]}, ()))
+    if _JOBS is not None:
+        out.append(("catastro_jobs", "Trabajos en memoria por estado",
+                    {(k,): v for k, v in _JOBS.stats()["jobs"].items()}, ("status",)))
+    caches = {}
+    if RESULT_CACHE_ENABLED and _RESULT_CACHE is not None:
+        caches["result"] = _RESULT_CACHE.stats()["bytes"]
+    audio_cache = get_audio_cache()
+    if audio_cache is not None:
+        caches["audio"] = audio_cache.stats()["bytes"]
+    if caches:
+        out.append(("catastro_cache_bytes", "Bytes ocupados por caché",
+                    {(k,): v for k, v in caches.items()}, ("cache",)))
+    asr = asr_client_stats()
+    if asr is not None:
+        out.append(("catastro_asr_inflight", "Transcripciones AssemblyAI en curso", {(): asr["inflight"]}, ()))
+        out.append(("catastro_asr_queued", "Transcripciones esperando turno", {(): asr["queued"]}, ()))
+    if _STORE is not None:
+        st = _STORE.stats()
+        out.append(("catastro_store_pending", "Fichas esperando escritura en el almacén", {(): st["pending"]}, ()))
+        out.append(("catastro_store_fichas", "Fichas del almacén por resultado de escritura",
+                    {(k,): st[k] for k in ("written", "dropped", "errors")}, ("outcome",)))
+    return out
+
+REGISTRY.add_collector(_runtime_gauges)
+
+app.add_middleware(UploadLimitMiddleware, max_bytes=int(MAX_UPLOAD_MB * (1 << 20)),
+                   paths=("/transcribir", "/transcribir_extract", "/jobs"))
+
+@app.middleware("http")
+async def _request_metrics(request: Request, call_next):
+    t0 = time.perf_counter()
+    code = "500"
+    try:
+        response = await call_next(request)
+        code = str(response.status_code)
+        return response
+    finally:
+        route = request.scope.get("route")
+        REQUEST_SECONDS.observe(time.perf_counter() - t0,
+                                (request.method, getattr(route, "path", "otros"), code))
+
+@app.get("/metrics", response_class=PlainTextResponse)
+def metrics():
+    """ Métricas en formato de exposición de Prometheus (text/plain 0.0.4). """
+    return PlainTextResponse(REGISTRY.render(), media_type="text/plain; version=0.0.4; charset=utf-8")
 
 @app.get("/health")
 def health():
+    if PRELOAD and not _READY.is_set():
+        # todavía calentando: el balanceador no debe mandar tráfico a esta réplica
+        return JSONResponse({"status": "error" if "error" in _STARTUP else "warming", "ready": False,
+                             **_STARTUP}, status_code=503)
     # Fuerza carga de modelo para detectar problemas temprano
-    _ = get_nlp()
+    # (en modo pool el modelo vive en los workers; no se carga en el proceso de la API)
+    if _POOL is None:
+        _ = get_nlp()
     _ = load_ubigeo_catalog()
     has_ubigeo = bool(UBIGEO_CACHE)
     has_aai = bool(os.getenv("ASSEMBLYAI_API_KEY"))
-    return {"status": "ok", "model_loaded": True, "ubigeo_loaded": has_ubigeo, "assemblyai_key": has_aai}
+    out = {"status": "ok", "ready": True, "model_loaded": True, "ubigeo_loaded": has_ubigeo, "assemblyai_key": has_aai,
+           "exec_mode": "pool" if _POOL is not None else "local",
+           "extraction_mode": EXTRACTION_MODE, "required_fields": REQUIRED_FIELDS,
+           "asr_backend": ASR_BACKEND, "asr_backends": list(BACKENDS),
+           "response_profile": RESPONSE_PROFILE}
+    if _POOL is not None:
+        out["pool"] = _POOL.stats()
+    if _BATCHER is not None:
+        out["microbatch"] = _BATCHER.stats()
+    cache = get_result_cache()
+    if cache is not None:
+        out["result_cache"] = cache.stats()
+    audio_cache = get_audio_cache()
+    if audio_cache is not None:
+        out["audio_cache"] = audio_cache.stats()
+    if _REVISIONS is not None:
+        out["revisions"] = _REVISIONS.stats()
+    if _STORE is not None:
+        out["ficha_store"] = _STORE.stats()
+    asr = asr_client_stats()
+    if asr is not None:
+        out["asr_client"] = asr
+    if _STARTUP:
+        out["startup"] = dict(_STARTUP)
+    return out
 
 @app.post("/extract")
-def extract(req: ExtractRequest):
-    return process_text(req.text)
+async def extract(req: ExtractRequest, request: Request):
+    mode = _check_mode(req.mode)
+    profile = _check_profile(req.profile)
+    if _BATCHER is not None:
+        try:
+            out = await asyncio.wrap_future(_BATCHER.submit((req.text, mode, profile)))
+        except Exception as e:
+            raise HTTPException(status_code=500, detail=str(e))
+    else:
+        out = await run_in_threadpool(extract_one, req.text, mode, profile)
+    return _respond(request, _persist(await run_in_threadpool(_with_revision, req.text, mode, out), "extract"))
 
-@app.post("/transcribir")
-async def transcribir(file: UploadFile = File(...)):
+@app.post("/extract/{result_id}/edit")
+def extract_edit(result_id: str, req: EditRequest, request: Request):
+    """
+    Re-extracción tras corregir la transcripción de un resultado previo de /extract:
+    sólo se re-analizan las oraciones tocadas. Devuelve lo mismo que /extract con el
+    texto editado (con un nuevo result_id) más "incremental" con lo reutilizado.
+    """
+    profile = _check_profile(req.profile)
+    store = get_revisions()
+    rev = store.get(result_id) if store is not None else None
+    if rev is None:
+        raise HTTPException(status_code=404, detail="Resultado no encontrado (o expirado).")
+    if (req.edits is None) == (req.text is None):
+        raise HTTPException(status_code=400, detail="Envía `edits` o `text` (uno de los dos).")
     try:
-        audio_bytes = await file.read()
-        return transcribe_audio(audio_bytes)
+        new_raw = req.text if req.text is not None else apply_edits(
+            rev.raw, [{"start": e.start, "end": e.end, "text": e.text} for e in req.edits])
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    try:
+        out, new_rev, stats = reextract(rev, new_raw, verify=req.verify)
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
+    # la revisión necesita la salida completa (spans); el perfil sólo recorta la respuesta
+    out = _persist(out, "edit")
+    return _respond(request, {**project_output(out, profile), "result_id": store.put(new_rev), "incremental": stats})
+
+@app.post("/extract_batch")
+def extract_batch(req: ExtractBatchRequest, request: Request):
+    """
+    Procesa varias fichas en una sola llamada (nlp.pipe).
+    Los resultados respetan el orden de `texts`; los fallidos traen {"error": ...}.
+    Con Accept-Encoding: gzip, las respuestas de más de CATASTRO_GZIP_MIN_KB van comprimidas.
+    """
+    mode = _check_mode(req.mode)
+    profile = _check_profile(req.profile)
+    if _POOL is not None:
+        results = _POOL.process_texts(req.texts, batch_size=req.batch_size, mode=mode, profile=profile)
+    else:
+        results = list(process_texts(req.texts, batch_size=req.batch_size, mode=mode, profile=profile))
+    results = [_persist(r, "extract_batch") for r in results]
+    failed = sum(1 for r in results if "error" in r)
+    return _respond(request, {
+        "results": results,
+        "summary": {"total": len(results), "ok": len(results) - failed, "failed": failed},
+    }, gzip_min_bytes=int(GZIP_MIN_KB * 1024))
+
+def _check_backend(backend: Optional[str]) -> str:
+    try:
+        return resolve_backend(backend)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+def _transcription_error(e: Exception) -> HTTPException:
+    """ Cliente ASR saturado (429) o proveedor no disponible (503), con Retry-After; lo demás 500. """
+    if isinstance(e, TranscriptionUnavailable):
+        return HTTPException(status_code=e.status_code, detail=str(e),
+                             headers={"Retry-After": str(max(1, round(e.retry_after)))})
+    return HTTPException(status_code=500, detail=str(e))
+
+@app.post("/transcribir")
+async def transcribir(file: UploadFile = File(...), backend: Optional[str] = Form(None)):
+    backend = _check_backend(backend)
+    try:
+        # file.file ya está en disco (Starlette); se sube en streaming sin leerlo entero
+        return await run_in_threadpool(transcribe_audio, file.file, backend)
+    except Exception as e:
+        raise _transcription_error(e)
 
 @app.post("/transcribir_extract")
-async def transcribir_y_extraer(file: UploadFile = File(...)):
+async def transcribir_y_extraer(request: Request, file: UploadFile = File(...), mode: Optional[str] = Form(None),
+                                backend: Optional[str] = Form(None), profile: Optional[str] = Form(None)):
     """
     1) Transcribe audio -> texto
     2) Pasa por clean_text + NER + normalización + validación
     3) Retorna JSON canónico con summary
     """
+    mode = _check_mode(mode)
+    profile = _check_profile(profile)
+    backend = _check_backend(backend)
     try:
-        audio_bytes = await file.read()
-        t = transcribe_audio(audio_bytes)
-        result = process_text(t.get("text") or "")
+        t = await run_in_threadpool(transcribe_audio, file.file, backend)
+        result = await run_in_threadpool(extract_one, t.get("text") or "", mode, profile)
         # opcional: incluir metadatos de ASR
         result["asr"] = {
             "confidence": t.get("confidence"),
             "num_words": len(t.get("words") or []),
+            "timing": t.get("timing"),
         }
-        return result
     except Exception as e:
+        raise _transcription_error(e)
+    return _respond(request, _persist(result, "transcribir_extract"))
+
+@app.post("/jobs", status_code=202)
+async def crear_job(file: UploadFile = File(...), callback_url: Optional[str] = Form(None),
+                    backend: Optional[str] = Form(None)):
+    """
+    Encola transcripción + extracción y devuelve el job_id sin esperar.
+    Consultar luego GET /jobs/{job_id}; si se pasa callback_url se hace POST con el job final.
+    """
+    backend = _check_backend(backend)
+    if callback_url:
+        try:  # antes de volcar el audio; resolver el host puede bloquear
+            await run_in_threadpool(get_jobs().check_callback, callback_url)
+        except CallbackRejected as e:
+            raise HTTPException(status_code=400, detail=str(e))
+    # el trabajo corre después del request: el audio pasa a un archivo propio, por bloques
+    path = await run_in_threadpool(spool_to_disk, file.file, UPLOAD_DIR, UPLOAD_CHUNK_KB << 10)
+    remove = lambda: path.unlink(missing_ok=True)
+    try:
+        return get_jobs().submit(path, callback_url=callback_url,
+                                 meta={"filename": file.filename, "backend": backend},
+                                 on_done=remove, transcribe_kwargs={"backend": backend})
+    except JobQueueFull as e:
+        remove()
+        raise HTTPException(status_code=503, detail=str(e))
+    except CallbackRejected as e:  # la resolución cambió entre la validación y el encolado
+        remove()
+        raise HTTPException(status_code=400, detail=str(e))
+
+@app.post("/export")
+async def exportar(file: UploadFile = File(...), format: str = Form("xlsx"), mode: Optional[str] = Form(None),
+                   text_field: str = Form("text"), id_field: str = Form("id")):
+    """
+    Extracción + exportación masiva: NDJSON ({"id", "text"} por línea) -> una fila por ficha.
+    format: xlsx | csv | parquet. El CSV sale en streaming mientras se procesa; xlsx y
+    parquet se escriben a un archivo temporal (por filas) y se descargan al terminar.
+    """
+    try:
+        fmt = resolve_format(format)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    mode = _check_mode(mode)
+    columns = columns_from_label_map(LABEL_MAP)
+    lines = io.TextIOWrapper(file.file, encoding="utf-8", errors="ignore")
+    rows = iter_results(iter_ndjson_lines(lines, text_field=text_field, id_field=id_field),
+                        lambda texts: extract_many(texts, mode, "fields-only"), window=EXPORT_WINDOW)
+    filename = f"fichas.{fmt}"
+    if fmt == "csv":
+        # generador síncrono: Starlette lo itera en el threadpool
+        return StreamingResponse(iter_csv_chunks(rows, columns), media_type=EXPORT_MEDIA_TYPES[fmt],
+                                 headers={"Content-Disposition": f'attachment; filename="{filename}"'})
+    fd, name = tempfile.mkstemp(suffix=f".{fmt}", dir=UPLOAD_DIR)
+    os.close(fd)
+    path = Path(name)
+    try:
+        await run_in_threadpool(export_rows, rows, path, columns, fmt)
+    except RuntimeError as e:  # p. ej. falta pyarrow
+        path.unlink(missing_ok=True)
         raise HTTPException(status_code=500, detail=str(e))
+    return FileResponse(path, media_type=EXPORT_MEDIA_TYPES[fmt], filename=filename,
+                        background=BackgroundTask(path.unlink, missing_ok=True))
+
+@app.get("/jobs/{job_id}")
+def consultar_job(job_id: str):
+    job = get_jobs().get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Trabajo no encontrado.")
+    return job
+
+def _require_store() -> FichaStore:
+    store = get_store()
+    if store is None:
+        raise HTTPException(status_code=404, detail="Almacén de fichas desactivado (configura CATASTRO_STORE).")
+    return store
+
+@app.get("/fichas")
+def buscar_fichas(cuc: Optional[str] = None, dni: Optional[str] = None, ubigeo: Optional[str] = None,
+                  desde: Optional[str] = None, hasta: Optional[str] = None, limit: int = 50, offset: int = 0):
+    """
+    Fichas guardadas, más recientes primero. Filtros combinados: cuc, dni, ubigeo y fecha
+    de proceso (desde/hasta en ISO; `hasta` con sólo fecha incluye ese día). P. ej.
+    /fichas?cuc=... para saber si un CUC ya se capturó, /fichas?dni=... para los otros
+    predios del titular. Lo recién extraído aparece tras el siguiente lote de escritura.
+    """
+    store = _require_store()
+    try:
+        since, until = parse_when(desde), parse_when(hasta, end=True)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=f"Fecha inválida (usa ISO, p. ej. 2024-05-31): {e}")
+    items = store.search(cuc=cuc, dni=dni, ubigeo=ubigeo, since=since, until=until, limit=limit, offset=offset)
+    return {"items": items, "count": len(items), "offset": offset}
+
+@app.get("/fichas/{ficha_id}")
+def consultar_ficha(ficha_id: str):
+    ficha = _require_store().get(ficha_id)
+    if ficha is None:
+        raise HTTPException(status_code=404, detail="Ficha no encontrada.")
+    return ficha
+
+# Dictado en vivo: NER sólo sobre cada segmento final nuevo (ver streaming.py)
+def _stream_build(text: str, spans: List[SpanInfo]) -> Dict[str, Any]:
+    por_campo, _ = map_and_merge(spans)
+    return assemble_output(text, spans, build_fields(por_campo, full_text=text))
+
+def new_dictation_session(mode: str) -> DictationSession:
+    """ En "auto" cada segmento va por el pipeline completo (son cortos; no hay pasada posterior). """
+    ner_mode = "full" if mode == "auto" else mode
+
+    def ner(cleaned: str) -> List[SpanInfo]:
+        with STAGE_SECONDS.time(("stream_segment",)):
+            return run_ner(cleaned, ner_mode)  # con pool, run_ner lo delega a un worker
+
+    return DictationSession(clean_text, ner, _stream_build)
+
+@app.websocket("/ws/dictado")
+async def dictado(ws: WebSocket, mode: Optional[str] = None, asr: Optional[str] = None):
+    """
+    Cliente -> servidor:
+      binario                                      chunk de audio para el ASR en streaming (?asr=fake|assemblyai)
+      {"type": "segment", "text": ..., "final": b} segmento ya transcrito (final por defecto)
+      {"type": "end"}                              cierra el dictado
+    Servidor -> cliente:
+      {"type": "ready"} | {"type": "partial", "text"} | {"type": "fields", "updated", "fields", ...}
+      | {"type": "final", "result": <JSON canónico>} | {"type": "error", "detail"}
+    """
+    await ws.accept()
+    try:
+        mode = resolve_mode(mode)
+    except ValueError as e:
+        await ws.send_json({"type": "error", "detail": str(e)})
+        await ws.close(code=1008)
+        return
+    session = new_dictation_session(mode)
+    backend = None
+
+    async def handle(events: List[AsrEvent]) -> None:
+        for ev in events:
+            if not ev.final:
+                await ws.send_json({"type": "partial", "text": ev.text})
+                continue
+            msg = await run_in_threadpool(session.add_final, ev.text)
+            if msg is not None:
+                await ws.send_json(msg)
+
+    await ws.send_json({"type": "ready", "mode": mode})
+    try:
+        while True:
+            message = await ws.receive()
+            if message["type"] == "websocket.disconnect":
+                return
+            if message.get("bytes") is not None:
+                if backend is None:
+                    backend = await run_in_threadpool(make_streaming_asr, asr)
+                await handle(await run_in_threadpool(backend.feed, message["bytes"]))
+                continue
+            try:
+                msg = parse_client_message(message.get("text") or "")
+            except ValueError as e:
+                await ws.send_json({"type": "error", "detail": str(e)})
+                continue
+            if msg["type"] == "segment":
+                await handle([AsrEvent(msg["text"], bool(msg.get("final", True)))])
+                continue
+            if backend is not None:
+                await handle(await run_in_threadpool(backend.finish))
+            await ws.send_json(session.final())
+            await ws.close()
+            return
+    except WebSocketDisconnect:
+        pass
+    except Exception as e:
+        try:
+            await ws.send_json({"type": "error", "detail": str(e)})
+            await ws.close(code=1011)
+        except Exception:
+            pass
+    finally:
+        if backend is not None:
+            backend.close()
 
 # ------------------------
 # 10) CLI para uso directo
 # ------------------------
+def run_bulk_cli(args) -> int:
+    """ Modo masivo: NDJSON / directorio de .txt -> NDJSON, en paralelo y reanudable. """
+    import sys
+    from bulk import Checkpoint, iter_input, run_bulk
+
+    src = Path(args.input)
+    if not src.exists():
+        print(f"No existe la entrada: {src}", file=sys.stderr)
+        return 1
+    out = Path(args.output)
+    ckpt = Checkpoint(Path(args.checkpoint) if args.checkpoint else out.with_name(out.name + ".ckpt"), src)
+    mode = resolve_mode(args.mode)
+    profile = resolve_profile(args.profile)
+    bs = resolve_batch_size(args.batch_size) if args.workers == 1 else (args.batch_size or NLP_BATCH_SIZE or 256)
+    pool = None
+    if args.workers != 1:
+        pool = NERWorkerPool(workers=args.workers or POOL_WORKERS, model_path=MODEL_PATH).start()
+        extract_batch = lambda texts: pool.process_texts(texts, batch_size=bs, mode=mode, profile=profile)
+        window = args.window or pool.workers * bs
+    else:
+        extract_batch = lambda texts: list(process_texts(texts, batch_size=bs, mode=mode, profile=profile))
+        window = args.window or bs
+
+    def progress(st: Dict[str, Any]) -> None:
+        if not args.quiet:
+            print(json.dumps(st), file=sys.stderr)
+
+    try:
+        stats = run_bulk(iter_input(src, text_field=args.text_field, id_field=args.id_field),
+                         out, extract_batch, ckpt, window=window, progress=progress)
+    except KeyboardInterrupt:
+        print(f"Interrumpido; se reanuda desde {ckpt.path} ({ckpt.done} registros hechos)", file=sys.stderr)
+        return 130
+    finally:
+        if pool is not None:
+            pool.shutdown(wait=True)
+    print(json.dumps(stats, ensure_ascii=False))
+    return 0
+
 if __name__ == "__main__":
     import argparse, sys
     p = argparse.ArgumentParser(description="Pipeline Catastral (NER->JSON)")
     p.add_argument("--file", "-f", help="Ruta de archivo de texto a procesar")
     p.add_argument("--text", "-t", help="Texto directo a procesar")
+    p.add_argument("--mode", "-m", choices=EXTRACTION_MODES, default=None,
+                   help="full | rules-only | auto (por defecto CATASTRO_EXTRACTION_MODE)")
+    p.add_argument("--profile", "-p", choices=RESPONSE_PROFILES, default=None,
+                   help="full | fields-only | normalized-values-only (por defecto CATASTRO_RESPONSE_PROFILE)")
+    # Modo masivo
+    p.add_argument("--input", "-i", help="NDJSON ({'id','text'} por línea) o directorio de .txt (modo masivo)")
+    p.add_argument("--output", "-o", help="Archivo NDJSON de salida (modo masivo)")
+    p.add_argument("--checkpoint", help="Archivo de checkpoint (por defecto <output>.ckpt)")
+    p.add_argument("--workers", "-w", type=int, default=0, help="Procesos NER (0 = CATASTRO_WORKERS o cpu_count, 1 = sin pool)")
+    p.add_argument("--batch-size", type=int, default=None, help="Documentos por llamada a nlp.pipe")
+    p.add_argument("--window", type=int, default=0, help="Registros por ventana de checkpoint (0 = workers x batch)")
+    p.add_argument("--text-field", default="text", help="Campo de texto en el NDJSON")
+    p.add_argument("--id-field", default="id", help="Campo identificador en el NDJSON")
+    p.add_argument("--quiet", "-q", action="store_true", help="No reportar progreso por stderr")
     args = p.parse_args()
 
+    if args.input:
+        if not args.output:
+            print("El modo masivo requiere --output ruta.ndjson", file=sys.stderr)
+            sys.exit(1)
+        sys.exit(run_bulk_cli(args))
+
     if not args.text and not args.file:
-        print("Usa --text '...' o --file ruta.txt", file=sys.stderr)
+        print("Usa --text '...', --file ruta.txt o --input entrada --output salida.ndjson", file=sys.stderr)
         sys.exit(1)
 
     if args.file:
@@ -790,5 +2229,5 @@ if __name__ == "__main__":
     else:
         content = args.text
 
-    result = process_text(content)
+    result = process_text(content, mode=args.mode, profile=args.profile)
     print(json.dumps(result, ensure_ascii=False, indent=2))
@@ -0,0 +1,179 @@
+# -*- coding: utf-8 -*-
+"""
+Caché direccionada por contenido para los resultados de process_text.
+
+Clave = sha256(texto limpio + huella de versión). La huella resume el modelo
+(model-last-tuned), los patrones del entity_ruler, el catálogo UBIGEO, el propio
+código del pipeline y la configuración que altera la salida (campos obligatorios,
+umbrales UBIGEO, ventanas de NER, diccionario de limpieza...), así que al cambiar
+cualquiera de ellos las entradas viejas dejan de coincidir sin invalidación manual.
+
+Niveles:
+- memoria: LRU acotado por bytes (tamaño del JSON serializado)
+- disco (opcional): SQLite, sobrevive reinicios y se comparte entre procesos
+"""
+
+import json
+import time
+import sqlite3
+import hashlib
+import threading
+from pathlib import Path
+from collections import OrderedDict
+from typing import Any, Dict, Iterable, Mapping, Optional
+
+def _stat_line(p: Path) -> str:
+    try:
+        st = p.stat()
+        return f"{p.name}:{st.st_size}:{st.st_mtime_ns}"
+    except OSError:
+        return f"{p.name}:-"
+
+def compute_fingerprint(model_path: Path, extra_files: Iterable[Path] = (),
+                        config: Optional[Mapping[str, Any]] = None) -> str:
+    """
+    Huella de versión: contenido de los patrones/config del modelo, tamaño+mtime del
+    resto de archivos del modelo (pesos) y de `extra_files` (catálogo, código...) y
+    `config` (valores JSON-serializables que cambian la salida).
+    """
+    h = hashlib.sha256()
+    model_path = Path(model_path)
+    if model_path.exists():
+        for p in sorted(model_path.rglob("*")):
+            if not p.is_file():
+                continue
+            rel = p.relative_to(model_path).as_posix()
+            h.update(rel.encode("utf-8"))
+            if p.suffix in {".jsonl", ".cfg", ".json"} or p.name == "cfg":
+                h.update(hashlib.sha256(p.read_bytes()).digest())
+            else:
+                h.update(_stat_line(p).encode("utf-8"))
+    for p in extra_files:
+        h.update(_stat_line(Path(p)).encode("utf-8"))
+    if config:
+        h.update(json.dumps(config, sort_keys=True, default=str).encode("utf-8"))
+    return h.hexdigest()[:16]
+
+class ResultCache:
+    def __init__(self, fingerprint: str, max_bytes: int = 64 << 20,
+                 disk_dir: Optional[Path] = None, max_disk_bytes: int = 1 << 30):
+        self.fingerprint = fingerprint
+        self.max_bytes = max_bytes
+        self.max_disk_bytes = max_disk_bytes
+        self._mem: "OrderedDict[str, bytes]" = OrderedDict()
+        self._mem_bytes = 0
+        self._lock = threading.Lock()
+        self.hits_memory = self.hits_disk = self.misses = self.evictions = 0
+        self._db: Optional[sqlite3.Connection] = None
+        self._writes = 0
+        if disk_dir:
+            Path(disk_dir).mkdir(parents=True, exist_ok=True)
+            self._db = sqlite3.connect(str(Path(disk_dir) / "results.sqlite3"),
+                                       check_same_thread=False, timeout=5.0, isolation_level=None)
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute("PRAGMA synchronous=NORMAL")
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS results ("
+                " key TEXT PRIMARY KEY, value BLOB NOT NULL, size INTEGER NOT NULL, last_access REAL NOT NULL)"
+            )
+            self._db.execute("CREATE INDEX IF NOT EXISTS ix_results_access ON results(last_access)")
+
+    def key(self, cleaned: str, variant: str = "") -> str:
+        """ `variant` separa resultados del mismo texto con distinta configuración (p. ej. modo). """
+        h = hashlib.sha256(cleaned.encode("utf-8", "surrogatepass"))
+        h.update(b"\0" + self.fingerprint.encode("ascii"))
+        if variant:
+            h.update(b"\0" + variant.encode("utf-8"))
+        return h.hexdigest()
+
+    # -----------
+    # get / put
+    # -----------
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        """ Devuelve una copia nueva del resultado (los llamadores pueden mutarla). """
+        with self._lock:
+            blob = self._mem.get(key)
+            if blob is not None:
+                self._mem.move_to_end(key)
+                self.hits_memory += 1
+                return json.loads(blob)
+            if self._db is not None:
+                row = self._db.execute("SELECT value FROM results WHERE key = ?", (key,)).fetchone()
+                if row is not None:
+                    self.hits_disk += 1
+                    self._db.execute("UPDATE results SET last_access = ? WHERE key = ?", (time.time(), key))
+                    self._put_mem(key, bytes(row[0]))
+                    return json.loads(row[0])
+            self.misses += 1
+            return None
+
+    def put(self, key: str, result: Dict[str, Any]) -> None:
+        blob = json.dumps(result, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+        with self._lock:
+            self._put_mem(key, blob)
+            if self._db is not None:
+                self._db.execute(
+                    "INSERT OR REPLACE INTO results(key, value, size, last_access) VALUES (?, ?, ?, ?)",
+                    (key, blob, len(blob), time.time()),
+                )
+                self._writes += 1
+                if self._writes % 256 == 0:
+                    self._prune_disk()
+
+    def _put_mem(self, key: str, blob: bytes) -> None:
+        if len(blob) > self.max_bytes:
+            return
+        old = self._mem.pop(key, None)
+        if old is not None:
+            self._mem_bytes -= len(old)
+        self._mem[key] = blob
+        self._mem_bytes += len(blob)
+        while self._mem_bytes > self.max_bytes and self._mem:
+            _, ev = self._mem.popitem(last=False)
+            self._mem_bytes -= len(ev)
+            self.evictions += 1
+
+    def _prune_disk(self) -> None:
+        total = self._db.execute("SELECT COALESCE(SUM(size), 0) FROM results").fetchone()[0]
+        if total <= self.max_disk_bytes:
+            return
+        excess = total - int(self.max_disk_bytes * 0.9)
+        freed = 0
+        victims = []
+        for key, size in self._db.execute("SELECT key, size FROM results ORDER BY last_access"):
+            victims.append((key,))
+            freed += size
+            if freed >= excess:
+                break
+        self._db.executemany("DELETE FROM results WHERE key = ?", victims)
+
+    # -----------
+    # utilidades
+    # -----------
+    def clear(self) -> None:
+        with self._lock:
+            self._mem.clear()
+            self._mem_bytes = 0
+            if self._db is not None:
+                self._db.execute("DELETE FROM results")
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self.hits_memory + self.hits_disk + self.misses
+            return {
+                "fingerprint": self.fingerprint,
+                "entries": len(self._mem),
+                "bytes": self._mem_bytes,
+                "max_bytes": self.max_bytes,
+                "disk": self._db is not None,
+                "hits_memory": self.hits_memory,
+                "hits_disk": self.hits_disk,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": ((self.hits_memory + self.hits_disk) / lookups) if lookups else 0.0,
+            }
+
+    def close(self) -> None:
+        if self._db is not None:
+            self._db.close()
+            self._db = None
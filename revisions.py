@@ -0,0 +1,84 @@
+# -*- coding: utf-8 -*-
+"""
+Revisiones de resultados para la re-extracción incremental (POST /extract/{id}/edit).
+
+Cada resultado de /extract queda guardado (en memoria, LRU por cantidad + TTL) con lo
+necesario para reprocesar sólo lo editado: texto crudo, texto limpio, spans, modo y
+el camino ejecutado. La edición llega como reemplazos sobre el texto crudo anterior
+({"start", "end", "text"}) o como el texto completo nuevo; en ambos casos la zona
+afectada se calcula comparando los textos LIMPIOS (prefijo/sufijo común), así no
+depende de qué tan local sea clean_text.
+"""
+
+import time
+import uuid
+import threading
+from dataclasses import dataclass, field
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+@dataclass
+class Revision:
+    raw: str
+    cleaned: str
+    spans: List[Any]
+    mode: str
+    path: str  # camino de NER que produjo `spans` ("full" | "rules-only")
+    ner_spans: Optional[List[Any]] = None  # sólo NER neuronal, antes del entity_ruler (camino "full")
+    memo: Dict[Tuple[str, str], Any] = field(default_factory=dict)  # (campo, raw) -> normalización
+    created_at: float = field(default_factory=time.time)
+
+class RevisionStore:
+    def __init__(self, max_items: int = 1000, ttl_s: float = 3600.0):
+        self.max_items = max(1, max_items)
+        self.ttl_s = ttl_s
+        self._items: "OrderedDict[str, Revision]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def put(self, rev: Revision) -> str:
+        rid = uuid.uuid4().hex
+        with self._lock:
+            self._items[rid] = rev
+            while len(self._items) > self.max_items:
+                self._items.popitem(last=False)
+        return rid
+
+    def get(self, rid: str) -> Optional[Revision]:
+        with self._lock:
+            rev = self._items.get(rid)
+            if rev is None:
+                return None
+            if self.ttl_s and time.time() - rev.created_at > self.ttl_s:
+                del self._items[rid]
+                return None
+            self._items.move_to_end(rid)
+            return rev
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {"items": len(self._items), "max_items": self.max_items, "ttl_s": self.ttl_s}
+
+def apply_edits(text: str, edits: Sequence[Dict[str, Any]]) -> str:
+    """ Aplica reemplazos [start, end) -> text sobre `text`; ValueError si se salen o se solapan. """
+    ordered = sorted(edits, key=lambda e: (e["start"], e["end"]))
+    prev_end = 0
+    for e in ordered:
+        if not (0 <= e["start"] <= e["end"] <= len(text)):
+            raise ValueError(f"Edición fuera del texto: [{e['start']}, {e['end']}) con largo {len(text)}")
+        if e["start"] < prev_end:
+            raise ValueError(f"Ediciones solapadas en la posición {e['start']}")
+        prev_end = e["end"]
+    for e in reversed(ordered):
+        text = text[:e["start"]] + e["text"] + text[e["end"]:]
+    return text
+
+def changed_region(old: str, new: str) -> Tuple[int, int, int]:
+    """ (p, q_old, q_new): old[p:q_old] fue reemplazado por new[p:q_new]; el resto es idéntico. """
+    n = min(len(old), len(new))
+    p = 0
+    while p < n and old[p] == new[p]:
+        p += 1
+    s = 0
+    while s < n - p and old[-1 - s] == new[-1 - s]:
+        s += 1
+    return p, len(old) - s, len(new) - s
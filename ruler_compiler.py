@@ -0,0 +1,521 @@
+# -*- coding: utf-8 -*-
+"""
+Compilador de patrones del entity_ruler: menos predicados en Python por token.
+
+En el Matcher de spaCy los predicados en Python (REGEX, IN, comparaciones) se
+evalúan ANTES que los atributos nativos (ORTH, LOWER, LENGTH, IS_DIGIT...), que se
+comparan en C, así que un prefiltro nativo no ahorra la regex: hay que reemplazarla.
+Y cada patrón abre un estado en CADA token del documento, por lo que el predicado
+del primer token se evalúa en todos (los siguientes, sólo donde el patrón viene
+calzando). Etapas, todas equivalentes:
+
+1. Regex de un token anclada (^...$):
+   - de dígitos ASCII: ^[0-9]{8}$, ^[0-9]{1,3}$ -> IS_DIGIT + IS_ASCII + LENGTH
+   - de lenguaje finito: ^(01|02|03|04)$, (?i)^(enero|febrero)$ -> ORTH/LOWER igual a
+     un valor o IN un conjunto. Con (?i) sólo si equivale a comparar str.lower(): re
+     empareja además s con ſ, k con K (Kelvin), i con İ e ı
+2. Patrón cuyos tokens son todos literales en minúsculas (LOWER, LOWER IN, "OP": "?")
+   -> frases del PhraseMatcher, si el ruler compara por LOWER y el tokenizador
+   parte cada frase en exactamente esos tokens.
+3. (sólo al cargar, compile_ruler) REGEX / IN sobre ORTH, TEXT o LOWER y
+   comparaciones de LENGTH -> flags del vocabulario: dependen sólo del texto de la
+   palabra, así que spaCy los calcula una vez por palabra distinta y el Matcher los
+   compara en C. Hay 45 flags; van primero los predicados de primer token.
+4. Primer token que sigue con IN o LENGTH por rango -> un patrón por valor.
+
+Supuesto (lo comprueba `verify` sobre un corpus): un token nunca contiene espacios (el
+tokenizador los separa en tokens propios), así que \\s* dentro de una regex de un
+token sólo puede valer "". \\d no se expande: acepta también dígitos de otros
+alfabetos (０-９, ٠-٩...); esas regex quedan para la etapa 3.
+
+Las regex sin anclar (\\b\\d{12}\\b, "pisos?") buscan dentro del token: no se reescriben
+(etapa 1) pero sí pasan a flags (etapa 3).
+
+CLI:
+  python ruler_compiler.py stats  [--model ruta]
+  python ruler_compiler.py verify [--model ruta] [--docs 2000] [--input corpus.ndjson]
+  python ruler_compiler.py compile [--model ruta] --out patterns.compilados.jsonl   (etapas 1, 2 y 4)
+"""
+
+import re
+import sys
+import json
+import _sre
+import argparse
+import operator
+import itertools
+from typing import Any, Callable, Dict, Iterator, List, Optional, Set, Tuple
+
+try:  # Python 3.11+
+    import re._parser as sre_parse
+    import re._constants as sre_c
+    from re._casefix import _EXTRA_CASES
+except ImportError:  # Python <= 3.10
+    import sre_parse
+    import sre_constants as sre_c
+    from sre_compile import _ignorecase_fixes as _EXTRA_CASES
+
+from spacy.attrs import LOWER
+
+MAX_SET = 256      # valores máximos de un LOWER/ORTH IN generado
+MAX_PHRASES = 64   # frases máximas por patrón convertido
+MAX_SPLIT = 16     # alternativas máximas al desdoblar el primer token de un patrón
+
+# ------------------------------------
+# Regex de un token -> atributos nativos
+# ------------------------------------
+def _product(parts: List[Set[str]], limit: int) -> Optional[Set[str]]:
+    out = {""}
+    for p in parts:
+        if len(out) * max(1, len(p)) > limit:
+            return None
+        out = {a + b for a in out for b in p}
+    return out
+
+def _expand(items, limit: int) -> Optional[Set[str]]:
+    """ Lenguaje finito de una secuencia sre_parse, o None si es infinito o muy grande. """
+    parts: List[Set[str]] = []
+    for op, av in items:
+        if op is sre_c.LITERAL:
+            parts.append({chr(av)})
+        elif op is sre_c.IN:
+            chars = _expand_class(av)
+            if chars is None:
+                return None
+            parts.append(chars)
+        elif op is sre_c.SUBPATTERN:
+            _, add_flags, del_flags, sub = av
+            if add_flags or del_flags:
+                return None
+            s = _expand(sub, limit)
+            if s is None:
+                return None
+            parts.append(s)
+        elif op is sre_c.BRANCH:
+            union: Set[str] = set()
+            for alt in av[1]:
+                s = _expand(alt, limit)
+                if s is None:
+                    return None
+                union |= s
+                if len(union) > limit:
+                    return None
+            parts.append(union)
+        elif op in (sre_c.MAX_REPEAT, sre_c.MIN_REPEAT):
+            lo, hi, sub = av
+            s = _expand(sub, limit)
+            if s is None:
+                return None
+            s = {x for x in s if x}
+            if not s:  # sólo espacios (o vacío): dentro de un token únicamente vale ""
+                if lo:
+                    return set()
+                parts.append({""})
+                continue
+            if hi is sre_c.MAXREPEAT:
+                return None
+            reps: Set[str] = set()
+            for k in range(lo, hi + 1):
+                r = _product([s] * k, limit)
+                if r is None:
+                    return None
+                reps |= r
+            parts.append(reps)
+        else:  # ANY, AT en medio, NOT_LITERAL, referencias...
+            return None
+    return _product(parts, limit)
+
+def _expand_class(items) -> Optional[Set[str]]:
+    chars: Set[str] = set()
+    for op, av in items:
+        if op is sre_c.LITERAL:
+            chars.add(chr(av))
+        elif op is sre_c.RANGE:
+            lo, hi = av
+            if hi - lo > 64:
+                return None
+            chars.update(chr(c) for c in range(lo, hi + 1))
+        elif op is sre_c.CATEGORY and av is sre_c.CATEGORY_SPACE:
+            continue  # un token no contiene espacios
+        else:
+            return None
+    return chars
+
+_CASE_GROUPS: Optional[Dict[int, List[str]]] = None
+
+def _ignorecase_exact(value: str) -> bool:
+    """
+    ¿(?i) sobre `value` equivale a comparar str.lower()? No siempre: sre usa minúsculas
+    simples y casos extra (s ~ ſ, k ~ K de Kelvin, i ~ İ ~ ı), y "İ".lower() da dos caracteres.
+    """
+    global _CASE_GROUPS
+    if _CASE_GROUPS is None:
+        groups: Dict[int, List[str]] = {}
+        for cp in range(sys.maxunicode + 1):
+            low = _sre.unicode_tolower(cp)
+            if low != cp:
+                groups.setdefault(low, []).append(chr(cp))
+        _CASE_GROUPS = groups
+    for ch in set(value):
+        low = _sre.unicode_tolower(ord(ch))
+        if low in _EXTRA_CASES or ch.lower() != chr(low):
+            return False
+        if any(x.lower() != chr(low) for x in _CASE_GROUPS.get(low, ())):
+            return False
+    return True
+
+def _is_digit_class(items) -> bool:
+    """ [0-9] (no \\d, que acepta también dígitos de otros alfabetos: ０-９, ٠-٩...) """
+    return len(items) == 1 and items[0][0] is sre_c.IN and items[0][1] == [(sre_c.RANGE, (48, 57))]
+
+def compile_token_regex(regex: str, attr: str) -> Optional[Dict[str, Any]]:
+    """
+    Atributos equivalentes a {attr: {"REGEX": regex}} (attr: TEXT | ORTH | LOWER),
+    o None si no hay reescritura segura.
+    """
+    try:
+        parsed = sre_parse.parse(regex)
+    except Exception:
+        return None
+    flags = parsed.state.flags
+    if flags & ~(sre_c.SRE_FLAG_IGNORECASE | sre_c.SRE_FLAG_UNICODE):
+        return None
+    items = list(parsed)
+    if (len(items) < 3 or items[0] != (sre_c.AT, sre_c.AT_BEGINNING)
+            or items[-1] != (sre_c.AT, sre_c.AT_END)):
+        return None  # sin anclas la regex busca DENTRO del token
+    body = items[1:-1]
+    # ^[0-9]{n,m}$
+    if len(body) == 1 and body[0][0] is sre_c.MAX_REPEAT:
+        lo, hi, sub = body[0][1]
+        if _is_digit_class(list(sub)) and hi is not sre_c.MAXREPEAT and lo >= 1:
+            length: Any = lo if lo == hi else {">=": lo, "<=": hi}
+            return {"IS_DIGIT": True, "IS_ASCII": True, "LENGTH": length}
+    values = _expand(body, MAX_SET)
+    if values is None:
+        return None
+    ignorecase = bool(flags & sre_c.SRE_FLAG_IGNORECASE)
+    if ignorecase and not all(_ignorecase_exact(v) for v in values):
+        return None
+    if attr == "LOWER" or ignorecase:
+        if attr == "LOWER" and not ignorecase:
+            values = {v for v in values if v == v.lower()}  # lower_ nunca tiene mayúsculas
+        values, key = {v.lower() for v in values}, "LOWER"
+    else:
+        key = "ORTH"
+    values.discard("")
+    if not values:
+        return None  # p. ej. ^\s+$: se deja la regex
+    if len(values) == 1:
+        return {key: next(iter(values))}
+    return {key: {"IN": sorted(values)}}
+
+def compile_token(spec: Dict[str, Any]) -> Dict[str, Any]:
+    out = dict(spec)
+    for attr in ("TEXT", "ORTH", "LOWER"):
+        val = spec.get(attr)
+        if not (isinstance(val, dict) and set(val) == {"REGEX"}):
+            continue
+        repl = compile_token_regex(val["REGEX"], attr)
+        if repl is None or any(k in spec and k != attr for k in repl):
+            continue
+        del out[attr]
+        out.update(repl)
+    return out
+
+# ------------------------------
+# Patrones de tokens -> frases
+# ------------------------------
+def _literal_values(spec: Dict[str, Any]) -> Optional[List[str]]:
+    """ Valores en minúsculas si el token es un literal LOWER (o LOWER IN), si no None. """
+    keys = set(spec) - {"OP"}
+    if keys != {"LOWER"} or spec.get("OP") not in (None, "?"):
+        return None
+    v = spec["LOWER"]
+    if isinstance(v, str):
+        return [v]
+    if isinstance(v, dict) and set(v) == {"IN"} and all(isinstance(x, str) for x in v["IN"]):
+        return list(v["IN"])
+    return None
+
+def to_phrases(tokens: List[Dict[str, Any]], tokenize: Callable[[str], List[str]]) -> Optional[List[str]]:
+    options: List[List[Tuple[str, ...]]] = []
+    for spec in tokens:
+        vals = _literal_values(spec)
+        if vals is None:
+            return None
+        opts = [(v,) for v in vals] + ([()] if spec.get("OP") == "?" else [])
+        options.append(opts)
+    phrases = []
+    for combo in itertools.product(*options):
+        words = [w for part in combo for w in part]
+        if not words:
+            return None  # el patrón podría calzar vacío: no es una frase
+        phrase = " ".join(words)
+        if tokenize(phrase) != words:
+            return None  # el tokenizador la parte distinto: no sería equivalente
+        phrases.append(phrase)
+        if len(phrases) > MAX_PHRASES:
+            return None
+    return phrases
+
+def _native_alternatives(spec: Dict[str, Any]) -> Optional[List[Dict[str, Any]]]:
+    """ El token como alternativas con sólo atributos nativos (sin OP), o None. """
+    alts: List[Dict[str, Any]] = [{}]
+    for key, val in spec.items():
+        if key == "OP":
+            continue
+        if not isinstance(val, dict):
+            vals = [val]
+        elif set(val) == {"IN"} and key in ("ORTH", "TEXT", "LOWER") and val["IN"]:
+            vals = list(val["IN"])
+        elif key == "LENGTH" and set(val) == {">=", "<="}:
+            vals = list(range(val[">="], val["<="] + 1))
+        else:
+            return None
+        alts = [{**a, key: v} for a in alts for v in vals]
+        if not alts or len(alts) > MAX_SPLIT:
+            return None
+    return alts
+
+def split_first_token(tokens: List[Dict[str, Any]], budget: int = MAX_SPLIT) -> List[List[Dict[str, Any]]]:
+    """
+    [A, resto] -> [a1, resto], [a2, resto]...; [A?, resto] además -> resto (desdoblado a su vez).
+    Mismas coincidencias: el ruler junta las de todos los patrones de la etiqueta en un set.
+    """
+    if not tokens or not any(isinstance(v, dict) for v in tokens[0].values()):
+        return [tokens]
+    first, rest = tokens[0], tokens[1:]
+    op = first.get("OP")
+    alts = _native_alternatives(first) if op in (None, "?") else None
+    if alts is None or (op == "?" and not rest):
+        return [tokens]
+    out = [[a, *rest] for a in alts]
+    if op == "?":
+        tails = split_first_token(rest, budget - len(out))
+        out.extend(tails)
+    return out if len(out) <= budget else [tokens]
+
+# ------------------------------------------------
+# Predicados sobre el lexema -> flags (una vez por palabra)
+# ------------------------------------------------
+_LEXEME_ATTRS = {"ORTH": "ORTH", "TEXT": "ORTH", "LOWER": "LOWER", "LENGTH": "LENGTH"}
+_COMPARE = {"==": operator.eq, "!=": operator.ne, ">=": operator.ge, "<=": operator.le,
+            ">": operator.gt, "<": operator.lt}
+_FIRST_FREE_FLAG = 19  # 1..18 son IS_ALPHA, IS_DIGIT, LIKE_NUM... (spacy.attrs)
+
+def _lexeme_predicate(key: Any, val: Any) -> Optional[Tuple[str, str]]:
+    """ (atributo, valor JSON) si es un predicado en Python que sólo depende del lexema. """
+    attr = _LEXEME_ATTRS.get(key) if isinstance(key, str) else None
+    if attr is None or not isinstance(val, dict) or not val:
+        return None
+    if attr == "LENGTH":
+        ok = set(val) <= set(_COMPARE) and all(isinstance(v, int) for v in val.values())
+    elif set(val) == {"REGEX"}:
+        ok = isinstance(val["REGEX"], str)
+    elif set(val) in ({"IN"}, {"NOT_IN"}):
+        ok = all(isinstance(v, str) for v in next(iter(val.values())))
+    else:
+        ok = False
+    return (attr, json.dumps(val, sort_keys=True, ensure_ascii=False)) if ok else None
+
+def _flag_getter(attr: str, val: Dict[str, Any], lower: Callable[[str], str]) -> Callable[[str], bool]:
+    """ Misma semántica que los predicados del Matcher, evaluada sobre el texto del lexema. """
+    get = lower if attr == "LOWER" else (lambda s: s)
+    if attr == "LENGTH":
+        conds = [(_COMPARE[op], v) for op, v in val.items()]
+        return lambda s: all(cmp(len(s), v) for cmp, v in conds)
+    if "REGEX" in val:
+        rx = re.compile(val["REGEX"])
+        return lambda s: rx.search(get(s)) is not None
+    values = frozenset(next(iter(val.values())))
+    if "IN" in val:
+        return lambda s: get(s) in values
+    return lambda s: get(s) not in values
+
+def _python_predicates(patterns: List[Dict[str, Any]]) -> Dict[str, int]:
+    """ Predicados en Python distintos (spaCy los deduplica) en total y en el primer token. """
+    every, first = set(), set()
+    for p in patterns:
+        if isinstance(p["pattern"], str):
+            continue
+        for i, spec in enumerate(p["pattern"]):
+            for key, val in spec.items():
+                if isinstance(val, dict):
+                    k = (key, json.dumps(val, sort_keys=True, ensure_ascii=False))
+                    every.add(k)
+                    if i == 0:
+                        first.add(k)
+    return {"total": len(every), "first_token": len(first)}
+
+def assign_flags(patterns: List[Dict[str, Any]], vocab, max_flags: Optional[int] = None) -> int:
+    """
+    Reemplaza predicados REGEX / IN / NOT_IN sobre ORTH, TEXT o LOWER (y comparaciones de
+    LENGTH) por flags del vocabulario (vocab.add_flag): spaCy los calcula una vez por
+    palabra distinta y el Matcher los compara como atributo nativo. Hay 45 flags libres;
+    primero los predicados de primer token, luego los más usados. En el lugar; devuelve
+    cuántos flags se registraron.
+    Los patrones resultantes sólo valen para este `vocab` (no se guardan con to_disk).
+    """
+    uses: Dict[Tuple[str, str], List[int]] = {}
+    for p in patterns:
+        if isinstance(p["pattern"], str):
+            continue
+        for i, spec in enumerate(p["pattern"]):
+            for key, val in spec.items():
+                k = _lexeme_predicate(key, val)
+                if k is not None:
+                    u = uses.setdefault(k, [0, 0])
+                    u[0] += i == 0
+                    u[1] += 1
+    free = [b for b in range(_FIRST_FREE_FLAG, 64) if b not in vocab.lex_attr_getters]
+    if max_flags is not None:
+        free = free[:max_flags]
+    ranked = sorted(uses, key=lambda k: (uses[k][0] > 0, uses[k][1]), reverse=True)
+    lower = vocab.lex_attr_getters.get(LOWER, str.lower)
+    flags: Dict[Tuple[str, str], int] = {}
+    for k, bit in zip(ranked, free):
+        attr, val = k
+        flags[k] = vocab.add_flag(_flag_getter(attr, json.loads(val), lower), flag_id=bit)
+    for p in patterns:
+        if isinstance(p["pattern"], str):
+            continue
+        tokens = []
+        for spec in p["pattern"]:
+            new = {}
+            for key, val in spec.items():
+                bit = flags.get(_lexeme_predicate(key, val))
+                if bit is None:
+                    new[key] = val
+                else:
+                    new[bit] = True
+            tokens.append(new)
+        p["pattern"] = tokens
+    return len(flags)
+
+# ---------
+# Compilación
+# ---------
+def compile_patterns(patterns: List[Dict[str, Any]], tokenize: Optional[Callable[[str], List[str]]] = None,
+                     phrase_attr: Optional[str] = "LOWER", vocab=None) -> Tuple[List[Dict[str, Any]], Dict[str, Any]]:
+    """
+    tokenize: texto -> lista de tokens en minúsculas (para validar las frases); None => sin frases.
+    vocab: si se pasa, los predicados que quedan se vuelven flags de ese vocabulario (assign_flags).
+    Devuelve (patrones compilados, estadísticas).
+    """
+    stats: Dict[str, Any] = {"patterns": len(patterns), "python_predicates_before": _python_predicates(patterns),
+                             "tokens_rewritten": 0, "to_phrases": 0, "phrases": 0, "flags": 0, "first_token_split": 0}
+    staged: List[Dict[str, Any]] = []
+    for p in patterns:
+        pat = p["pattern"]
+        if isinstance(pat, str):
+            staged.append(p)
+            continue
+        tokens = [compile_token(spec) for spec in pat]
+        stats["tokens_rewritten"] += sum(a != b for a, b in zip(pat, tokens))
+        phrases = to_phrases(tokens, tokenize) if tokenize is not None and phrase_attr == "LOWER" else None
+        if phrases:
+            stats["to_phrases"] += 1
+            stats["phrases"] += len(phrases)
+            staged.extend({**{k: v for k, v in p.items() if k != "pattern"}, "pattern": ph} for ph in phrases)
+        else:
+            staged.append({**p, "pattern": tokens})
+    if vocab is not None:
+        stats["flags"] = assign_flags(staged, vocab)
+    out: List[Dict[str, Any]] = []
+    for p in staged:
+        split = split_first_token(p["pattern"]) if isinstance(p["pattern"], list) else [p["pattern"]]
+        stats["first_token_split"] += len(split) > 1
+        out.extend({**p, "pattern": t} for t in split)
+    stats["python_predicates_after"] = _python_predicates(out)
+    stats["compiled_patterns"] = len(out)
+    return out, stats
+
+def compile_ruler(nlp, name: str = "entity_ruler", flags: bool = True) -> Optional[Dict[str, Any]]:
+    """
+    Reemplaza en el lugar los patrones del ruler de `nlp` por los compilados.
+    flags=False: sólo reescrituras que se pueden guardar como patterns.jsonl.
+    """
+    if name not in nlp.pipe_names:
+        return None
+    ruler = nlp.get_pipe(name)
+    tokenizer = nlp.tokenizer
+    tokenize = lambda text: [t.lower_ for t in tokenizer(text)]
+    compiled, stats = compile_patterns(list(ruler.patterns), tokenize, getattr(ruler, "phrase_matcher_attr", None),
+                                       vocab=nlp.vocab if flags else None)
+    ruler.clear()
+    ruler.add_patterns(compiled)
+    return stats
+
+# ----------
+# Verificación
+# ----------
+def candidate_matches(nlp, texts: List[str], name: str = "entity_ruler",
+                      batch_size: int = 256) -> Iterator[Set[Tuple[str, int, int]]]:
+    """
+    Coincidencias del ruler (etiqueta, inicio, fin) antes de resolver solapes, por documento.
+    Se compara esto y no doc.ents: cuando dos etiquetas calzan el mismo span (p. ej.
+    SECTOR y ZONA_SECTOR_ETAPA en "Sector 12"), el ruler elige según el orden de un set,
+    que cambia con cualquier patrón agregado o quitado aunque las coincidencias sean las mismas.
+    """
+    ruler = nlp.get_pipe(name)
+    strings = nlp.vocab.strings
+    for doc in nlp.tokenizer.pipe(texts, batch_size=batch_size):
+        yield {(strings[m], s, e) for m, s, e in ruler.match(doc)}
+
+def verify(reference, compiled, texts: List[str], max_examples: int = 10) -> Dict[str, Any]:
+    diffs, n = [], 0
+    for i, (a, b) in enumerate(zip(candidate_matches(reference, texts), candidate_matches(compiled, texts))):
+        n += len(a)
+        if a != b:
+            diffs.append({"doc": i, "only_reference": sorted(a - b), "only_compiled": sorted(b - a),
+                          "text": texts[i][:300]})
+    return {"docs": len(texts), "matches": n, "mismatched_docs": len(diffs),
+            "identical": not diffs, "examples": diffs[:max_examples]}
+
+# ----
+# CLI
+# ----
+def main(argv) -> int:
+    import spacy
+    import pipeline_catastral as pc
+    from pathlib import Path
+    from synthetic import generate_corpus
+
+    p = argparse.ArgumentParser(description="Compilador de patrones del entity_ruler")
+    sub = p.add_subparsers(dest="cmd", required=True)
+    sub.add_parser("stats", help="predicados en Python antes y después de compilar").add_argument("--model", default=pc.MODEL_PATH)
+    v = sub.add_parser("verify", help="coincidencias idénticas (ruler original vs compilado) sobre un corpus")
+    v.add_argument("--model", default=pc.MODEL_PATH)
+    v.add_argument("--docs", type=int, default=2000, help="documentos sintéticos (synthetic.py)")
+    v.add_argument("--seed", type=int, default=0)
+    v.add_argument("--input", help="además, textos reales: NDJSON {'id','text'} o directorio de .txt")
+    c = sub.add_parser("compile", help="escribe los patrones compilados (JSONL)")
+    c.add_argument("--model", default=pc.MODEL_PATH)
+    c.add_argument("--out", required=True)
+    args = p.parse_args(argv)
+
+    nlp = spacy.load(args.model)
+    if args.cmd == "verify":
+        texts = [pc.clean_text(t) for t in generate_corpus(args.docs, seed=args.seed)]
+        if args.input:
+            from bulk import iter_input
+            texts += [pc.clean_text(t) for _, t, err in iter_input(Path(args.input)) if err is None]
+        compiled = spacy.load(args.model)
+        stats = compile_ruler(compiled)
+        res = {"compile": stats, **verify(nlp, compiled, texts)}
+        print(json.dumps(res, ensure_ascii=False, indent=2))
+        return 0 if res["identical"] else 1
+    stats = compile_ruler(nlp, flags=args.cmd != "compile")  # los flags no se pueden guardar
+    if stats is None:
+        print(f"El modelo {args.model} no tiene entity_ruler", file=sys.stderr)
+        return 1
+    if args.cmd == "compile":
+        with open(args.out, "w", encoding="utf-8") as f:
+            for pat in nlp.get_pipe("entity_ruler").patterns:
+                f.write(json.dumps(pat, ensure_ascii=False) + "\n")
+    print(json.dumps(stats, ensure_ascii=False))
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,82 @@
+# -*- coding: utf-8 -*-
+"""
+Codificación de respuestas por negociación de contenido.
+
+- Accept: application/json (por defecto)  -> orjson si está instalado, si no json estándar
+- Accept: application/msgpack             -> MessagePack (requiere `pip install msgpack`)
+- Accept-Encoding: gzip                   -> sólo si el llamador lo pide (lotes grandes) y
+                                             el cuerpo supera el mínimo configurado
+
+Las respuestas se arman directamente en bytes (sin jsonable_encoder de FastAPI), que
+en documentos largos era una parte visible del tiempo de respuesta.
+"""
+
+import json
+import gzip
+from typing import Any, Optional
+
+from starlette.responses import Response
+
+try:
+    import orjson
+except ImportError:  # opcional
+    orjson = None
+
+try:
+    import msgpack
+except ImportError:  # opcional
+    msgpack = None
+
+JSON = "application/json"
+MSGPACK = "application/msgpack"
+_MSGPACK_TYPES = {"application/msgpack", "application/x-msgpack", "application/vnd.msgpack"}
+_JSON_TYPES = {"application/json", "application/*", "*/*"}
+
+class NotAcceptable(ValueError):
+    pass
+
+def negotiate(accept: Optional[str]) -> str:
+    """ Tipo de respuesta según Accept (orden por q); NotAcceptable si no se puede servir ninguno. """
+    if not accept:
+        return JSON
+    prefs = []
+    for i, part in enumerate(accept.split(",")):
+        media, _, params = part.strip().partition(";")
+        q = 1.0
+        for prm in params.split(";"):
+            k, _, v = prm.strip().partition("=")
+            if k == "q":
+                try:
+                    q = float(v)
+                except ValueError:
+                    q = 0.0
+        prefs.append((-q, i, media.strip().lower()))
+    for neg_q, _, media in sorted(prefs):
+        if neg_q >= 0:
+            continue
+        if media in _MSGPACK_TYPES and msgpack is not None:
+            return MSGPACK
+        if media in _JSON_TYPES:
+            return JSON
+    raise NotAcceptable(f"Formatos disponibles: {JSON}" + (f", {MSGPACK}" if msgpack is not None else ""))
+
+def dumps_json(payload: Any) -> bytes:
+    if orjson is not None:
+        return orjson.dumps(payload, option=orjson.OPT_NON_STR_KEYS, default=str)
+    return json.dumps(payload, ensure_ascii=False, separators=(",", ":"), default=str).encode("utf-8")
+
+def dumps(payload: Any, media_type: str = JSON) -> bytes:
+    if media_type == MSGPACK:
+        return msgpack.packb(payload, use_bin_type=True, default=str)
+    return dumps_json(payload)
+
+def render(payload: Any, accept: Optional[str] = None, accept_encoding: Optional[str] = None,
+           gzip_min_bytes: int = 0, gzip_level: int = 5, status_code: int = 200) -> Response:
+    """ gzip_min_bytes=0 => nunca comprimir (respuestas de un documento). """
+    media_type = negotiate(accept)
+    body = dumps(payload, media_type)
+    headers = {"Vary": "Accept, Accept-Encoding"}
+    if gzip_min_bytes and len(body) >= gzip_min_bytes and "gzip" in (accept_encoding or "").lower():
+        body = gzip.compress(body, compresslevel=gzip_level)
+        headers["Content-Encoding"] = "gzip"
+    return Response(body, status_code=status_code, media_type=media_type, headers=headers)
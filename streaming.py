@@ -0,0 +1,192 @@
+# -*- coding: utf-8 -*-
+"""
+Dictado en tiempo real (WebSocket /ws/dictado) con extracción incremental.
+
+El inspector dicta y los campos van apareciendo mientras habla:
+- El cliente manda chunks de audio (mensajes binarios) a un ASR en streaming, o
+  directamente segmentos de transcripción ({"type": "segment", "text": ..., "final": bool}).
+- Sólo los segmentos FINALES pasan por clean_text + NER, y únicamente el segmento
+  nuevo: sus spans se desplazan al offset del texto acumulado. Los parciales se
+  reenvían tal cual para mostrarlos en pantalla.
+- Tras cada segmento se rearman los campos (map_and_merge + build_fields sobre los
+  spans acumulados, sin volver a correr el modelo) y se envían los que cambiaron.
+
+Las funciones de limpieza, NER y armado se inyectan (como en jobs.py), así la
+sesión se prueba con FakeStreamingASR y un modelo cualquiera, sin AssemblyAI.
+"""
+
+import os
+import json
+import time
+import queue
+import codecs
+import re
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, List, Optional
+
+# ----------------------
+# Backends de ASR en vivo
+# ----------------------
+@dataclass
+class AsrEvent:
+    text: str
+    final: bool
+
+class FakeStreamingASR:
+    """
+    ASR de prueba, local y determinista: los "chunks de audio" son texto UTF-8.
+    Emite un parcial con la oración en curso por cada chunk y un final por cada
+    oración terminada en . ! ? (el resto sale como final en finish()).
+    """
+
+    _END_RX = re.compile(r"[.!?]\s+")  # "15.50" no corta; "metros." espera al siguiente chunk
+
+    def __init__(self):
+        self._decoder = codecs.getincrementaldecoder("utf-8")(errors="ignore")
+        self._buf = ""
+
+    def feed(self, chunk: bytes) -> List[AsrEvent]:
+        self._buf += self._decoder.decode(chunk)
+        events: List[AsrEvent] = []
+        while True:
+            m = self._END_RX.search(self._buf)
+            if m is None:
+                break
+            sentence, self._buf = self._buf[:m.end()].strip(), self._buf[m.end():]
+            if sentence:
+                events.append(AsrEvent(sentence, True))
+        if self._buf.strip():
+            events.append(AsrEvent(self._buf.strip(), False))
+        return events
+
+    def finish(self) -> List[AsrEvent]:
+        rest, self._buf = (self._buf + self._decoder.decode(b"", final=True)).strip(), ""
+        return [AsrEvent(rest, True)] if rest else []
+
+    def close(self) -> None:
+        pass
+
+class AssemblyAIStreamingASR:
+    """
+    Streaming de AssemblyAI (SDK v3): PCM16 mono a `sample_rate` Hz; cada turno
+    terminado (end_of_turn) es un segmento final, los turnos en curso son parciales.
+    """
+
+    def __init__(self, sample_rate: int = 16000, api_key: Optional[str] = None):
+        import assemblyai as aai
+        from assemblyai.streaming.v3 import (StreamingClient, StreamingClientOptions,
+                                             StreamingEvents, StreamingParameters)
+        api_key = api_key or aai.settings.api_key
+        if not api_key:
+            raise RuntimeError("ASSEMBLYAI_API_KEY no está configurada.")
+        self._events: "queue.Queue[AsrEvent]" = queue.Queue()
+        self._client = StreamingClient(StreamingClientOptions(api_key=api_key))
+        self._client.on(StreamingEvents.Turn, self._on_turn)
+        self._client.connect(StreamingParameters(sample_rate=sample_rate, format_turns=True))
+
+    def _on_turn(self, _client, event) -> None:
+        if event.transcript:
+            self._events.put(AsrEvent(event.transcript, bool(event.end_of_turn and event.turn_is_formatted)))
+
+    def _drain(self) -> List[AsrEvent]:
+        out = []
+        while True:
+            try:
+                out.append(self._events.get_nowait())
+            except queue.Empty:
+                return out
+
+    def feed(self, chunk: bytes) -> List[AsrEvent]:
+        self._client.stream(chunk)
+        return self._drain()
+
+    def finish(self) -> List[AsrEvent]:
+        self._client.disconnect(terminate=True)  # espera el último turno
+        return self._drain()
+
+    def close(self) -> None:
+        try:
+            self._client.disconnect(terminate=False)
+        except Exception:
+            pass
+
+STREAM_ASR = os.getenv("CATASTRO_STREAM_ASR", "assemblyai").lower()
+STREAM_SAMPLE_RATE = int(os.getenv("CATASTRO_STREAM_SAMPLE_RATE", "16000"))
+
+def make_streaming_asr(name: Optional[str] = None):
+    name = (name or STREAM_ASR).lower()
+    if name == "fake":
+        return FakeStreamingASR()
+    if name == "assemblyai":
+        return AssemblyAIStreamingASR(sample_rate=STREAM_SAMPLE_RATE)
+    raise ValueError(f"ASR en streaming desconocido: '{name}' (usa fake, assemblyai)")
+
+# -----------------
+# Sesión de dictado
+# -----------------
+class DictationSession:
+    def __init__(self, clean_fn: Callable[[str], str], ner_fn: Callable[[str], List[Any]],
+                 build_fn: Callable[[str, List[Any]], Dict[str, Any]]):
+        """
+        clean_fn : texto crudo -> texto limpio (clean_text)
+        ner_fn   : texto limpio -> spans con .start/.end relativos a ese texto
+        build_fn : (texto acumulado, spans globales) -> salida canónica (fields, summary, spans)
+        """
+        self.clean_fn, self.ner_fn, self.build_fn = clean_fn, ner_fn, build_fn
+        self.text = ""
+        self.spans: List[Any] = []
+        self.fields: Dict[str, Any] = {}
+        self.output: Optional[Dict[str, Any]] = None
+        self.segments = 0
+        self.t0 = time.perf_counter()
+        self.first_field_ms: Optional[float] = None
+
+    def add_final(self, raw: str) -> Optional[Dict[str, Any]]:
+        """ Procesa un segmento final; devuelve el mensaje de actualización o None si no aporta texto. """
+        cleaned = self.clean_fn(raw).strip()
+        if not cleaned:
+            return None
+        offset = len(self.text) + 1 if self.text else 0
+        spans = self.ner_fn(cleaned)
+        for sp in spans:
+            sp.start += offset
+            sp.end += offset
+        self.text = f"{self.text} {cleaned}" if self.text else cleaned
+        self.spans.extend(spans)
+        self.segments += 1
+        self.output = self.build_fn(self.text, self.spans)
+        fields = self.output["fields"]
+        updated = {k: v for k, v in fields.items() if self.fields.get(k) != v}
+        removed = [k for k in self.fields if k not in fields]
+        self.fields = fields
+        elapsed_ms = (time.perf_counter() - self.t0) * 1000.0
+        if fields and self.first_field_ms is None:
+            self.first_field_ms = round(elapsed_ms, 1)
+        return {
+            "type": "fields",
+            "seq": self.segments,
+            "segment": cleaned,
+            "updated": updated,
+            "removed": removed,
+            "fields": {k: v["normalized"] for k, v in fields.items()},
+            "summary": self.output["summary"],
+            "elapsed_ms": round(elapsed_ms, 1),
+        }
+
+    def final(self) -> Dict[str, Any]:
+        out = self.output or self.build_fn(self.text, self.spans)
+        out["streaming"] = {"segments": self.segments, "first_field_ms": self.first_field_ms,
+                            "elapsed_ms": round((time.perf_counter() - self.t0) * 1000.0, 1)}
+        return {"type": "final", "result": out}
+
+def parse_client_message(data: str) -> Dict[str, Any]:
+    """ Mensaje de texto del cliente -> dict con "type" (segment | end). ValueError si no es válido. """
+    try:
+        msg = json.loads(data)
+    except ValueError as e:
+        raise ValueError(f"JSON inválido: {e}")
+    if not isinstance(msg, dict) or msg.get("type") not in ("segment", "end"):
+        raise ValueError('Se esperaba {"type": "segment", "text": ..., "final": bool} o {"type": "end"}')
+    if msg["type"] == "segment" and not isinstance(msg.get("text"), str):
+        raise ValueError("El segmento no trae 'text'")
+    return msg
@@ -0,0 +1,155 @@
+# -*- coding: utf-8 -*-
+"""
+Generador de dictados sintéticos de fichas catastrales (para benchmarks y pruebas de carga).
+
+- Cubre todos los campos de LABEL_MAP: plantillas específicas para los campos con
+  formato conocido (DNI, CUC, fechas, medidas, UBIGEO...) y una frase genérica
+  "<campo> <valor>" para el resto.
+- Ruido tipo ASR: dígitos partidos ("15, 000, 23"), las variantes mal transcritas que
+  corrige clean_text (asr_corrections.tsv), muletillas y espacios repetidos.
+- Largo variable: número de campos y relleno narrativo aleatorios.
+
+Determinista para una misma semilla:
+  from synthetic import generate_corpus
+  textos = generate_corpus(1000, seed=7)
+"""
+
+import random
+from typing import Callable, Dict, Iterable, List, Optional
+
+from asr_cleanup import DEFAULT_CORRECTIONS
+
+_NOMBRES = ["maría elena", "juan carlos", "rosa", "luis alberto", "carmen", "jorge", "ana lucía", "pedro"]
+_APELLIDOS = ["quispe", "huamán", "flores", "sánchez", "rojas", "mamani", "garcía", "torres", "díaz"]
+_VIAS = ["los jazmines", "primavera", "josé gálvez", "túpac amaru", "las begonias", "san martín"]
+_HABILITACIONES = ["los jardines", "santa rosa", "villa el salvador", "las flores", "el porvenir"]
+_LUGARES = [("lima", "lima", "miraflores"), ("lima", "lima", "san juan de lurigancho"),
+            ("lima", "lima", "chorrillos"), ("cusco", "cusco", "wanchaq"),
+            ("arequipa", "arequipa", "cayma"), ("piura", "piura", "castilla")]
+_MESES = ["enero", "febrero", "marzo", "abril", "mayo", "junio", "julio", "agosto",
+          "septiembre", "octubre", "noviembre", "diciembre"]
+_MATERIALES = ["concreto", "ladrillo", "madera", "adobe", "quincha"]
+_MULETILLAS = ["eh", "este", "bueno", "o sea", "ya", "mmm"]
+_RELLENO = [
+    "El inspector verificó el predio en presencia del titular.",
+    "Se deja constancia de lo observado en campo.",
+    "La vivienda cuenta con acceso por la vía principal.",
+    "No se encontraron observaciones adicionales durante la visita.",
+    "El vecino colindante confirmó los linderos indicados.",
+]
+
+def _digits(rnd: random.Random, n: int) -> str:
+    return "".join(rnd.choice("0123456789") for _ in range(n))
+
+def split_digits(rnd: random.Random, s: str) -> str:
+    """ '150002345' -> '15, 000, 23, 45' (como dicta un operador y transcribe el ASR). """
+    out, i = [], 0
+    while i < len(s):
+        k = rnd.choice((2, 2, 3))
+        out.append(s[i:i + k])
+        i += k
+    return rnd.choice((", ", " ", " , ")).join(out)
+
+def _num(rnd: random.Random, n: int, noise: float) -> str:
+    d = _digits(rnd, n)
+    return split_digits(rnd, d) if rnd.random() < noise else d
+
+def _medida(rnd: random.Random) -> str:
+    return f"{rnd.randint(3, 400)}.{rnd.randint(0, 99):02d} metros"
+
+def _fecha(rnd: random.Random) -> str:
+    return f"{rnd.randint(1, 28)} de {rnd.choice(_MESES)} del {rnd.randint(1970, 2024)}"
+
+# campo estándar -> plantilla(rnd, noise)
+_TEMPLATES: Dict[str, Callable[[random.Random, float], str]] = {
+    "NUMERO_FICHA": lambda r, z: f"Número de ficha {r.randint(1, 99999)}.",
+    "CODIGO_UNICO_CATASTRAL": lambda r, z: f"El código único catastral es {_num(r, 12, z)}.",
+    "CODIGO_REFERENCIA_CATASTRAL": lambda r, z: f"Código de referencia catastral {_digits(r, 10)}.",
+    "SECTOR": lambda r, z: f"Sector {r.randint(10, 99)}.",
+    "MANZANA": lambda r, z: f"Manzana {r.choice(['A', 'B', 'C', str(r.randint(1, 120))])}.",
+    "LOTE": lambda r, z: f"Lote {r.randint(1, 300)}.",
+    "SUBLOTE": lambda r, z: f"Sub lote {r.choice('ABCD')}.",
+    "CODIGO_CONTRIBUYENTE": lambda r, z: f"Código de contribuyente {_num(r, 7, z)}.",
+    "CODIGO_PREDIAL": lambda r, z: f"Código predial {_num(r, 7, z)}.",
+    "NOMBRE_VIA": lambda r, z: f"Avenida {r.choice(_VIAS)}.",
+    "NUMERO_MUNICIPAL": lambda r, z: f"Número municipal {r.randint(1, 2500)}.",
+    "NUMERO_INTERIOR": lambda r, z: f"Interior {r.randint(1, 20)}.",
+    "NOMBRE_HABILITACION": lambda r, z: f"Habilitación urbana {r.choice(_HABILITACIONES)}.",
+    "NUMERO_DOCUMENTO": lambda r, z: f"El titular tiene DNI {_num(r, 8, max(z, 0.5))}.",
+    "NOMBRES": lambda r, z: f"Nombres {r.choice(_NOMBRES)}.",
+    "APELLIDO_PATERNO": lambda r, z: f"Apellido paterno {r.choice(_APELLIDOS)}.",
+    "APELLIDO_MATERNO": lambda r, z: f"Apellido materno {r.choice(_APELLIDOS)}.",
+    "NUMERO_RUC": lambda r, z: f"RUC {_num(r, 11, z)}.",
+    "RAZON_SOCIAL": lambda r, z: f"Razón social inversiones {r.choice(_APELLIDOS)} sociedad anónima.",
+    "TELEFONO": lambda r, z: f"Teléfono 9{_num(r, 8, z)}.",
+    "CORREO_ELECTRONICO": lambda r, z: f"Correo {r.choice(_APELLIDOS)}{r.randint(1, 99)}@correo.com.",
+    "FECHA_ADQUISICION": lambda r, z: f"Fecha de adquisición {_fecha(r)}.",
+    "FECHA_CONSTRUCCION": lambda r, z: f"Fecha de construcción {r.randint(1970, 2024)}.",
+    "MES": lambda r, z: f"Construido en el mes de {r.choice(_MESES)}",
+    "ANIO": lambda r, z: f"del año {r.randint(1970, 2024)}.",
+    "AREA_TERRENO_ADQUIRIDA": lambda r, z: f"Área de terreno adquirida {_medida(r)}.",
+    "AREA_TERRENO_VERIFICADA": lambda r, z: f"Área de terreno verificada {_medida(r)}.",
+    "AREA_VERIFICADA": lambda r, z: f"Área verificada de construcción {_medida(r)}.",
+    "MEDIDA_FRENTE": lambda r, z: f"Medida por el frente {_medida(r)}.",
+    "MEDIDA_DERECHA": lambda r, z: f"Medida por la derecha {_medida(r)}.",
+    "MEDIDA_IZQUIERDA": lambda r, z: f"Medida por la izquierda {_medida(r)}.",
+    "MEDIDA_FONDO": lambda r, z: f"Medida por el fondo {_medida(r)}.",
+    "MEP": lambda r, z: f"Material estructural predominante {r.choice(_MATERIALES)}.",
+    "ZONIFICACION": lambda r, z: f"Zonificación {r.choice(['RDM', 'RDB', 'CZ', 'CV'])}.",
+    "DEPARTAMENTO": lambda r, z: f"Departamento de {r.choice(_LUGARES)[0]}.",
+    "PROVINCIA": lambda r, z: f"Provincia de {r.choice(_LUGARES)[1]}.",
+    "DISTRITO": lambda r, z: f"Distrito de {r.choice(_LUGARES)[2]}.",
+}
+for _s in ("LUZ", "AGUA", "TELEFONO", "DESAGUE", "GAS", "INTERNET", "TV"):
+    _TEMPLATES[f"SERVICIO_{_s}"] = (lambda s: lambda r, z: f"Servicio de {s.lower()} {r.choice(['sí', 'no'])}.")(_s)
+
+# Variantes mal transcritas que corrige clean_text (corrección -> [variantes])
+_MISSPELLINGS: Dict[str, List[str]] = {}
+for _wrong, _right in DEFAULT_CORRECTIONS.items():
+    _MISSPELLINGS.setdefault(_right, []).append(_wrong)
+
+def _generic(field: str) -> Callable[[random.Random, float], str]:
+    spoken = field.lower().replace("_", " ")
+    return lambda r, z: f"{spoken.capitalize()} {r.choice(['uno', 'dos', 'A', 'B', str(r.randint(1, 99))])}."
+
+def template_for(field: str) -> Callable[[random.Random, float], str]:
+    return _TEMPLATES.get(field) or _generic(field)
+
+def _add_noise(rnd: random.Random, sentence: str, noise: float) -> str:
+    if rnd.random() < noise:
+        sentence = f"{rnd.choice(_MULETILLAS)}, {sentence[0].lower()}{sentence[1:]}"
+    if rnd.random() < noise / 2:
+        sentence = sentence.replace(" ", "  ", 1)
+    return sentence
+
+def generate_ficha(rnd: random.Random, fields: Iterable[str], noise: float = 0.3,
+                   min_fields: int = 8, max_fields: Optional[int] = None, filler: float = 0.3) -> str:
+    """ Un dictado: subconjunto aleatorio de `fields` + ubicación + ruido ASR. """
+    fields = list(fields)
+    k = rnd.randint(min(min_fields, len(fields)), max_fields or len(fields))
+    chosen = rnd.sample(fields, k)
+    dep, prov, dist = rnd.choice(_LUGARES)
+    parts = [f"El predio se encuentra {rnd.choice(_MISSPELLINGS.get('ubicado', ['ubicado'])) if rnd.random() < noise else 'ubicado'} "
+             f"en el distrito de {dist}, provincia de {prov}, departamento de {dep}."]
+    for f in chosen:
+        parts.append(_add_noise(rnd, template_for(f)(rnd, noise), noise))
+        if rnd.random() < filler:
+            parts.append(rnd.choice(_RELLENO))
+    if rnd.random() < noise:
+        parts.append(f"Código {rnd.choice(_MISSPELLINGS.get('predial', ['predial']))} {_num(rnd, 7, noise)}, "
+                     f"sin deudas de {rnd.choice(_MISSPELLINGS.get('rentas', ['rentas']))}.")
+    if rnd.random() < noise:
+        parts.append(f"{rnd.choice(_MISSPELLINGS.get('habilitacion', ['habilitacion'])).capitalize()} "
+                     f"{rnd.choice(_HABILITACIONES)}.")
+    return " ".join(parts)
+
+def generate_corpus(n: int, seed: int = 0, fields: Optional[Iterable[str]] = None, noise: float = 0.3,
+                    min_fields: int = 8, max_fields: Optional[int] = None, filler: float = 0.3) -> List[str]:
+    """ `n` dictados deterministas para `seed`; por defecto sobre todos los campos de LABEL_MAP. """
+    if fields is None:
+        import pipeline_catastral as pc
+        fields = sorted(set(pc.LABEL_MAP.values()))
+    fields = list(fields)
+    rnd = random.Random(seed)
+    return [generate_ficha(rnd, fields, noise=noise, min_fields=min_fields, max_fields=max_fields, filler=filler)
+            for _ in range(n)]
@@ -0,0 +1,38 @@
+# -*- coding: utf-8 -*-
+"""
+Fixtures compartidas. Las pruebas no usan el modelo entrenado ni servicios externos:
+el modelo es un pipeline sólo con el entity_ruler de model-last-tuned (patterns.jsonl
+real) y la transcripción usa backends falsos o un servidor HTTP local.
+"""
+
+import os
+import sys
+from pathlib import Path
+
+import pytest
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+# antes de importar el pipeline: sin cachés en disco ni transcripción real
+os.environ.setdefault("CATASTRO_CACHE", "0")
+os.environ.setdefault("CATASTRO_AUDIO_CACHE", "0")
+os.environ.setdefault("CATASTRO_ASR_BACKEND", "fake")
+
+@pytest.fixture(scope="session")
+def ruler_model(tmp_path_factory) -> Path:
+    import spacy
+    nlp = spacy.blank("es")
+    ruler = nlp.add_pipe("entity_ruler", config={"overwrite_ents": True, "phrase_matcher_attr": "LOWER"})
+    ruler.from_disk(ROOT / "model-last-tuned" / "entity_ruler")
+    path = tmp_path_factory.mktemp("model")
+    nlp.to_disk(path)
+    return path
+
+@pytest.fixture(scope="session")
+def pc(ruler_model):
+    """ pipeline_catastral apuntando al modelo de pruebas. """
+    import pipeline_catastral
+    pipeline_catastral.MODEL_PATH = str(ruler_model)
+    pipeline_catastral._NLP = None
+    return pipeline_catastral
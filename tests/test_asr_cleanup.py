@@ -0,0 +1,52 @@
+# -*- coding: utf-8 -*-
+import re
+
+import pytest
+
+from asr_cleanup import CleanupEngine
+from synthetic import generate_corpus
+
+def legacy_clean_text(raw: str) -> str:
+    """ clean_text anterior (pasadas regex sucesivas), referencia de la regresión. """
+    s = raw
+    s = re.sub(r"(?:(?<=\d)[\s,]+(?=\d))+", "", s)
+    s = re.sub(r"\bso[vb]i[cq]uado\b", "ubicado", s, flags=re.IGNORECASE)
+    s = re.sub(r"\bhablicaci[oó]n\b", "habilitacion", s, flags=re.IGNORECASE)
+    s = re.sub(r"\bproe?dial\b", "predial", s, flags=re.IGNORECASE)
+    s = re.sub(r"\brantas\b", "rentas", s, flags=re.IGNORECASE)
+    s = re.sub(r"\s+", " ", s).strip()
+    return s
+
+CASES = [
+    # diccionario (palabra completa, sin distinguir mayúsculas)
+    ("Predio Soviquado en la Hablicación Los Jardines", "Predio ubicado en la habilitacion Los Jardines"),
+    ("código PROEDIAL y rantas, sobicuado", "código predial y rentas, ubicado"),
+    ("prodiales rantasx soviquados", "prodiales rantasx soviquados"),
+    # números dictados en grupos
+    ("DNI 45, 879, 632", "DNI 45879632"),
+    ("CUC 15 , 000 ,23 45", "CUC 150002345"),
+    ("lote 7,  manzana B 12 y 13", "lote 7, manzana B 12 y 13"),
+    ("área 120.50 metros, 3 pisos", "área 120.50 metros, 3 pisos"),
+    ("teléfono 987 654 321, 2 hijos", "teléfono 9876543212 hijos"),  # como antes: también une tras la coma
+    # puntuación y espacios
+    ("  hola ,, mundo\n\n\tfin. ", "hola ,, mundo fin."),
+    ("sector 12; zona A. Etapa 3?", "sector 12; zona A. Etapa 3?"),
+    ("", ""),
+]
+
+@pytest.mark.parametrize("raw, expected", CASES)
+def test_pinned_cases(pc, raw, expected):
+    assert pc.clean_text(raw) == expected
+    assert legacy_clean_text(raw) == expected
+
+def test_matches_legacy_on_synthetic_corpus(pc):
+    for text in generate_corpus(200, seed=13, noise=0.8):
+        assert pc.clean_text(text) == legacy_clean_text(text)
+
+def test_builtin_rules_equal_shipped_dictionary(pc):
+    text = " ".join(generate_corpus(50, seed=2, noise=0.8))
+    assert CleanupEngine().clean(text) == pc.get_cleanup_engine().clean(text)
+
+def test_multiword_entries():
+    engine = CleanupEngine({"en el lote": "lote", "mz": "manzana"})
+    assert engine.clean("Ubicado En  el LOTE 5 mz B, en el lotes") == "Ubicado lote 5 manzana B, en el lotes"
@@ -0,0 +1,188 @@
+# -*- coding: utf-8 -*-
+"""
+Cliente AssemblyAI compartido contra un servidor HTTP local que imita la API v2
+(/v2/upload, /v2/transcript, /v2/transcript/{id}); los fallos se inyectan por ruta.
+"""
+
+import io
+import json
+import threading
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import assemblyai as aai
+import pytest
+from fastapi.testclient import TestClient
+
+import transcriber
+from asr_client import AssemblyAIClient, ConcurrencyLimiter, TranscriptionBusy, TranscriptionUnavailable
+
+class StandIn:
+    def __init__(self):
+        self.fail = {"upload": [], "create": [], "poll": []}  # códigos a devolver, en orden
+        self.hits = {"upload": 0, "create": 0, "poll": 0}
+        self.pending_polls = 1  # sondeos con "processing" antes de "completed"
+        self.peers = set()
+        self.transcripts = {}
+        self.lock = threading.Lock()
+
+    def next_failure(self, route):
+        with self.lock:
+            self.hits[route] += 1
+            return self.fail[route].pop(0) if self.fail[route] else None
+
+@pytest.fixture
+def standin():
+    state = StandIn()
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def log_message(self, *args):
+            pass
+
+        def _send(self, code, obj):
+            body = json.dumps(obj).encode()
+            self.send_response(code)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def _body(self):
+            if self.headers.get("Content-Length"):
+                return self.rfile.read(int(self.headers["Content-Length"]))
+            data = b""
+            while True:  # chunked (file-likes)
+                size = int(self.rfile.readline().strip(), 16)
+                if size == 0:
+                    self.rfile.readline()
+                    return data
+                data += self.rfile.read(size)
+                self.rfile.readline()
+
+        def do_POST(self):
+            state.peers.add(self.client_address)
+            body = self._body()
+            route = "upload" if self.path == "/v2/upload" else "create"
+            code = state.next_failure(route)
+            if code:
+                return self._send(code, {"error": f"falla inyectada {code}"})
+            if route == "upload":
+                return self._send(200, {"upload_url": "http://audio/" + body.decode("utf-8")})
+            url = json.loads(body)["audio_url"]
+            tid = uuid.uuid4().hex
+            state.transcripts[tid] = {"url": url, "polls": 0}
+            self._send(200, {"id": tid, "status": "queued", "audio_url": url})
+
+        def do_GET(self):
+            state.peers.add(self.client_address)
+            code = state.next_failure("poll")
+            if code:
+                return self._send(code, {"error": f"falla inyectada {code}"})
+            tid = self.path.rsplit("/", 1)[-1]
+            t = state.transcripts[tid]
+            t["polls"] += 1
+            if t["polls"] <= state.pending_polls:
+                return self._send(200, {"id": tid, "status": "processing", "audio_url": t["url"]})
+            text = t["url"].split("/", 3)[-1]
+            self._send(200, {"id": tid, "status": "completed", "audio_url": t["url"], "text": text,
+                             "confidence": 0.9, "audio_duration": 2, "utterances": [],
+                             "words": [{"text": w, "start": 0, "end": 1, "confidence": 0.9} for w in text.split()]})
+
+    srv = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    threading.Thread(target=srv.serve_forever, daemon=True).start()
+    state.url = f"http://127.0.0.1:{srv.server_port}"
+    yield state
+    srv.shutdown()
+
+def _client(standin, **kw) -> AssemblyAIClient:
+    events = []
+    kw.setdefault("limiter", ConcurrencyLimiter(2, 2, 1.0, retry_after_s=3))
+    c = AssemblyAIClient(transcriber.config, api_key="test", base_url=standin.url, poll_interval_s=0.01,
+                         backoff_s=0.001, max_backoff_s=0.01, on_event=events.append, **kw)
+    c.events = events
+    return c
+
+def test_retries_transient_errors_without_reupload(standin):
+    standin.fail.update(upload=[503, 502], poll=[502])
+    c = _client(standin, retries=3)
+    t = c.transcribe(io.BytesIO("hola mundo".encode("utf-8")))  # file-like: se rebobina en cada reintento
+    assert t.text == "hola mundo"
+    assert standin.hits == {"upload": 3, "create": 1, "poll": 3}
+    assert c.events == ["retry"] * 3
+    for _ in range(3):
+        c.transcribe(b"otra vez")
+    assert len(standin.peers) == 1  # una sola conexión reutilizada (keep-alive)
+    c.close()
+
+def test_non_transient_errors_are_not_retried(standin):
+    standin.fail.update(upload=[400])
+    c = _client(standin, retries=3)
+    with pytest.raises(aai.TranscriptError):
+        c.transcribe(b"x")
+    assert standin.hits["upload"] == 1 and c.events == []
+
+def test_provider_down_after_retries_is_unavailable(standin):
+    standin.fail.update(upload=[503] * 3)
+    c = _client(standin, retries=2)
+    with pytest.raises(TranscriptionUnavailable) as exc:
+        c.transcribe(b"x")
+    assert exc.value.status_code == 503 and exc.value.retry_after == 3
+    assert c.events == ["retry", "retry", "unavailable"]
+
+def test_poll_timeout_is_unavailable(standin):
+    standin.pending_polls = 10 ** 6
+    c = _client(standin, poll_timeout_s=0.1)
+    with pytest.raises(TranscriptionUnavailable) as exc:
+        c.transcribe(b"x")
+    assert exc.value.reason == "poll_timeout"
+
+def test_limiter_queues_then_rejects():
+    lim = ConcurrencyLimiter(max_inflight=1, max_queue=1, queue_timeout_s=0.05)
+    with lim.slot():
+        with pytest.raises(TranscriptionUnavailable) as exc:  # espera en cola y se agota
+            with lim.slot():
+                pass
+        assert exc.value.reason == "queue_timeout"
+        lim.queued = 1  # otro pedido ya ocupa la cola
+        with pytest.raises(TranscriptionBusy) as exc:
+            with lim.slot():
+                pass
+        assert exc.value.status_code == 429
+        lim.queued = 0
+    assert lim.stats()["inflight"] == 0 and lim.stats()["rejected"] == 1
+
+@pytest.fixture
+def api(pc, standin, monkeypatch):
+    monkeypatch.setattr(aai.settings, "api_key", "test")
+    for name, value in (("ASR_BASE_URL", standin.url), ("ASR_POLL_INTERVAL_S", 0.01), ("ASR_RETRIES", 1),
+                        ("ASR_BACKOFF_S", 0.001), ("ASR_MAX_INFLIGHT", 1), ("ASR_MAX_QUEUE", 0),
+                        ("ASR_RETRY_AFTER_S", 7)):
+        monkeypatch.setattr(transcriber, name, value)
+    transcriber.stop_asr_client()
+    monkeypatch.delitem(transcriber._BACKENDS, "assemblyai", raising=False)
+    with TestClient(pc.app) as client:
+        yield client
+    transcriber._BACKENDS.pop("assemblyai", None)
+
+def _post(client, data=b"DNI 12345678"):
+    return client.post("/transcribir", files={"file": ("a.wav", data)}, data={"backend": "assemblyai"})
+
+def test_endpoint_ok_busy_and_unavailable(api, standin):
+    r = _post(api)
+    assert r.status_code == 200 and r.json()["text"] == "DNI 12345678"
+
+    limiter = transcriber.get_backend("assemblyai").get_client().limiter
+    with limiter.slot():  # la única plaza ocupada y sin cola => 429
+        r = _post(api)
+    assert r.status_code == 429 and r.headers["Retry-After"] == "7"
+
+    standin.fail.update(upload=[503, 503])
+    r = api.post("/transcribir_extract", files={"file": ("a.wav", b"x")}, data={"backend": "assemblyai"})
+    assert r.status_code == 503 and r.headers["Retry-After"] == "7"
+
+    assert api.get("/health").json()["asr_client"]["rejected"] == 1
+    metrics = api.get("/metrics").text
+    assert "catastro_asr_inflight 0" in metrics and "catastro_asr_queued 0" in metrics
+    assert 'catastro_asr_events_total{backend="assemblyai",event="rejected"}' in metrics
@@ -0,0 +1,49 @@
+# -*- coding: utf-8 -*-
+import io
+import os
+
+import transcriber
+from audio_cache import AudioCache
+
+AUDIO = "Titular con DNI 12345678.".encode("utf-8")
+
+def test_key_is_content_addressed(tmp_path):
+    path = tmp_path / "a.wav"
+    path.write_bytes(AUDIO)
+    stream = io.BytesIO(b"xx" + AUDIO)
+    stream.seek(2)
+    keys = {AudioCache.key(AUDIO, "m"), AudioCache.key(str(path), "m"), AudioCache.key(path, "m"),
+            AudioCache.key(stream, "m")}
+    assert len(keys) == 1 and stream.tell() == 2  # el file-like vuelve a su posición para la subida
+    assert AudioCache.key(AUDIO, "otro-modelo") not in keys
+    assert AudioCache.key(AUDIO + b"!", "m") not in keys
+
+def test_lru_eviction_by_last_use(tmp_path):
+    cache = AudioCache(tmp_path, max_bytes=320)
+    entry = {"text": "x" * 80}
+    for k in ("a", "b", "c"):
+        cache.put(k, entry)
+        os.utime(tmp_path / f"{k}.json", (1000 + ord(k), 1000 + ord(k)))
+    assert cache.get("a") == entry  # "a" pasa a ser la más reciente
+    cache.put("d", entry)           # se pasa del tope: sale la menos usada ("b")
+    assert cache.get("b") is None
+    assert all(cache.get(k) == entry for k in ("a", "c", "d"))
+    st = cache.stats()
+    assert st["evictions"] == 1 and st["bytes"] <= 320 and st["misses"] == 1
+    assert AudioCache(tmp_path).stats()["bytes"] == st["bytes"]  # el tamaño sobrevive reinicios
+
+def test_transcribe_audio_uses_the_cache(tmp_path, monkeypatch):
+    monkeypatch.setattr(transcriber, "AUDIO_CACHE_ENABLED", True)
+    monkeypatch.setattr(transcriber, "_AUDIO_CACHE", AudioCache(tmp_path))
+    fake = transcriber.get_backend("fake")
+    calls = []
+    real = fake.transcribe
+    monkeypatch.setattr(fake, "transcribe", lambda audio: calls.append(1) or real(audio))
+
+    first = transcriber.transcribe_audio(AUDIO, "fake")
+    path = tmp_path / "mismo.wav"
+    path.write_bytes(AUDIO)
+    second = transcriber.transcribe_audio(path, "fake")
+    assert calls == [1]
+    assert first["timing"]["cached"] is False and second["timing"]["cached"] is True
+    assert second["text"] == first["text"]
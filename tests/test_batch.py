@@ -0,0 +1,31 @@
+# -*- coding: utf-8 -*-
+from fastapi.testclient import TestClient
+
+from synthetic import generate_corpus
+
+def test_batch_matches_per_document_in_order(pc):
+    texts = generate_corpus(23, seed=3)
+    batch = list(pc.process_texts(texts, batch_size=4))  # varios lotes de nlp.pipe, el último incompleto
+    assert batch == [pc.process_text(t) for t in texts]
+
+def test_bad_document_does_not_fail_the_batch(pc, monkeypatch):
+    texts = generate_corpus(6, seed=5)
+    expected = [pc.process_text(t) for t in texts]
+    real = pc._doc_to_spans
+
+    def flaky(doc):  # el NER falla en un documento: nlp.pipe cae y se reintenta uno a uno
+        if doc.text.startswith("BOOM"):
+            raise ValueError("documento roto")
+        return real(doc)
+    monkeypatch.setattr(pc, "_doc_to_spans", flaky)
+    out = list(pc.process_texts([texts[0], None, texts[1], "BOOM " + texts[2], *texts[3:]], batch_size=8))
+    assert len(out) == 7
+    assert "error" in out[1] and out[3] == {"error": "documento roto"}
+    assert [out[0], out[2], *out[4:]] == [expected[0], expected[1], *expected[3:]]
+
+def test_extract_batch_endpoint_keeps_order(pc):
+    texts = generate_corpus(5, seed=9)
+    with TestClient(pc.app) as client:
+        r = client.post("/extract_batch", json={"texts": texts, "batch_size": 2})
+    assert r.status_code == 200
+    assert r.json()["results"] == [pc.process_text(t) for t in texts]
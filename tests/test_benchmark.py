@@ -0,0 +1,41 @@
+# -*- coding: utf-8 -*-
+import json
+import random
+
+import synthetic
+
+def test_corpus_is_deterministic_per_seed():
+    a = synthetic.generate_corpus(20, seed=7)
+    assert a == synthetic.generate_corpus(20, seed=7)
+    assert a != synthetic.generate_corpus(20, seed=8)
+    assert synthetic.generate_corpus(5, seed=7, noise=0.0) == synthetic.generate_corpus(5, seed=7, noise=0.0)
+
+def test_every_label_map_field_has_a_template(pc):
+    rnd = random.Random(0)
+    for field in sorted(set(pc.LABEL_MAP.values())):
+        assert synthetic.template_for(field)(rnd, 0.3).strip(), field
+    one_field = synthetic.generate_corpus(3, seed=1, fields=["NUMERO_DNI"], noise=0.0, filler=0.0)
+    assert all("DNI" in t.upper() for t in one_field)
+
+def test_bench_pipeline_and_compare(pc, monkeypatch, tmp_path):
+    import benchmark
+    monkeypatch.setattr(pc, "RESULT_CACHE_ENABLED", pc.RESULT_CACHE_ENABLED)
+    res = benchmark.bench_pipeline(6, seed=3, batch_sizes=[1, 4], noise=0.3, warmup=1, modes=["rules-only"])
+    assert res["meta"]["corpus"] == {"docs": 6, "seed": 3, "noise": 0.3, "mean_chars": res["meta"]["corpus"]["mean_chars"]}
+    assert res["single"]["docs"] == 6 and res["single"]["stages"]["total"]["n"] == 6
+    assert [b["batch_size"] for b in res["batch"]] == [1, 4]
+    assert res["batch"][1]["stages"]["build_fields"]["n"] == 6  # métricas de process_texts, drenadas por lote
+    assert sum(res["modes"][0]["paths"].values()) == 6
+
+    same = benchmark.compare_results(res, res, 0.10)
+    assert same["regressions"] == [] and same["rows"] and not same["warnings"]
+    slow = json.loads(json.dumps(res))
+    slow["single"]["docs_per_s"] /= 2
+    cmp = benchmark.compare_results(res, slow, 0.10)
+    assert cmp["regressions"] == ["single.docs_per_s"]
+
+    base, cur = tmp_path / "base.json", tmp_path / "cur.json"
+    base.write_text(json.dumps(res), encoding="utf-8")
+    cur.write_text(json.dumps(slow), encoding="utf-8")
+    assert benchmark.main(["compare", str(base), str(base)]) == 0
+    assert benchmark.main(["compare", str(base), str(cur)]) == 1
@@ -0,0 +1,41 @@
+# -*- coding: utf-8 -*-
+import json
+
+import pytest
+
+from bulk import Checkpoint, iter_input, run_bulk
+from synthetic import generate_corpus
+
+class Interrupted(Exception):
+    pass
+
+def test_resume_after_interruption_neither_duplicates_nor_skips(pc, tmp_path):
+    texts = generate_corpus(25, seed=11)
+    src = tmp_path / "in.ndjson"
+    src.write_text("".join(json.dumps({"id": f"r{i}", "text": t}) + "\n" for i, t in enumerate(texts)),
+                   encoding="utf-8")
+    out, ckpt = tmp_path / "out.ndjson", tmp_path / "out.ckpt"
+    extract = lambda batch: list(pc.process_texts(batch))
+    calls = []
+
+    def crashing(batch):  # se corta en la tercera ventana (8 registros escritos)
+        calls.append(len(batch))
+        if len(calls) == 3:
+            raise Interrupted()
+        return extract(batch)
+
+    with pytest.raises(Interrupted):
+        run_bulk(iter_input(src), out, crashing, Checkpoint(ckpt, src), window=4)
+    assert Checkpoint(ckpt, src).load().done == 8
+    with out.open("ab") as f:  # ventana a medio escribir cuando murió el proceso
+        f.write(b'{"id": "r8", "result": {"fie')
+
+    stats = run_bulk(iter_input(src), out, extract, Checkpoint(ckpt, src), window=4)
+    assert stats["resumed_from"] == 8 and stats["processed"] == 17 and stats["done"] == 25
+    rows = [json.loads(line) for line in out.read_text(encoding="utf-8").splitlines()]
+    assert [r["id"] for r in rows] == [f"r{i}" for i in range(25)]
+    assert [r["result"] for r in rows] == [pc.process_text(t) for t in texts]
+
+    # ya completo: reanudar no reescribe nada
+    assert run_bulk(iter_input(src), out, extract, Checkpoint(ckpt, src), window=4)["processed"] == 0
+    assert len(out.read_text(encoding="utf-8").splitlines()) == 25
@@ -0,0 +1,31 @@
+# -*- coding: utf-8 -*-
+from chunking import plan_windows
+from synthetic import generate_corpus
+
+def _key(spans):
+    return [(s.label, s.start, s.end, s.text) for s in spans]
+
+def _single_pass(pc, monkeypatch, text):
+    with monkeypatch.context() as m:
+        m.setattr(pc, "CHUNK_CHARS", 0)
+        return pc.run_ner(text)
+
+def test_chunked_matches_single_pass_on_long_texts(pc, monkeypatch):
+    monkeypatch.setattr(pc, "CHUNK_CHARS", 700)
+    monkeypatch.setattr(pc, "CHUNK_OVERLAP", 200)
+    for seed in range(4):
+        text = " ".join(generate_corpus(8, seed=seed))
+        assert len(plan_windows(text, 700, 200)) > 10
+        assert _key(pc.run_ner(text)) == _key(_single_pass(pc, monkeypatch, text)), seed
+
+def test_entity_straddling_a_window_boundary(pc, monkeypatch):
+    filler = "el inspector verificó el predio en presencia del titular " * 12  # sin límites de oración
+    text = filler + "con DNI 45879632 y teléfono 987654321 " + filler
+    dni = text.index("DNI 45879632")
+    monkeypatch.setattr(pc, "CHUNK_CHARS", dni + 8)
+    monkeypatch.setattr(pc, "CHUNK_OVERLAP", 100)
+    windows = plan_windows(text, pc.CHUNK_CHARS, pc.CHUNK_OVERLAP)
+    assert windows[0][0] < dni < windows[0][1] < dni + len("DNI 45879632")  # la primera ventana lo corta
+    spans = pc.run_ner(text)
+    assert ("DNI", dni, dni + 12, "DNI 45879632") in _key(spans)
+    assert _key(spans) == _key(_single_pass(pc, monkeypatch, text))
@@ -0,0 +1,89 @@
+# -*- coding: utf-8 -*-
+import csv
+import importlib.util
+import io
+import json
+
+import pytest
+from fastapi.testclient import TestClient
+
+import export
+from export import columns_from_label_map, export_rows, header, iter_csv_chunks, resolve_format
+
+TEXT = ("Titular con DNI 12345678. El predio está en el distrito de Miraflores, "
+        "provincia de Lima, departamento de Lima.")
+
+def _rows(pc):
+    ok = pc.process_text(TEXT, profile="fields-only")
+    return [("a", ok), ("b", {"error": "falló"}), ("c", pc.process_text(TEXT, profile="normalized-values-only"))]
+
+def _read_csv(data: bytes):
+    assert data.startswith("﻿".encode("utf-8"))
+    return list(csv.reader(io.StringIO(data.decode("utf-8-sig"))))
+
+def test_columns_are_stable_and_rows_accept_any_profile(pc):
+    columns = columns_from_label_map(pc.LABEL_MAP)
+    assert len(columns) == len(set(columns)) and set(export.DERIVED_FIELDS) <= set(columns)
+    assert columns[:len(set(pc.LABEL_MAP.values()))] == list(dict.fromkeys(pc.LABEL_MAP.values()))
+    rows = [export.result_to_row(rid, r, columns) for rid, r in _rows(pc)]
+    dni = columns.index("NUMERO_DOCUMENTO") + 1
+    assert rows[0][dni] == rows[2][dni] == "12345678"
+    assert rows[0][1:-2] == rows[2][1:-2]  # mismo valor con fields-only y normalized-values-only
+    assert rows[1] == ["b", *([None] * len(columns)), None, "falló"]
+    assert all(len(r) == len(header(columns)) for r in rows)
+
+def test_csv_file_and_stream_are_identical(pc, tmp_path):
+    columns = columns_from_label_map(pc.LABEL_MAP)
+    stats = export_rows(_rows(pc), tmp_path / "f.csv", columns)
+    assert stats == {"format": "csv", "rows": 3, "failed": 1}
+    chunks = list(iter_csv_chunks(_rows(pc), columns, flush_rows=1))
+    assert len(chunks) == 3  # cabecera con la primera fila, luego una por bloque
+    assert b"".join(chunks) == (tmp_path / "f.csv").read_bytes()
+    table = _read_csv(b"".join(chunks))
+    assert table[0] == header(columns) and [r[0] for r in table[1:]] == ["a", "b", "c"]
+
+def test_xlsx_round_trip(pc, tmp_path):
+    openpyxl = pytest.importorskip("openpyxl")
+    columns = columns_from_label_map(pc.LABEL_MAP)
+    rows = _rows(pc) + [("d", {"fields": {"DISTRITO": "MIRA\x07FLORES" + "x" * 40000}})]
+    export_rows(rows, tmp_path / "f.xlsx", columns)
+    ws = openpyxl.load_workbook(tmp_path / "f.xlsx", read_only=True)["fichas"]
+    table = [list(r) for r in ws.iter_rows(values_only=True)]
+    assert table[0] == header(columns) and len(table) == 5
+    cell = table[4][columns.index("DISTRITO") + 1]
+    assert cell.startswith("MIRAFLORES") and len(cell) == export._XLSX_MAX_CELL  # sin control, truncada
+
+def test_parquet_row_groups(pc, tmp_path):
+    pq = pytest.importorskip("pyarrow.parquet")
+    columns = columns_from_label_map(pc.LABEL_MAP)
+    path = tmp_path / "f.parquet"
+    w = export.ParquetRowWriter(path, columns, row_group=2)
+    for rid, r in _rows(pc):
+        w.write(export.result_to_row(rid, r, columns))
+    w.close()
+    f = pq.ParquetFile(str(path))
+    assert f.metadata.num_row_groups == 2 and f.read().column("id").to_pylist() == ["a", "b", "c"]
+
+def test_failed_export_leaves_no_partial_file(pc, tmp_path):
+    def rows():
+        yield "a", {"fields": {}}
+        raise RuntimeError("corte")
+    with pytest.raises(RuntimeError):
+        export_rows(rows(), tmp_path / "f.csv", columns_from_label_map(pc.LABEL_MAP))
+    assert not (tmp_path / "f.csv").exists()
+    assert resolve_format(None, tmp_path / "x.XLSX") == "xlsx"
+    with pytest.raises(ValueError):
+        resolve_format("ods")
+
+def test_export_endpoint(pc):
+    body = "\n".join(json.dumps({"id": f"f{i}", "text": TEXT}) for i in range(3)) + "\n"
+    with TestClient(pc.app) as client:
+        files = {"file": ("in.ndjson", body.encode("utf-8"), "application/x-ndjson")}
+        r = client.post("/export", files=files, data={"format": "csv"})
+        assert r.status_code == 200 and "fichas.csv" in r.headers["content-disposition"]
+        table = _read_csv(r.content)
+        assert [row[0] for row in table[1:]] == ["f0", "f1", "f2"]
+        assert client.post("/export", files=files, data={"format": "ods"}).status_code == 400
+        if importlib.util.find_spec("openpyxl"):
+            r = client.post("/export", files=files, data={"format": "xlsx"})
+            assert r.status_code == 200 and r.content[:2] == b"PK"
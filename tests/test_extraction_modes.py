@@ -0,0 +1,53 @@
+# -*- coding: utf-8 -*-
+import pytest
+from fastapi.testclient import TestClient
+
+COMPLETE = ("Código único catastral 12345678901234567890123. Titular con DNI 12345678. "
+            "El predio está en el distrito de Miraflores, provincia de Lima, departamento de Lima.")
+PARTIAL = "Titular con DNI 12345678."
+
+@pytest.fixture
+def ner_calls(pc, monkeypatch):
+    """ Modos con que se llamó a run_ner, en orden. """
+    calls = []
+    real = pc.run_ner
+    def spy(text, mode="full"):
+        calls.append(mode)
+        return real(text, mode)
+    monkeypatch.setattr(pc, "run_ner", spy)
+    return calls
+
+def test_full_and_rules_only_run_a_single_pass(pc, ner_calls):
+    for mode in ("full", "rules-only"):
+        ner_calls.clear()
+        out = pc.process_text(PARTIAL, mode=mode)
+        assert ner_calls == [mode]
+        assert out["extraction"] == {"mode": mode, "path": mode}
+
+def test_auto_stays_on_rules_when_required_fields_are_filled(pc, ner_calls):
+    out = pc.process_text(COMPLETE, mode="auto")
+    assert ner_calls == ["rules-only"]
+    assert out["extraction"] == {"mode": "auto", "path": "rules-only"}
+    assert pc.missing_required(out) == []
+
+def test_auto_falls_back_to_full_when_required_fields_are_missing(pc, ner_calls):
+    out = pc.process_text(PARTIAL, mode="auto")
+    assert ner_calls == ["rules-only", "full"]
+    assert out["extraction"]["path"] == "full"
+    assert out["extraction"]["missing_after_rules"] == ["CODIGO_UNICO_CATASTRAL", "DISTRITO"]
+
+def test_auto_batch_only_reruns_incomplete_documents(pc):
+    outs = list(pc.process_texts([COMPLETE, PARTIAL, COMPLETE], mode="auto"))
+    assert [o["extraction"]["path"] for o in outs] == ["rules-only", "full", "rules-only"]
+    assert outs[0]["fields"] == pc.process_text(COMPLETE, mode="auto")["fields"]
+
+def test_mode_resolution(pc, monkeypatch):
+    assert pc.resolve_mode("AUTO") == "auto"
+    monkeypatch.setattr(pc, "EXTRACTION_MODE", "rules-only")
+    assert pc.resolve_mode(None) == "rules-only"
+    with pytest.raises(ValueError):
+        pc.resolve_mode("neural")
+    with TestClient(pc.app) as client:
+        assert client.post("/extract", json={"text": PARTIAL, "mode": "neural"}).status_code == 400
+        r = client.post("/extract", json={"text": PARTIAL})
+    assert r.json()["extraction"] == {"mode": "rules-only", "path": "rules-only"}
@@ -0,0 +1,74 @@
+# -*- coding: utf-8 -*-
+import threading
+
+import pytest
+from fastapi.testclient import TestClient
+
+from ficha_store import FichaStore, normalize_key
+
+def _ficha(cuc=None, dni=None, ubigeo=None):
+    fields = {"CODIGO_UNICO_CATASTRAL": {"normalized": cuc}, "NUMERO_DOCUMENTO": {"normalized": dni}}
+    if ubigeo:
+        fields["UBIGEO"] = ubigeo  # perfil normalized-values-only: valor directo
+    return {"fields": fields}
+
+def test_batched_writes_and_flush(tmp_path):
+    store = FichaStore(tmp_path / "f.sqlite3", batch_size=3, flush_ms=10_000).start()
+    ids = [store.add(_ficha(dni=f"4587963{i}")) for i in range(7)]
+    assert store.flush(5)  # no espera los 10 s: escribe ya lo encolado
+    st = store.stats()
+    assert st["written"] == 7 and st["batches"] == 3 and st["pending"] == 0 and st["errors"] == 0
+    assert {f["id"] for f in store.search(limit=10)} == set(ids)
+    assert store.get(ids[0])["dni"] == "45879630"
+    store.stop()
+
+def test_queue_full_is_dropped_not_blocking(tmp_path):
+    store = FichaStore(tmp_path / "f.sqlite3", max_pending=2)  # sin escritor: la cola no se vacía
+    assert store.add(_ficha()) and store.add(_ficha())
+    assert store.add(_ficha()) is None
+    assert store.stats()["dropped"] == 1 and store.stats()["written"] == 0
+    store.start()
+    assert store.flush(5) and store.stats()["written"] == 2
+    store.stop()
+
+def test_counters_are_consistent_across_threads(tmp_path):
+    store = FichaStore(tmp_path / "f.sqlite3", batch_size=50, flush_ms=1, max_pending=100).start()
+    ok = []
+
+    def producer():
+        ok.extend(fid for fid in (store.add(_ficha()) for _ in range(500)) if fid)
+    threads = [threading.Thread(target=producer) for _ in range(4)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert store.flush(10)
+    st = store.stats()
+    assert st["written"] == len(ok) and st["written"] + st["dropped"] == 2000
+    store.stop()
+
+@pytest.fixture
+def api(pc, tmp_path, monkeypatch):
+    pc.stop_store()
+    monkeypatch.setattr(pc, "STORE_PATH", str(tmp_path / "fichas.sqlite3"))
+    with TestClient(pc.app) as client:
+        yield client
+    pc.stop_store()
+
+def test_fichas_lookup_by_normalized_keys(pc, api):
+    store = pc.get_store()
+    a = store.add(_ficha(cuc="15000-2345", dni="45879632", ubigeo="140108"))
+    b = store.add(_ficha(cuc="15000-9999", dni="45 879 632"))
+    store.add(_ficha(cuc="77777777", dni="11111111", ubigeo="140108"))
+    assert store.flush(5)
+    assert normalize_key(" 15000-2345.") == "150002345"
+
+    ids = lambda **q: [f["id"] for f in api.get("/fichas", params=q).json()["items"]]
+    assert ids(cuc="15000 2345") == [a]
+    assert set(ids(dni="45.879.632")) == {a, b}
+    assert ids(dni="45879632", ubigeo="140108") == [a]
+    assert len(ids(ubigeo="140108")) == 2
+    assert ids(cuc="no existe") == []
+    assert api.get(f"/fichas/{a}").json()["cuc"] == "150002345"
+    assert api.get("/fichas", params={"desde": "ayer"}).status_code == 400
+    assert api.get("/fichas/nope").status_code == 404
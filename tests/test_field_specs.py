@@ -0,0 +1,54 @@
+# -*- coding: utf-8 -*-
+import random
+
+import pytest
+
+from synthetic import template_for
+
+_MEASURES = ("AREA_", "MEDIDA_")
+
+def _values(pc):
+    """ Valores de plantilla sintética por campo (con y sin ruido ASR), más bordes. """
+    import benchmark
+    rnd = random.Random(17)
+    for key in sorted(set(pc.LABEL_MAP.values())):
+        yield key, benchmark._sample_for(key)
+        yield key, ""
+        for _ in range(15):
+            yield key, template_for(key)(rnd, 0.6).rstrip(".")
+
+def test_specs_match_legacy_tables(pc):
+    import benchmark
+    normalizers, validators = benchmark._legacy_tables()
+    checked = 0
+    for key, value in _values(pc):
+        if key.startswith(_MEASURES):
+            continue  # cambio intencional: ver test_measure_fields
+        new = pc.normalize_field(key, value)
+        ok, _ = pc.validate_field(key, new or "")
+        assert (new, ok) == benchmark._legacy_normalize_validate(normalizers, validators, key, value), (key, value)
+        checked += 1
+    assert checked > 500
+
+def test_measure_fields(pc):
+    assert pc.normalize_field("AREA_VERIFICADA", "120.50 metros") == 120.5
+    assert pc.validate_field("AREA_VERIFICADA", 120.5)[0] is True  # antes: TypeError (regex sobre float)
+    assert pc.normalize_field("MEDIDA_FONDO", "1.2.3") is None      # antes: ValueError
+    assert pc.normalize_field("MEDIDA_FONDO", "sin medida") is None
+
+@pytest.mark.parametrize("key, raw, expected", [
+    ("MEP", "muros de ladrillo con columnas de concreto", "CONCRETO"),
+    ("MEP", "Ladrillos", "LADRILLO"),
+    ("MEP", "piedra", "PIEDRA"),
+    ("SERVICIO_LUZ", "Sí", True),
+    ("SERVICIO_AGUA", "no", False),
+    ("NUMERO_DOCUMENTO", "dni 45, 67, 89, 12", "45678912"),
+    ("CORREO_ELECTRONICO", "  Juan.Perez@Correo.com ", "juan.perez@correo.com"),
+    ("NOMBRES", "maría elena", "María Elena"),
+])
+def test_pinned_normalization(pc, key, raw, expected):
+    assert pc.normalize_field(key, raw) == expected
+
+def test_derived_views_follow_specs(pc):
+    assert set(pc.NORMALIZERS) == set(pc.COMPILED_FIELDS)
+    assert all(pc.VALIDATORS[k] is cf.pattern for k, cf in pc.COMPILED_FIELDS.items() if cf.pattern is not None)
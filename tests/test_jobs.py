@@ -0,0 +1,126 @@
+# -*- coding: utf-8 -*-
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+from fastapi.testclient import TestClient
+
+from jobs import CallbackRejected, JobManager, check_callback_url
+
+AUDIO = "Titular con DNI 12345678, teléfono 987654321, manzana C lote 5.".encode("utf-8")
+
+@pytest.fixture
+def callback_server():
+    received, done = [], threading.Event()
+
+    class Handler(BaseHTTPRequestHandler):
+        def log_message(self, *args):
+            pass
+
+        def do_POST(self):
+            body = self.rfile.read(int(self.headers["Content-Length"]))
+            received.append(json.loads(body))
+            self.send_response(204)
+            self.end_headers()
+            done.set()
+
+    srv = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    threading.Thread(target=srv.serve_forever, daemon=True).start()
+    yield f"http://127.0.0.1:{srv.server_port}/hook", received, done
+    srv.shutdown()
+
+def _wait_job(client, job_id, timeout=30.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        job = client.get(f"/jobs/{job_id}").json()
+        if job["status"] in ("done", "error"):
+            return job
+        time.sleep(0.05)
+    raise AssertionError(f"el trabajo {job_id} no terminó")
+
+def test_job_polling_callback_and_store(pc, callback_server, monkeypatch, tmp_path):
+    url, received, done = callback_server
+    monkeypatch.setattr(pc, "STORE_PATH", str(tmp_path / "fichas.sqlite3"))
+    monkeypatch.setattr(pc, "JOB_CALLBACK_ALLOW_PRIVATE", True)  # el receptor de prueba es 127.0.0.1
+    with TestClient(pc.app) as client:
+        r = client.post("/jobs", files={"file": ("audio.wav", AUDIO)},
+                        data={"callback_url": url, "backend": "fake"})
+        assert r.status_code == 202
+        job = r.json()
+        assert job["status"] in ("queued", "running") and "callback_url" not in job
+
+        job = _wait_job(client, job["id"])
+        assert job["status"] == "done", job["error"]
+        result = job["result"]
+        assert result["fields"]["NUMERO_DOCUMENTO"]["normalized"] == "12345678"
+        assert result["asr"]["timing"]["backend"] == "fake"
+
+        assert done.wait(10)
+        assert received[0]["id"] == job["id"] and received[0]["status"] == "done"
+
+        pc.get_store().flush()
+        ficha = client.get(f"/fichas/{result['ficha_id']}").json()
+        assert ficha["source"] == "job"
+        assert ficha["result"]["asr"] == result["asr"]
+        assert client.get("/jobs/nope").status_code == 404
+
+def test_job_unknown_backend_rejected(pc):
+    with TestClient(pc.app) as client:
+        r = client.post("/jobs", files={"file": ("audio.wav", AUDIO)}, data={"backend": "nope"})
+        assert r.status_code == 400
+
+@pytest.mark.parametrize("url", [
+    "file:///etc/passwd", "ftp://example.com/x", "gopher://8.8.8.8/", "http:///sin-host",
+    "http://127.0.0.1:8000/hook", "http://localhost/hook", "http://[::1]/hook", "http://10.1.2.3/hook",
+    "http://169.254.169.254/latest/meta-data/", "http://[::ffff:192.168.0.1]/", "http://0.0.0.0/",
+])
+def test_callback_url_rejected(url):
+    with pytest.raises(CallbackRejected):
+        check_callback_url(url)
+
+def test_callback_allow_list_and_private_opt_in():
+    assert check_callback_url("https://8.8.8.8/hook") == "https://8.8.8.8/hook"
+    with pytest.raises(CallbackRejected, match="no permitido"):
+        check_callback_url("https://8.8.8.8/hook", allowed_hosts=["hooks.example.com"])
+    assert check_callback_url("http://hooks.interno:8080/x", [".interno"], allow_private=True)
+    assert check_callback_url("http://127.0.0.1/x", allow_private=True)
+    with pytest.raises(CallbackRejected):
+        check_callback_url("file:///etc/passwd", allow_private=True)
+
+def test_jobs_endpoint_rejects_internal_callback(pc):
+    with TestClient(pc.app) as client:
+        for url in ("file:///etc/passwd", "http://127.0.0.1:9/hook"):
+            r = client.post("/jobs", files={"file": ("audio.wav", AUDIO)}, data={"callback_url": url, "backend": "fake"})
+            assert r.status_code == 400, url
+
+def test_callback_redirect_is_not_followed():
+    hits = []
+
+    class Handler(BaseHTTPRequestHandler):
+        def log_message(self, *args):
+            pass
+
+        def do_POST(self):
+            hits.append(self.path)
+            self.rfile.read(int(self.headers["Content-Length"]))
+            self.send_response(307)
+            self.send_header("Location", "/interno")
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+
+    srv = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    threading.Thread(target=srv.serve_forever, daemon=True).start()
+    jobs = JobManager(lambda audio: {"text": audio}, lambda text: {"text": text}, callback_allow_private=True)
+    try:
+        job = jobs.submit("hola", callback_url=f"http://127.0.0.1:{srv.server_port}/hook")
+        deadline = time.monotonic() + 10
+        while jobs.get(job["id"])["callback"] is None and time.monotonic() < deadline:
+            time.sleep(0.02)
+        callback = jobs.get(job["id"])["callback"]
+        assert callback["ok"] is False and "307" in callback["error"]
+        assert hits == ["/hook"]
+    finally:
+        jobs.shutdown()
+        srv.shutdown()
@@ -0,0 +1,55 @@
+# -*- coding: utf-8 -*-
+import pickle
+
+from fastapi.testclient import TestClient
+
+from metrics import Counter, Histogram, Registry, STAGE_SECONDS
+
+def _registry():
+    reg = Registry()
+    hist = reg.register(Histogram("t_seconds", "latencia", (0.1, 1.0), ("stage",)))
+    count = reg.register(Counter("t_docs", "documentos", ("status",)))
+    return reg, hist, count
+
+def test_histogram_buckets_render_cumulative():
+    reg, hist, count = _registry()
+    for v in (0.05, 0.1, 0.5, 3.0):
+        hist.observe(v, ("ner",))
+    count.inc(("ok",), 2)
+    text = reg.render()
+    assert 't_seconds_bucket{stage="ner",le="0.1"} 2' in text  # le es inclusivo
+    assert 't_seconds_bucket{stage="ner",le="1"} 3' in text
+    assert 't_seconds_bucket{stage="ner",le="+Inf"} 4' in text
+    assert 't_seconds_count{stage="ner"} 4' in text and 't_seconds_sum{stage="ner"} 3.65' in text
+    assert 't_docs_total{status="ok"} 2' in text
+
+def test_drain_and_merge_across_processes():
+    parent, p_hist, p_count = _registry()
+    worker, w_hist, w_count = _registry()
+    p_hist.observe(0.05, ("ner",))
+    for _ in range(2):  # dos resultados del worker, cada uno con lo acumulado desde el anterior
+        w_hist.observe(0.5, ("ner",))
+        w_count.inc(("ok",))
+        parent.merge(pickle.loads(pickle.dumps(worker.drain())))  # viaja con el resultado
+    assert worker.drain() == {}  # drain reinicia
+    assert p_hist.count(("ner",)) == 3 and p_count.value(("ok",)) == 2
+    assert 't_seconds_bucket{stage="ner",le="1"} 3' in parent.render()
+    parent.merge(None)
+    parent.merge({"desconocida": {(): 1.0}})  # métricas que el padre no registra se ignoran
+
+def test_collectors_render_gauges_and_skip_failures():
+    reg, _, _ = _registry()
+    reg.add_collector(lambda: [("t_cache_bytes", "bytes en caché", {("result",): 10, ("audio",): 0}, ("cache",))])
+    reg.add_collector(lambda: 1 / 0)
+    text = reg.render()
+    assert "# TYPE t_cache_bytes gauge" in text
+    assert 't_cache_bytes{cache="audio"} 0' in text and 't_cache_bytes{cache="result"} 10' in text
+
+def test_metrics_endpoint_counts_pipeline_stages(pc):
+    before = STAGE_SECONDS.count(("total",))
+    with TestClient(pc.app) as client:
+        assert client.post("/extract", json={"text": "Titular con DNI 12345678."}).status_code == 200
+        text = client.get("/metrics").text
+    assert STAGE_SECONDS.count(("total",)) == before + 1
+    assert 'catastro_stage_seconds_count{stage="run_ner"}' in text
+    assert 'catastro_documents_total{status="ok"}' in text
@@ -0,0 +1,50 @@
+# -*- coding: utf-8 -*-
+import threading
+import time
+
+import pytest
+
+from micro_batch import MicroBatcher
+
+def test_concurrent_submits_share_a_batch():
+    seen = []
+
+    def batch_fn(items):
+        seen.append(len(items))
+        return [x * 2 if x != 3 else ValueError("tres") for x in items]
+    mb = MicroBatcher(batch_fn, window_ms=200, max_batch=8).start()
+    futs = [mb.submit(i) for i in range(6)]
+    assert [f.result(5) for i, f in enumerate(futs) if i != 3] == [0, 2, 4, 8, 10]
+    with pytest.raises(ValueError, match="tres"):
+        futs[3].result()
+    assert seen == [6] and mb.stats()["items"] == 6
+    mb.stop()
+
+def test_short_result_list_fails_every_future():
+    mb = MicroBatcher(lambda items: items[:-1], window_ms=100, max_batch=4).start()
+    futs = [mb.submit(i) for i in range(4)]
+    for f in futs:
+        with pytest.raises(RuntimeError, match="3 resultados para 4"):
+            f.result(5)  # antes: el último quedaba esperando para siempre
+    mb.stop()
+
+def test_submit_after_or_during_stop_fails_fast():
+    release = threading.Event()
+
+    def slow(items):
+        release.wait(5)
+        return items
+    mb = MicroBatcher(slow, window_ms=0, max_batch=1).start()
+    first = mb.submit("a")
+    queued = mb.submit("b")
+    stopper = threading.Thread(target=mb.stop, kwargs={"timeout": 5})
+    stopper.start()
+    while not mb._closed:
+        time.sleep(0.001)
+    with pytest.raises(RuntimeError, match="detenido"):
+        mb.submit("c").result(1)
+    release.set()
+    stopper.join()
+    assert first.result(1) == "a" and queued.result(1) == "b"  # lo encolado antes de stop se procesa
+    with pytest.raises(RuntimeError, match="no iniciado"):
+        MicroBatcher(slow).submit("x").result(1)
@@ -0,0 +1,71 @@
+# -*- coding: utf-8 -*-
+import gc
+import threading
+import time
+
+import pytest
+from fastapi.testclient import TestClient
+
+@pytest.fixture
+def startup(pc, monkeypatch):
+    """ PRELOAD activo y estado de arranque limpio antes y después de cada prueba. """
+    monkeypatch.setattr(pc, "PRELOAD", True)
+    pc._READY.clear()
+    pc._STARTUP.clear()
+    yield pc
+    pc._READY.clear()
+    pc._STARTUP.clear()
+    gc.unfreeze()
+
+def _wait_health(client, status, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while True:
+        r = client.get("/health")
+        if r.json()["status"] == status or time.monotonic() > deadline:
+            return r
+        time.sleep(0.01)
+
+def test_warmup_runs_both_modes_without_filling_the_cache(pc, monkeypatch):
+    monkeypatch.setattr(pc, "RESULT_CACHE_ENABLED", True)
+    monkeypatch.setattr(pc, "_RESULT_CACHE", None)
+    calls = []
+    real = pc.neural_pipes
+    monkeypatch.setattr(pc, "neural_pipes", lambda nlp: calls.append(1) or real(nlp))
+    assert pc.warmup(3) == 3
+    assert calls  # también el pase rules-only
+    st = pc.get_result_cache().stats()
+    assert st["entries"] == 0 and st["misses"] == 0
+
+def test_preload_marks_ready_and_freezes_the_heap(startup):
+    pc = startup
+    info = pc.preload(2)
+    assert pc._READY.is_set()
+    assert info["warmup_docs"] == 2 and info["pid"] > 0 and info["load_s"] >= 0
+    assert info["gc_frozen"] == gc.get_freeze_count() > 0
+    with TestClient(pc.app) as client:  # ya listo: el lifespan no repite la precarga
+        r = client.get("/health")
+    assert r.status_code == 200 and r.json()["ready"] is True and r.json()["startup"] == info
+
+def test_health_is_503_while_warming_and_reports_preload_errors(startup, monkeypatch):
+    pc = startup
+    gate = threading.Event()
+    def failing_preload():
+        gate.wait(5)
+        raise RuntimeError("modelo ilegible")
+    monkeypatch.setattr(pc, "preload", failing_preload)
+    with TestClient(pc.app) as client:
+        r = client.get("/health")
+        assert r.status_code == 503 and r.json() == {"status": "warming", "ready": False}
+        gate.set()
+        r = _wait_health(client, "error")
+    assert r.status_code == 503 and r.json()["error"] == "modelo ilegible"
+    assert not pc._READY.is_set()
+
+def test_health_turns_ready_after_background_preload(startup, monkeypatch):
+    pc = startup
+    monkeypatch.setattr(pc, "GC_FREEZE", False)
+    real = pc.preload
+    monkeypatch.setattr(pc, "preload", lambda: real(1))
+    with TestClient(pc.app) as client:
+        r = _wait_health(client, "ok")
+    assert r.status_code == 200 and r.json()["startup"]["gc_frozen"] == 0
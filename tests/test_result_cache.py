@@ -0,0 +1,52 @@
+# -*- coding: utf-8 -*-
+import os
+
+from result_cache import ResultCache, compute_fingerprint
+
+def _touch(path, text):
+    path.write_text(text, encoding="utf-8")
+    st = path.stat()
+    os.utime(path, ns=(st.st_atime_ns, st.st_mtime_ns + 1_000_000_000))  # mtime distinto aunque sea el mismo segundo
+
+def test_disk_entries_invalidated_by_model_catalog_and_config(tmp_path):
+    model = tmp_path / "model"
+    (model / "entity_ruler").mkdir(parents=True)
+    patterns = model / "entity_ruler" / "patterns.jsonl"
+    patterns.write_text('{"label":"DNI","pattern":"dni"}\n', encoding="utf-8")
+    catalog = tmp_path / "ubigeo.csv"
+    catalog.write_text("UBIGEO,DEPARTAMENTO,PROVINCIA,DISTRITO\n140108,LIMA,LIMA,CHORRILLOS\n", encoding="utf-8")
+    config = {"required_fields": ["DISTRITO"], "ubigeo_fuzzy": [0.8, 0.6]}
+    fp = lambda cfg=config: compute_fingerprint(model, [catalog], cfg)
+
+    first = fp()
+    cache = ResultCache(first, disk_dir=tmp_path / "cache")
+    cache.put(cache.key("texto", "full|full"), {"fields": {}})
+    cache.close()
+    # mismo modelo, catálogo y config tras un reinicio: acierto en disco
+    again = ResultCache(fp(), disk_dir=tmp_path / "cache")
+    assert again.get(again.key("texto", "full|full")) == {"fields": {}}
+    again.close()
+
+    changed = [fp({**config, "ubigeo_fuzzy": [0.9, 0.6]}), fp({**config, "required_fields": ["CUC"]})]
+    _touch(catalog, catalog.read_text(encoding="utf-8") + "140122,LIMA,LIMA,MIRAFLORES\n")
+    changed.append(fp())
+    patterns.write_text('{"label":"DNI","pattern":"d.n.i."}\n', encoding="utf-8")
+    changed.append(fp())
+    assert len({first, *changed}) == 5
+    for new in changed:
+        stale = ResultCache(new, disk_dir=tmp_path / "cache")
+        assert stale.get(stale.key("texto", "full|full")) is None
+        stale.close()
+
+def test_pipeline_fingerprint_covers_output_config(pc, monkeypatch):
+    monkeypatch.setattr(pc, "RESULT_CACHE_ENABLED", True)
+    def fingerprint():
+        monkeypatch.setattr(pc, "_RESULT_CACHE", None)
+        return pc.get_result_cache().fingerprint
+    base = fingerprint()
+    assert fingerprint() == base
+    for name, value in (("REQUIRED_FIELDS", ["DISTRITO"]), ("UBIGEO_FUZZY_MIN_SCORE", 0.95),
+                        ("CHUNK_CHARS", 500), ("CHUNK_OVERLAP", 10)):
+        with monkeypatch.context() as m:
+            m.setattr(pc, name, value)
+            assert fingerprint() != base, name
@@ -0,0 +1,33 @@
+# -*- coding: utf-8 -*-
+import json
+import random
+
+from synthetic import generate_corpus
+
+def _same(a, b) -> bool:
+    return json.dumps(a, sort_keys=True, default=str) == json.dumps(b, sort_keys=True, default=str)
+
+def test_reextract_equals_full_pass(pc):
+    rnd = random.Random(1)
+    inserts = ["", "Sector 12", "DNI 87654321", " zona 3 etapa 2. ", "lote 5. ", "xyz"]
+    checked = 0
+    for mode in ("full", "auto"):
+        for raw in generate_corpus(20, seed=11):
+            rev = pc.revision_from_output(raw, mode, pc.process_text(raw, mode, "full"))
+            cur = raw
+            for _ in range(5):
+                i = rnd.randrange(len(cur))
+                j = min(len(cur), i + rnd.randint(0, 10))
+                cur = cur[:i] + rnd.choice(inserts) + cur[j:]
+                out, rev, stats = pc.reextract(rev, cur, verify=False)
+                assert _same(out, pc._extract(pc.clean_text(cur), mode)), (mode, stats)
+                checked += 1
+    assert checked == 200
+
+def test_reextract_keeps_ruler_labels_outside_edit(pc):
+    raw = generate_corpus(1, seed=3)[0]
+    rev = pc.revision_from_output(raw, "full", pc.process_text(raw, "full", "full"))
+    new = "Sector 12. " + raw + " Zona sector 4."
+    out, _, stats = pc.reextract(rev, new, verify=False)
+    assert _same(out, pc._extract(pc.clean_text(new), "full"))
+    assert stats["changed_chars"][0] == 0
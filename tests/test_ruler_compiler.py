@@ -0,0 +1,44 @@
+# -*- coding: utf-8 -*-
+import json
+import shutil
+
+import spacy
+
+import ruler_compiler
+from synthetic import generate_corpus
+
+def _texts(pc, n=40):
+    return [pc.clean_text(t) for t in generate_corpus(n, seed=21, noise=0.5)]
+
+def _from_artifact(path):
+    nlp = spacy.blank("es")
+    ruler = nlp.add_pipe("entity_ruler", config={"overwrite_ents": True, "phrase_matcher_attr": "LOWER"})
+    ruler.add_patterns([json.loads(line) for line in path.read_text(encoding="utf-8").splitlines()])
+    return nlp
+
+def test_compiled_ruler_gives_same_entities(pc, ruler_model, monkeypatch):
+    texts = _texts(pc)
+    source = pc.load_model(str(ruler_model))
+    monkeypatch.setattr(pc, "RULER_COMPILE", True)
+    compiled = pc.load_model(str(ruler_model))
+    stats = ruler_compiler.compile_ruler(spacy.load(ruler_model))
+    assert stats["python_predicates_after"] != stats["python_predicates_before"]
+    assert ruler_compiler.verify(source, compiled, texts)["identical"]
+    ents = lambda nlp: [[(e.label_, e.start_char, e.end_char) for e in doc.ents] for doc in nlp.pipe(texts)]
+    assert ents(compiled) == ents(source)
+
+def test_verify_rejects_stale_artifact(pc, ruler_model, tmp_path):
+    texts = _texts(pc)
+    artifact = tmp_path / "patterns.compilados.jsonl"
+    assert ruler_compiler.main(["compile", "--model", str(ruler_model), "--out", str(artifact)]) == 0
+    assert ruler_compiler.verify(spacy.load(ruler_model), _from_artifact(artifact), texts)["identical"]
+
+    # los patrones fuente cambian después de compilar: el artefacto queda viejo
+    changed = tmp_path / "model"
+    shutil.copytree(ruler_model, changed)
+    patterns = changed / "entity_ruler" / "patterns.jsonl"
+    lines = patterns.read_text(encoding="utf-8").splitlines()
+    patterns.write_text("\n".join(l for l in lines if '"label":"SECTOR"' not in l) + "\n", encoding="utf-8")
+    res = ruler_compiler.verify(spacy.load(changed), _from_artifact(artifact), texts)
+    assert not res["identical"] and res["mismatched_docs"] > 0
+    assert all(label == "SECTOR" for ex in res["examples"] for label, _, _ in ex["only_compiled"])
@@ -0,0 +1,65 @@
+# -*- coding: utf-8 -*-
+import gzip
+import json
+
+import pytest
+from fastapi.testclient import TestClient
+
+import serialization
+from serialization import JSON, MSGPACK, NotAcceptable, negotiate, render
+
+TEXT = ("Titular con DNI 12345678. El predio está en el distrito de Miraflores, "
+        "provincia de Lima, departamento de Lima.")
+
+def test_profiles_are_projections_of_full(pc):
+    full = pc.process_text(TEXT, profile="full")
+    assert "spans" in full and all("sources" in f for f in full["fields"].values())
+    for profile in ("fields-only", "normalized-values-only"):
+        out = pc.process_text(TEXT, profile=profile)
+        assert out == pc.project_output(full, profile)
+    fields_only = pc.process_text(TEXT, profile="fields-only")
+    assert "spans" not in fields_only and fields_only["summary"] == full["summary"]
+    assert set(fields_only["fields"]["NUMERO_DOCUMENTO"]) == {"raw", "normalized", "valid", "errors"}
+    values = pc.process_text(TEXT, profile="normalized-values-only")["fields"]
+    assert values["NUMERO_DOCUMENTO"] == full["fields"]["NUMERO_DOCUMENTO"]["normalized"] == "12345678"
+    with pytest.raises(ValueError):
+        pc.resolve_profile("compact")
+
+def test_negotiate_by_quality(monkeypatch):
+    assert negotiate(None) == JSON and negotiate("*/*") == JSON
+    assert negotiate("text/html;q=0.9, application/json;q=0.5") == JSON
+    with pytest.raises(NotAcceptable):
+        negotiate("text/html, application/json;q=0")
+    monkeypatch.setattr(serialization, "msgpack", None)
+    assert negotiate("application/msgpack, application/json;q=0.1") == JSON  # sin msgpack cae a JSON
+    with pytest.raises(NotAcceptable):
+        negotiate("application/msgpack")
+
+def test_render_json_and_gzip_threshold():
+    payload = {"fields": {"DISTRITO": "MIRAFLORES", "ñ": None}}
+    r = render(payload)
+    assert r.media_type == JSON and json.loads(r.body) == payload
+    big = {"results": ["x" * 50] * 100}
+    assert "content-encoding" not in render(big, accept_encoding="gzip").headers  # 0 => nunca
+    assert "content-encoding" not in render(big, gzip_min_bytes=1024).headers  # no lo pidió
+    z = render(big, accept_encoding="gzip, br", gzip_min_bytes=1024)
+    assert z.headers["content-encoding"] == "gzip" and json.loads(gzip.decompress(z.body)) == big
+    assert "content-encoding" not in render(payload, accept_encoding="gzip", gzip_min_bytes=1024).headers
+
+def test_msgpack_round_trip():
+    msgpack = pytest.importorskip("msgpack")
+    r = render({"a": [1, "dos"]}, accept="application/x-msgpack")
+    assert r.media_type == MSGPACK and msgpack.unpackb(r.body) == {"a": [1, "dos"]}
+
+def test_endpoints_negotiate_and_compress_batches(pc, monkeypatch):
+    monkeypatch.setattr(pc, "GZIP_MIN_KB", 1)
+    with TestClient(pc.app) as client:
+        r = client.post("/extract", json={"text": TEXT, "profile": "normalized-values-only"})
+        assert r.status_code == 200 and r.json()["fields"]["NUMERO_DOCUMENTO"] == "12345678"
+        assert client.post("/extract", json={"text": TEXT}, headers={"Accept": "text/html"}).status_code == 406
+        assert client.post("/extract", json={"text": TEXT, "profile": "compact"}).status_code == 400
+        r = client.post("/extract_batch", json={"texts": [TEXT] * 4}, headers={"Accept-Encoding": "gzip"})
+        assert r.headers.get("content-encoding") == "gzip"
+        assert r.json()["summary"] == {"total": 4, "ok": 4, "failed": 0}
+        r = client.post("/extract_batch", json={"texts": [TEXT]}, headers={"Accept-Encoding": "identity"})
+        assert "content-encoding" not in r.headers
@@ -0,0 +1,56 @@
+# -*- coding: utf-8 -*-
+import pytest
+from fastapi.testclient import TestClient
+
+from streaming import FakeStreamingASR, parse_client_message
+
+def test_fake_streaming_asr_partials_and_finals():
+    asr = FakeStreamingASR()
+    events = asr.feed("Titular con DNI 1234".encode("utf-8"))
+    assert [(e.text, e.final) for e in events] == [("Titular con DNI 1234", False)]
+    events = asr.feed("5678. Teléfono 98".encode("utf-8"))
+    assert [(e.text, e.final) for e in events] == [("Titular con DNI 12345678.", True), ("Teléfono 98", False)]
+    assert [(e.text, e.final) for e in asr.finish()] == [("Teléfono 98", True)]
+
+def test_parse_client_message_rejects_invalid():
+    assert parse_client_message('{"type": "end"}') == {"type": "end"}
+    for bad in ("no json", '{"type": "x"}', '{"type": "segment"}'):
+        with pytest.raises(ValueError):
+            parse_client_message(bad)
+
+def test_ws_dictado_incremental_fields(pc):
+    chunks = ["Titular con DNI 1234", "5678. Su teléfono es ", "987654321. Manzana C lote 5"]
+    with TestClient(pc.app) as client:
+        with client.websocket_connect("/ws/dictado?asr=fake&mode=rules-only") as ws:
+            assert ws.receive_json() == {"type": "ready", "mode": "rules-only"}
+            ws.send_bytes(chunks[0].encode("utf-8"))
+            assert ws.receive_json() == {"type": "partial", "text": chunks[0]}
+
+            ws.send_bytes(chunks[1].encode("utf-8"))
+            msg = ws.receive_json()
+            assert msg["type"] == "fields" and msg["seq"] == 1
+            assert msg["fields"]["NUMERO_DOCUMENTO"] == "12345678"
+            assert "NUMERO_DOCUMENTO" in msg["updated"]
+            assert ws.receive_json()["type"] == "partial"
+
+            ws.send_bytes(chunks[2].encode("utf-8"))
+            msg = ws.receive_json()
+            assert msg["seq"] == 2 and "NUMERO_DOCUMENTO" not in msg["updated"]
+            assert ws.receive_json() == {"type": "partial", "text": "Manzana C lote 5"}
+
+            ws.send_json({"type": "segment", "text": "mal", "final": False})
+            assert ws.receive_json() == {"type": "partial", "text": "mal"}
+            ws.send_text("no json")
+            assert ws.receive_json()["type"] == "error"
+
+            ws.send_json({"type": "end"})
+            msg = ws.receive_json()  # el resto del ASR sale como final al cerrar
+            assert msg["type"] == "fields" and msg["segment"] == "Manzana C lote 5"
+            final = ws.receive_json()
+        assert final["type"] == "final"
+        result = final["result"]
+        assert result["streaming"]["segments"] == 3
+        # lo acumulado coincide con extraer el texto dictado completo de una vez
+        full = pc.process_text("".join(chunks), "rules-only", "full")
+        assert {k: v["normalized"] for k, v in result["fields"].items()} == \
+               {k: v["normalized"] for k, v in full["fields"].items()}
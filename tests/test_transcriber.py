@@ -0,0 +1,35 @@
+# -*- coding: utf-8 -*-
+import assemblyai as aai
+import pytest
+from fastapi.testclient import TestClient
+
+import transcriber
+
+TEXT = "Titular con DNI 12345678, teléfono 987654321."
+
+def test_fake_backend_is_deterministic():
+    a = transcriber.transcribe_audio(TEXT.encode("utf-8"), "fake")
+    b = transcriber.transcribe_audio(TEXT.encode("utf-8"), "fake")
+    assert a["text"] == b["text"] == TEXT
+    assert a["words"] == TEXT.split()
+    assert a["timing"]["backend"] == "fake"
+    binary = transcriber.transcribe_audio(b"\xff\xfe\x00", "fake")["text"]
+    assert binary == transcriber.transcribe_audio(b"\xff\xfe\x00", "fake")["text"]
+
+def test_transcribir_endpoints_with_fake_backend(pc):
+    with TestClient(pc.app) as client:
+        r = client.post("/transcribir", files={"file": ("a.wav", TEXT.encode("utf-8"))}, data={"backend": "fake"})
+        assert r.status_code == 200 and r.json()["text"] == TEXT
+        r = client.post("/transcribir_extract", files={"file": ("a.wav", TEXT.encode("utf-8"))},
+                        data={"backend": "fake"})
+        assert r.status_code == 200
+        out = r.json()
+        assert out["fields"]["NUMERO_DOCUMENTO"]["normalized"] == "12345678"
+        assert out["asr"]["timing"]["backend"] == "fake"
+        assert client.post("/transcribir", files={"file": ("a.wav", b"x")},
+                           data={"backend": "nope"}).status_code == 400
+
+def test_assemblyai_without_key_fails_clearly(monkeypatch):
+    monkeypatch.setattr(aai.settings, "api_key", None)
+    with pytest.raises(RuntimeError, match="ASSEMBLYAI_API_KEY"):
+        transcriber.AssemblyAIBackend().transcribe(b"audio")
@@ -0,0 +1,25 @@
+# -*- coding: utf-8 -*-
+from pipeline_catastral import SpanInfo
+
+def _fields(pc, **places):
+    por_campo = {k: [SpanInfo(k, v, 0, len(v))] for k, v in places.items()}
+    return pc.build_fields(por_campo)["UBIGEO"]
+
+def test_unique_district_only_match_is_valid(pc):
+    ub = _fields(pc, DISTRITO="Chorrios")  # ASR de "Chorrillos", sin provincia ni departamento
+    assert ub.valid is True and ub.normalized == "140108" and ub.errors == []
+    assert ub.sources[0]["label"] == "INFERIDO_DIFUSO" and 0.8 <= ub.sources[0]["score"] < 1
+    assert pc.infer_ubigeo({"DISTRITO": pc.FieldResult(normalized="Chorrios")}) == "140108"
+
+def test_tied_district_is_ambiguous(pc):
+    ub = _fields(pc, DISTRITO="Miraflores")  # Lima y Arequipa
+    assert ub.valid is False and ub.normalized is None and ub.errors == ["UBIGEO_AMBIGUO"]
+    assert _fields(pc, DEPARTAMENTO="Lima", PROVINCIA="Lima", DISTRITO="Miraflores").normalized == "140115"
+
+def test_low_score_match_is_unconfirmed(pc, monkeypatch):
+    monkeypatch.setattr(pc, "UBIGEO_FUZZY_MIN_SCORE", 0.95)
+    ub = _fields(pc, DISTRITO="Chorrios")
+    assert ub.valid is False and ub.normalized is None and ub.errors == ["UBIGEO_SIN_CONFIRMAR"]
+    assert pc.infer_ubigeo({"DISTRITO": pc.FieldResult(normalized="Chorrios")}) is None
+    monkeypatch.setattr(pc, "UBIGEO_FUZZY_REVIEW_SCORE", 0.95)
+    assert "UBIGEO" not in pc.build_fields({"DISTRITO": [SpanInfo("DISTRITO", "Chorrios", 0, 8)]})
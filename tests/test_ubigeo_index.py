@@ -0,0 +1,43 @@
+# -*- coding: utf-8 -*-
+import os
+
+from ubigeo_index import UbigeoIndex, open_index, write_index
+
+CSV = "UBIGEO,DEPARTAMENTO,PROVINCIA,DISTRITO\n140108,LIMA,LIMA,CHORRILLOS\n150101,ÁNCASH,HUARAZ,HUARAZ\n"
+
+def test_index_round_trips_the_real_catalog(pc, tmp_path):
+    source = pc.ubigeo_source_path()
+    catalog = pc.load_ubigeo_from_source(source)
+    idx = open_index(write_index(catalog, tmp_path / "u.idx", source), source)
+    assert idx is not None and len(idx) == len(catalog)
+    assert dict(idx.iter_items()) == catalog and list(idx) == sorted(catalog, key=lambda k: k.encode("utf-8"))
+    for key, code in list(catalog.items())[::37]:
+        assert idx[key] == code and key in idx
+    assert idx.get("LIMA|LIMA|NO EXISTE") is None and 123 not in idx
+    idx.close()
+
+def test_stale_or_broken_index_is_ignored(pc, tmp_path):
+    source = tmp_path / "ubigeo.csv"
+    source.write_text(CSV, encoding="utf-8")
+    path = write_index(pc.load_ubigeo_from_source(source), tmp_path / "u.idx", source)
+    assert open_index(path, source)["ANCASH|HUARAZ|HUARAZ"] == "150101"
+    utf8 = open_index(write_index({"ÑUÑOA|B|C": "000001", "N|B|C": "000002"}, tmp_path / "n.idx"))
+    assert utf8["ÑUÑOA|B|C"] == "000001" and list(utf8) == ["N|B|C", "ÑUÑOA|B|C"]  # orden por bytes UTF-8
+
+    st = source.stat()
+    os.utime(source, ns=(st.st_atime_ns, st.st_mtime_ns + 10**9))  # sólo cambia el mtime: sha256 igual
+    assert open_index(path, source) is not None
+    source.write_text(CSV + "140122,LIMA,LIMA,MIRAFLORES\n", encoding="utf-8")
+    assert open_index(path, source) is None
+
+    path.write_bytes(path.read_bytes()[:-3])
+    assert open_index(path) is None
+    assert open_index(tmp_path / "no.idx") is None
+
+def test_catalog_prefers_fresh_index(pc, tmp_path, monkeypatch):
+    source = pc.ubigeo_source_path()
+    path = write_index(pc.load_ubigeo_from_source(source), tmp_path / "u.idx", source)
+    monkeypatch.setattr(pc, "UBIGEO_INDEX_PATH", path)
+    monkeypatch.setattr(pc, "UBIGEO_CACHE", {})
+    cat = pc.load_ubigeo_catalog()
+    assert isinstance(cat, UbigeoIndex) and cat["LIMA|LIMA|CHORRILLOS"] == "140108"
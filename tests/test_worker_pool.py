@@ -0,0 +1,37 @@
+# -*- coding: utf-8 -*-
+import os
+import signal
+
+import pytest
+
+from synthetic import generate_corpus
+from worker_pool import NERWorkerPool, _work_ping, _work_run_ner
+
+@pytest.fixture(scope="module")
+def pool(pc, ruler_model):
+    pool = NERWorkerPool(workers=2, model_path=str(ruler_model), start_method="spawn").start()
+    yield pool
+    pool.shutdown()
+
+def test_pool_matches_local_and_keeps_order(pc, pool):
+    texts = generate_corpus(9, seed=4)
+    local = list(pc.process_texts(texts))
+    assert pool.process_texts(texts, batch_size=2) == local
+    assert pool.process_text(texts[0]) == local[0]
+    parts = pool._fan_out(_work_run_ner, texts, "rules-only")
+    assert [len(p) for p, _ in parts] == [5, 4]  # un sub-lote por worker, no uno por batch_size
+
+def test_pool_restarts_after_a_worker_dies(pc, pool):
+    pids = {pool._executor.submit(_work_ping).result() for _ in range(4)}
+    os.kill(next(iter(pids)), signal.SIGKILL)
+    before = pool.restarts
+    text = generate_corpus(1, seed=8)[0]
+    assert pool.process_text(text) == pc.process_text(text)  # BrokenProcessPool -> pool nuevo y reintento
+    assert pool.restarts == before + 1
+    assert pool.stats()["closed"] is False
+
+def test_closed_pool_rejects_calls(ruler_model):
+    pool = NERWorkerPool(workers=1, model_path=str(ruler_model))
+    pool.shutdown()
+    with pytest.raises(RuntimeError, match="cerrado"):
+        pool.process_text("DNI 12345678")
@@ -1,9 +1,17 @@
 import assemblyai as aai
+import io
 import os
-from tempfile import NamedTemporaryFile
+import time
+import hashlib
+import threading
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+from audio_cache import AudioCache, AudioSource
+from asr_client import AssemblyAIClient, ConcurrencyLimiter
+from metrics import TRANSCRIPTION_SECONDS, CACHE_LOOKUPS, ASR_EVENTS
 
 
-aai.settings.api_key = "15d836ea8999402391868018349ae35a"
+aai.settings.api_key = os.getenv("ASSEMBLYAI_API_KEY") or None  # sin clave: los backends remotos fallan con un error claro
 
 
 config = aai.TranscriptionConfig(
@@ -11,26 +19,258 @@ config = aai.TranscriptionConfig(
     language_code="es"
 )
 
-def transcribe_audio(audio_bytes: bytes):
-    if not aai.settings.api_key:
-        raise RuntimeError("ASSEMBLYAI_API_KEY no está configurada.")
-    with NamedTemporaryFile(delete=False, suffix=".mp3") as temp_audio:
-        temp_audio.write(audio_bytes)
-        temp_audio.flush()
-        path = temp_audio.name
-    try:
-        transcriber = aai.Transcriber(config=config)
-        transcript = transcriber.transcribe(path)
+# Backend de transcripción por defecto: "assemblyai" | "local" (CPU, faster-whisper) | "fake"
+ASR_BACKEND = os.getenv("CATASTRO_ASR_BACKEND", "assemblyai").lower()
+
+# Motor local (offline): pip install faster-whisper
+LOCAL_ASR_MODEL = os.getenv("CATASTRO_LOCAL_ASR_MODEL", "small")
+LOCAL_ASR_COMPUTE = os.getenv("CATASTRO_LOCAL_ASR_COMPUTE", "int8")
+LOCAL_ASR_THREADS = int(os.getenv("CATASTRO_LOCAL_ASR_THREADS", "0"))  # 0 => los que elija ctranslate2
+LOCAL_ASR_BEAM = int(os.getenv("CATASTRO_LOCAL_ASR_BEAM", "1"))
+
+# Cliente AssemblyAI compartido (asr_client.py): límites, cola y reintentos
+ASR_BASE_URL = os.getenv("CATASTRO_ASR_BASE_URL", "")  # vacío => API pública; p. ej. un servidor local de pruebas
+ASR_HTTP_TIMEOUT_S = float(os.getenv("CATASTRO_ASR_HTTP_TIMEOUT_S", "30"))  # por operación de socket
+ASR_POLL_INTERVAL_S = float(os.getenv("CATASTRO_ASR_POLL_INTERVAL_S", "3"))
+ASR_POLL_TIMEOUT_S = float(os.getenv("CATASTRO_ASR_POLL_TIMEOUT_S", "900"))  # 0 => sin límite
+ASR_MAX_INFLIGHT = int(os.getenv("CATASTRO_ASR_MAX_INFLIGHT", "8"))
+ASR_MAX_QUEUE = int(os.getenv("CATASTRO_ASR_MAX_QUEUE", "32"))  # más allá => 429
+ASR_QUEUE_TIMEOUT_S = float(os.getenv("CATASTRO_ASR_QUEUE_TIMEOUT_S", "30"))  # espera de turno agotada => 503
+ASR_RETRIES = int(os.getenv("CATASTRO_ASR_RETRIES", "3"))
+ASR_BACKOFF_S = float(os.getenv("CATASTRO_ASR_BACKOFF_S", "0.5"))
+ASR_MAX_BACKOFF_S = float(os.getenv("CATASTRO_ASR_MAX_BACKOFF_S", "8"))
+ASR_RETRY_AFTER_S = float(os.getenv("CATASTRO_ASR_RETRY_AFTER_S", "5"))
+
+# Caché de transcripciones por huella del audio (re-subidas tras cortes de conexión)
+AUDIO_CACHE_ENABLED = os.getenv("CATASTRO_AUDIO_CACHE", "1").lower() in {"1", "true", "si", "yes"}
+AUDIO_CACHE_DIR = Path(os.getenv("CATASTRO_AUDIO_CACHE_DIR", str(Path(__file__).parent / ".audio_cache")))
+AUDIO_CACHE_MB = float(os.getenv("CATASTRO_AUDIO_CACHE_MB", "512"))
+
+_AUDIO_CACHE: Optional[AudioCache] = None
+def get_audio_cache() -> Optional[AudioCache]:
+    global _AUDIO_CACHE
+    if not AUDIO_CACHE_ENABLED:
+        return None
+    if _AUDIO_CACHE is None:
+        _AUDIO_CACHE = AudioCache(AUDIO_CACHE_DIR, max_bytes=int(AUDIO_CACHE_MB * (1 << 20)))
+    return _AUDIO_CACHE
+
+def _config_tag(cfg: aai.TranscriptionConfig) -> str:
+    return f"{cfg.speech_model}|{cfg.language_code}"
+
+def _jsonable(obj):
+    """ Utterances del SDK (modelos pydantic) -> dict, para cachear y responder igual. """
+    if obj is None or isinstance(obj, (str, int, float, bool)):
+        return obj
+    if isinstance(obj, (list, tuple)):
+        return [_jsonable(x) for x in obj]
+    if isinstance(obj, dict):
+        return {k: _jsonable(v) for k, v in obj.items()}
+    for attr in ("model_dump", "dict"):
+        fn = getattr(obj, attr, None)
+        if callable(fn):
+            return _jsonable(fn())
+    return str(obj)
+
+# ----------------------------
+# Backends de transcripción
+# ----------------------------
+# Todos devuelven {text, confidence, words, utterances, audio_duration}; los tiempos
+# (timing) los agrega transcribe_audio, igual para todos.
+class TranscriptionBackend:
+    name = "base"
+
+    def config_tag(self) -> str:
+        """ Parte de la clave de caché: cambia si cambia lo que produce la transcripción. """
+        return self.name
+
+    def transcribe(self, audio: AudioSource) -> Dict[str, Any]:
+        raise NotImplementedError
+
+class AssemblyAIBackend(TranscriptionBackend):
+    name = "assemblyai"
+
+    def __init__(self):
+        self._client: Optional[AssemblyAIClient] = None
+        self._lock = threading.Lock()
+
+    def config_tag(self) -> str:
+        return _config_tag(config)  # mismo tag de siempre: las entradas ya cacheadas siguen valiendo
+
+    def get_client(self) -> AssemblyAIClient:
+        """ Un cliente (pool HTTP + limitador) por proceso, creado al primer uso. """
+        with self._lock:
+            if self._client is None:
+                if not aai.settings.api_key:
+                    raise RuntimeError("ASSEMBLYAI_API_KEY no está configurada.")
+                limiter = ConcurrencyLimiter(ASR_MAX_INFLIGHT, ASR_MAX_QUEUE, ASR_QUEUE_TIMEOUT_S, ASR_RETRY_AFTER_S)
+                self._client = AssemblyAIClient(
+                    config, base_url=ASR_BASE_URL or None, http_timeout_s=ASR_HTTP_TIMEOUT_S,
+                    poll_interval_s=ASR_POLL_INTERVAL_S, poll_timeout_s=ASR_POLL_TIMEOUT_S, limiter=limiter,
+                    retries=ASR_RETRIES, backoff_s=ASR_BACKOFF_S, max_backoff_s=ASR_MAX_BACKOFF_S,
+                    on_event=lambda ev: ASR_EVENTS.inc((self.name, ev)))
+            return self._client
+
+    def stats(self) -> Optional[Dict[str, Any]]:
+        return self._client.stats() if self._client is not None else None
+
+    def close(self) -> None:
+        with self._lock:
+            if self._client is not None:
+                self._client.close()
+                self._client = None
+
+    def transcribe(self, audio: AudioSource) -> Dict[str, Any]:
+        if isinstance(audio, bytearray):
+            audio = bytes(audio)
+        transcript = self.get_client().transcribe(audio)  # ruta / bytes / file-like, sin copia temporal
         if transcript.status == "error":
             raise RuntimeError(f"Transcripción fallida: {transcript.error}")
         return {
             "text": transcript.text,
             "confidence": transcript.confidence,
             "words": [w.text for w in transcript.words],
-            "utterances": transcript.utterances
+            "utterances": _jsonable(transcript.utterances),
+            "audio_duration": transcript.audio_duration,
         }
-    finally:
+
+class LocalWhisperBackend(TranscriptionBackend):
+    """ Transcripción offline en CPU con faster-whisper (CTranslate2, int8). El modelo se carga una vez. """
+    name = "local"
+
+    def __init__(self, model: str = LOCAL_ASR_MODEL, compute_type: str = LOCAL_ASR_COMPUTE,
+                 threads: int = LOCAL_ASR_THREADS, beam_size: int = LOCAL_ASR_BEAM, language: str = "es"):
+        self.model_name, self.compute_type = model, compute_type
+        self.threads, self.beam_size, self.language = threads, beam_size, language
+        self._model = None
+        self._lock = threading.Lock()
+
+    def config_tag(self) -> str:
+        return f"{self.name}|{self.model_name}|{self.compute_type}|{self.beam_size}|{self.language}"
+
+    def _get_model(self):
+        with self._lock:
+            if self._model is None:
+                try:
+                    from faster_whisper import WhisperModel
+                except ImportError:
+                    raise RuntimeError("El backend 'local' requiere faster-whisper (pip install faster-whisper).")
+                self._model = WhisperModel(self.model_name, device="cpu", compute_type=self.compute_type,
+                                           cpu_threads=self.threads)
+            return self._model
+
+    def transcribe(self, audio: AudioSource) -> Dict[str, Any]:
+        model = self._get_model()
+        if isinstance(audio, (bytes, bytearray)):
+            audio = io.BytesIO(audio)
+        elif isinstance(audio, Path):
+            audio = str(audio)
+        segments, info = model.transcribe(audio, language=self.language, beam_size=self.beam_size,
+                                          word_timestamps=True, vad_filter=True)
+        texts: List[str] = []
+        words: List[str] = []
+        probs: List[float] = []
+        utterances: List[Dict[str, Any]] = []
+        for seg in segments:  # generador: la decodificación ocurre al iterar
+            texts.append(seg.text.strip())
+            for w in seg.words or []:
+                words.append(w.word.strip())
+                probs.append(w.probability)
+            utterances.append({"text": seg.text.strip(), "start": int(seg.start * 1000),
+                               "end": int(seg.end * 1000), "speaker": None})
+        return {
+            "text": " ".join(t for t in texts if t),
+            "confidence": sum(probs) / len(probs) if probs else None,
+            "words": words,
+            "utterances": utterances,
+            "audio_duration": info.duration,
+        }
+
+class FakeBackend(TranscriptionBackend):
+    """
+    Determinista y sin red, para pruebas: si el "audio" es texto UTF-8 ese es el
+    transcrito; si no, un texto fijo con la huella del audio.
+    """
+    name = "fake"
+
+    def transcribe(self, audio: AudioSource) -> Dict[str, Any]:
+        if isinstance(audio, (bytes, bytearray)):
+            data = bytes(audio)
+        elif isinstance(audio, (str, os.PathLike)):
+            data = Path(audio).read_bytes()
+        else:
+            data = audio.read()
         try:
-            os.remove(path)
-        except Exception:
-            pass
\ No newline at end of file
+            text = data.decode("utf-8").strip()
+        except UnicodeDecodeError:
+            text = f"Audio {hashlib.sha256(data).hexdigest()[:12]} sin transcripción."
+        words = text.split()
+        return {"text": text, "confidence": 1.0, "words": words,
+                "utterances": [{"text": text, "start": 0, "end": 0, "speaker": "A"}] if text else [],
+                "audio_duration": None}
+
+BACKENDS = {b.name: b for b in (AssemblyAIBackend, LocalWhisperBackend, FakeBackend)}
+
+_BACKENDS: Dict[str, TranscriptionBackend] = {}
+_BACKENDS_LOCK = threading.Lock()
+
+def resolve_backend(name: Optional[str] = None) -> str:
+    """ Prioridad: argumento (por request) > CATASTRO_ASR_BACKEND; ValueError si no existe. """
+    b = (name or ASR_BACKEND or "assemblyai").lower()
+    if b not in BACKENDS:
+        raise ValueError(f"Backend de transcripción desconocido: '{name}' (usa {', '.join(BACKENDS)})")
+    return b
+
+def get_backend(name: Optional[str] = None) -> TranscriptionBackend:
+    name = resolve_backend(name)
+    with _BACKENDS_LOCK:
+        if name not in _BACKENDS:
+            _BACKENDS[name] = BACKENDS[name]()
+        return _BACKENDS[name]
+
+def asr_client_stats() -> Optional[Dict[str, Any]]:
+    """ En vuelo, en cola, rechazos y reintentos del cliente AssemblyAI (None si no se usó). """
+    be = _BACKENDS.get(AssemblyAIBackend.name)
+    return be.stats() if be is not None else None
+
+def stop_asr_client() -> None:
+    be = _BACKENDS.get(AssemblyAIBackend.name)
+    if be is not None:
+        be.close()
+
+def transcribe_audio(audio: AudioSource, backend: Optional[str] = None):
+    """
+    audio: bytes, ruta (str/Path) o file-like binario abierto. Rutas y file-likes se
+    hashean y se suben por bloques (el SDK los envía en streaming), sin cargarlos enteros.
+    backend: None => CATASTRO_ASR_BACKEND. La respuesta incluye "timing" del backend usado.
+    """
+    t0 = time.perf_counter()
+    status = "error"
+    be = get_backend(backend)
+    try:
+        result, status = _transcribe(be, audio)
+        elapsed = time.perf_counter() - t0
+        duration = result.get("audio_duration")
+        result["timing"] = {
+            "backend": be.name,
+            "seconds": round(elapsed, 3),
+            "cached": status == "cached",
+            "real_time_factor": round(elapsed / duration, 3) if duration else None,
+        }
+        return result
+    finally:
+        TRANSCRIPTION_SECONDS.observe(time.perf_counter() - t0, (be.name, status))
+
+def _transcribe(be: TranscriptionBackend, audio: AudioSource) -> Tuple[Dict[str, Any], str]:
+    cache = get_audio_cache()
+    key = None
+    if cache is not None:
+        key = cache.key(audio, be.config_tag())
+        hit = cache.get(key)
+        CACHE_LOOKUPS.inc(("audio", "miss" if hit is None else "hit"))
+        if hit is not None:
+            return hit, "cached"
+    result = be.transcribe(audio)
+    if key is not None:
+        cache.put(key, result)
+    return result, "ok"
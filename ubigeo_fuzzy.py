@@ -0,0 +1,165 @@
+# -*- coding: utf-8 -*-
+"""
+Resolución difusa y jerárquica de UBIGEO para nombres de lugar mal transcritos.
+
+Se construye una sola vez desde el catálogo {"DEP|PROV|DIST": "UBIGEO"}:
+- índices de trigramas por nivel (departamento, provincia, distrito)
+- jerarquía departamento -> provincias -> distritos
+
+resolve() puntúa el departamento, luego sólo las provincias de los departamentos
+candidatos y luego sólo los distritos de esas provincias; si falta un nivel
+("Chorrios" sin provincia ni departamento) se recurre al índice de trigramas global
+de ese nivel. La similitud final es difflib.SequenceMatcher.ratio (0..1), tolerante
+a letras cambiadas y palabras omitidas ("San Juan Lurigancho").
+"""
+
+import re
+from difflib import SequenceMatcher
+from functools import lru_cache
+from typing import Any, Callable, Dict, Iterable, List, Optional, Set, Tuple
+
+# Prefijos que el NER suele incluir en el span ("distrito de Miraflores")
+_PREFIX_RX = re.compile(
+    r"^(?:(?:EL\s+)?(?:DEPARTAMENTO|DEPTO|DPTO|REGION|PROVINCIA|PROV|DISTRITO|DIST)\.?\s+(?:DE(?:L)?\s+)?)+"
+)
+
+def _trigrams(s: str) -> Set[str]:
+    t = f"  {s} "
+    return {t[i:i + 3] for i in range(len(t) - 2)}
+
+def _ratio(a: str, b: str) -> float:
+    if a == b:
+        return 1.0
+    return SequenceMatcher(None, a, b).ratio()
+
+class _Level:
+    """ Nombres únicos de un nivel + índice de trigramas -> ids de nombre. """
+
+    def __init__(self, names: Iterable[str]):
+        self.names: List[str] = sorted(set(names))
+        self.grams: Dict[str, List[int]] = {}
+        for i, n in enumerate(self.names):
+            for g in _trigrams(n):
+                self.grams.setdefault(g, []).append(i)
+
+    def search(self, q: str, allowed: Optional[Set[str]] = None, limit: int = 8,
+               prefilter: int = 40) -> List[Tuple[str, float]]:
+        """ Candidatos (nombre, score) ordenados; `allowed` restringe el universo (jerarquía). """
+        if allowed is not None and len(allowed) <= prefilter:
+            pool = allowed  # universo chico: se puntúa todo directamente
+        else:
+            counts: Dict[int, int] = {}
+            for g in _trigrams(q):
+                for i in self.grams.get(g, ()):
+                    counts[i] = counts.get(i, 0) + 1
+            ranked = sorted(counts.items(), key=lambda kv: -kv[1])
+            pool = []
+            for i, _ in ranked:
+                n = self.names[i]
+                if allowed is None or n in allowed:
+                    pool.append(n)
+                    if len(pool) >= prefilter:
+                        break
+        scored = sorted(((n, _ratio(q, n)) for n in pool), key=lambda t: (-t[1], t[0]))
+        return scored[:limit]
+
+class UbigeoResolver:
+    def __init__(self, catalog_items: Iterable[Tuple[str, str]],
+                 normalize: Callable[[str], str], cache_size: int = 4096):
+        self.normalize = normalize
+        self.codes: Dict[Tuple[str, str, str], str] = {}
+        self.provs_by_dep: Dict[str, Set[str]] = {}
+        self.dists_by_prov: Dict[Tuple[str, str], Set[str]] = {}
+        self.keys_by_dist: Dict[str, List[Tuple[str, str, str]]] = {}
+        self.keys_by_prov: Dict[str, List[Tuple[str, str]]] = {}
+        for key, code in catalog_items:
+            dep, prov, dist = key.split("|")
+            self.codes[(dep, prov, dist)] = code
+            self.provs_by_dep.setdefault(dep, set()).add(prov)
+            self.dists_by_prov.setdefault((dep, prov), set()).add(dist)
+            self.keys_by_dist.setdefault(dist, []).append((dep, prov, dist))
+        for dep, provs in self.provs_by_dep.items():
+            for prov in provs:
+                self.keys_by_prov.setdefault(prov, []).append((dep, prov))
+        self.deps = _Level(self.provs_by_dep)
+        self.provs = _Level(p for ps in self.provs_by_dep.values() for p in ps)
+        self.dists = _Level(self.keys_by_dist)
+        self._resolve = lru_cache(maxsize=cache_size)(self._resolve_uncached)
+
+    def __len__(self) -> int:
+        return len(self.codes)
+
+    def clean(self, s: Optional[str]) -> str:
+        if not s:
+            return ""
+        return _PREFIX_RX.sub("", self.normalize(s)).strip()
+
+    def resolve(self, departamento: Optional[str] = None, provincia: Optional[str] = None,
+                distrito: Optional[str] = None) -> Optional[Dict[str, Any]]:
+        """
+        Mejor UBIGEO para la entrada (cualquier nivel puede faltar, pero se necesita distrito).
+        Devuelve {"ubigeo", "score", "departamento", "provincia", "distrito", "exact", "ambiguous"}
+        o None si no hay candidatos.
+        """
+        return self._resolve(self.clean(departamento), self.clean(provincia), self.clean(distrito))
+
+    def _resolve_uncached(self, dep_q: str, prov_q: str, dist_q: str) -> Optional[Dict[str, Any]]:
+        if not dist_q:
+            return None
+        exact = self.codes.get((dep_q, prov_q, dist_q))
+        if exact:
+            return self._result(exact, 1.0, (dep_q, prov_q, dist_q), True, False)
+
+        # 1) departamento
+        dep_scores: Dict[str, float] = {}
+        if dep_q:
+            dep_scores = dict(self.deps.search(dep_q, limit=3))
+        # 2) provincia (restringida a los departamentos candidatos)
+        prov_scores: Dict[Tuple[str, str], float] = {}
+        if prov_q:
+            allowed = None
+            if dep_scores:
+                allowed = {p for d in dep_scores for p in self.provs_by_dep[d]}
+            for prov, sc in self.provs.search(prov_q, allowed=allowed, limit=5):
+                for dep, _ in self.keys_by_prov[prov]:
+                    if not dep_scores or dep in dep_scores:
+                        prov_scores[(dep, prov)] = sc
+        # 3) distrito (restringido a las provincias / departamentos candidatos)
+        if prov_scores:
+            parents = list(prov_scores)
+        elif dep_scores:
+            parents = [(d, p) for d in dep_scores for p in self.provs_by_dep[d]]
+        else:
+            parents = None
+        allowed = None
+        if parents is not None:
+            allowed = {x for par in parents for x in self.dists_by_prov.get(par, ())}
+        best: List[Tuple[float, Tuple[str, str, str]]] = []
+        for dist, sc in self.dists.search(dist_q, allowed=allowed, limit=5):
+            for key in self.keys_by_dist[dist]:
+                dep, prov, _ = key
+                if prov_scores:
+                    if (dep, prov) not in prov_scores:
+                        continue
+                elif dep_scores and dep not in dep_scores:
+                    continue
+                levels = [sc]
+                if dep_q:
+                    levels.append(dep_scores.get(dep, 0.0))
+                if prov_q:
+                    levels.append(prov_scores.get((dep, prov), 0.0))
+                # el distrito pesa el doble: es el nivel que identifica el UBIGEO
+                total = (2 * sc + sum(levels[1:])) / (1 + len(levels))
+                best.append((total, key))
+        if not best:
+            return None
+        best.sort(key=lambda t: (-t[0], t[1]))
+        top_score, top_key = best[0]
+        ambiguous = len(best) > 1 and abs(best[1][0] - top_score) < 1e-9 and best[1][1] != top_key
+        return self._result(self.codes[top_key], top_score, top_key, False, ambiguous)
+
+    @staticmethod
+    def _result(code: str, score: float, key: Tuple[str, str, str], exact: bool, ambiguous: bool) -> Dict[str, Any]:
+        dep, prov, dist = key
+        return {"ubigeo": code, "score": round(score, 4), "departamento": dep, "provincia": prov,
+                "distrito": dist, "exact": exact, "ambiguous": ambiguous}
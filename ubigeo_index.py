@@ -0,0 +1,200 @@
+# -*- coding: utf-8 -*-
+"""
+Índice binario precompilado del catálogo UBIGEO.
+
+Compila ubigeo.xlsx / ubigeo.csv a un archivo compacto (ubigeo.idx) que se abre
+con mmap: carga en milisegundos y las páginas se comparten entre procesos
+workers a través del page cache del sistema operativo.
+
+Construcción:
+  python ubigeo_index.py build [--source ubigeo.xlsx] [--out ubigeo.idx]
+  python ubigeo_index.py info  [--index ubigeo.idx]
+
+Formato (little-endian, versión 1):
+  cabecera  <4sHHIQQ32sI : magic "UBIX", versión, flags, n, tamaño fuente,
+                            mtime_ns fuente, sha256 fuente, largo del blob de claves
+  offsets   (n+1) x uint32 : inicio de cada clave en el blob
+  códigos   n x 6 bytes ASCII
+  claves    blob UTF-8 "DEP|PROV|DIST", ordenadas por bytes (búsqueda binaria)
+"""
+
+import os
+import sys
+import mmap
+import struct
+import hashlib
+import argparse
+from pathlib import Path
+from collections.abc import Mapping
+from typing import Dict, Iterator, Optional
+
+MAGIC = b"UBIX"
+VERSION = 1
+_HEADER = struct.Struct("<4sHHIQQ32sI")
+_U32 = struct.Struct("<I")
+CODE_LEN = 6
+
+DEFAULT_INDEX_PATH = Path(__file__).parent / "ubigeo.idx"
+
+def _sha256(path: Path) -> bytes:
+    h = hashlib.sha256()
+    with path.open("rb") as f:
+        for chunk in iter(lambda: f.read(1 << 16), b""):
+            h.update(chunk)
+    return h.digest()
+
+def write_index(catalog: Dict[str, str], out: Path, source: Optional[Path] = None) -> Path:
+    """ Escribe el índice de forma atómica (tmp + rename). """
+    out = Path(out)
+    items = sorted(((k.encode("utf-8"), v) for k, v in catalog.items()), key=lambda kv: kv[0])
+    offsets, blob, codes = [0], bytearray(), bytearray()
+    for kb, code in items:
+        code_b = code.encode("ascii")
+        if len(code_b) != CODE_LEN:
+            raise ValueError(f"UBIGEO inválido para '{kb.decode('utf-8')}': {code!r}")
+        blob += kb
+        offsets.append(len(blob))
+        codes += code_b
+    if source is not None and Path(source).exists():
+        st = Path(source).stat()
+        src_size, src_mtime, src_sha = st.st_size, st.st_mtime_ns, _sha256(Path(source))
+    else:
+        src_size, src_mtime, src_sha = 0, 0, b"\0" * 32
+    header = _HEADER.pack(MAGIC, VERSION, 0, len(items), src_size, src_mtime, src_sha, len(blob))
+    tmp = out.with_name(out.name + f".tmp{os.getpid()}")
+    with tmp.open("wb") as f:
+        f.write(header)
+        f.write(struct.pack(f"<{len(offsets)}I", *offsets))
+        f.write(codes)
+        f.write(blob)
+    os.replace(tmp, out)
+    return out
+
+class UbigeoIndex(Mapping):
+    """ Mapping de solo lectura {"DEP|PROV|DIST": "UBIGEO"} sobre el archivo mmap. """
+
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        with self.path.open("rb") as f:
+            self._mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        (magic, version, _flags, n, self.src_size, self.src_mtime_ns,
+         self.src_sha256, blob_len) = _HEADER.unpack_from(self._mm, 0)
+        if magic != MAGIC or version != VERSION:
+            self._mm.close()
+            raise ValueError(f"Índice UBIGEO incompatible: {self.path} (v{version})")
+        self._n = n
+        self._off_base = _HEADER.size
+        self._codes_base = self._off_base + (n + 1) * _U32.size
+        self._blob_base = self._codes_base + n * CODE_LEN
+        if self._blob_base + blob_len != len(self._mm):
+            self._mm.close()
+            raise ValueError(f"Índice UBIGEO truncado o corrupto: {self.path}")
+
+    def _key_bytes(self, i: int) -> bytes:
+        a = _U32.unpack_from(self._mm, self._off_base + i * 4)[0]
+        b = _U32.unpack_from(self._mm, self._off_base + (i + 1) * 4)[0]
+        return self._mm[self._blob_base + a:self._blob_base + b]
+
+    def _code(self, i: int) -> str:
+        p = self._codes_base + i * CODE_LEN
+        return self._mm[p:p + CODE_LEN].decode("ascii")
+
+    def _find(self, key: str) -> int:
+        kb = key.encode("utf-8")
+        lo, hi = 0, self._n
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if self._key_bytes(mid) < kb:
+                lo = mid + 1
+            else:
+                hi = mid
+        if lo < self._n and self._key_bytes(lo) == kb:
+            return lo
+        return -1
+
+    def __getitem__(self, key: str) -> str:
+        i = self._find(key) if isinstance(key, str) else -1
+        if i < 0:
+            raise KeyError(key)
+        return self._code(i)
+
+    def __contains__(self, key: object) -> bool:
+        return isinstance(key, str) and self._find(key) >= 0
+
+    def __len__(self) -> int:
+        return self._n
+
+    def __iter__(self) -> Iterator[str]:
+        for i in range(self._n):
+            yield self._key_bytes(i).decode("utf-8")
+
+    def iter_items(self) -> Iterator:
+        """ (clave, código) en orden, sin pasar por la búsqueda binaria. """
+        return ((self._key_bytes(i).decode("utf-8"), self._code(i)) for i in range(self._n))
+
+    def is_fresh_for(self, source: Optional[Path]) -> bool:
+        """ Vigente si la fuente no cambió (tamaño+mtime; si difiere el mtime se compara el sha256). """
+        if source is None or not Path(source).exists():
+            return True  # sin fuente contra la cual comparar: el índice es lo único disponible
+        st = Path(source).stat()
+        if st.st_size != self.src_size:
+            return False
+        if st.st_mtime_ns == self.src_mtime_ns:
+            return True
+        return _sha256(Path(source)) == self.src_sha256
+
+    def close(self) -> None:
+        self._mm.close()
+
+def open_index(path: Path, source: Optional[Path] = None) -> Optional[UbigeoIndex]:
+    """ Abre el índice si existe, es de esta versión y está vigente respecto a `source`. """
+    path = Path(path)
+    if not path.exists():
+        return None
+    try:
+        idx = UbigeoIndex(path)
+    except (OSError, ValueError, struct.error):
+        return None
+    if not idx.is_fresh_for(source):
+        idx.close()
+        return None
+    return idx
+
+# ----
+# CLI
+# ----
+def main(argv) -> int:
+    import pipeline_catastral as pc
+
+    p = argparse.ArgumentParser(description="Índice binario UBIGEO")
+    sub = p.add_subparsers(dest="cmd", required=True)
+    b = sub.add_parser("build", help="compila el catálogo Excel/CSV a un índice binario")
+    b.add_argument("--source", help="ubigeo.xlsx o ubigeo.csv (por defecto el primero disponible)")
+    b.add_argument("--out", default=str(pc.UBIGEO_INDEX_PATH))
+    i = sub.add_parser("info", help="muestra cabecera y vigencia del índice")
+    i.add_argument("--index", default=str(pc.UBIGEO_INDEX_PATH))
+    args = p.parse_args(argv)
+
+    if args.cmd == "build":
+        source = Path(args.source) if args.source else pc.ubigeo_source_path()
+        if source is None:
+            print("No se encontró ubigeo.xlsx ni ubigeo.csv", file=sys.stderr)
+            return 1
+        cat = pc.load_ubigeo_from_source(source)
+        if not cat:
+            print(f"No se pudieron leer filas UBIGEO de {source}", file=sys.stderr)
+            return 1
+        out = write_index(cat, Path(args.out), source)
+        print(f"{out}: {len(cat)} distritos ({out.stat().st_size} bytes) desde {source}")
+        return 0
+
+    idx = open_index(Path(args.index))
+    if idx is None:
+        print(f"Índice no disponible o incompatible: {args.index}", file=sys.stderr)
+        return 1
+    src = pc.ubigeo_source_path()
+    print(f"{args.index}: v{VERSION}, {len(idx)} distritos, fuente={src}, vigente={idx.is_fresh_for(src)}")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,69 @@
+# -*- coding: utf-8 -*-
+"""
+Subidas de audio sin cargarlas enteras en memoria.
+
+- UploadLimitMiddleware: rechaza con 413 las subidas que superan el máximo. Si el
+  cliente manda Content-Length se rechaza antes de leer el cuerpo; si no (chunked),
+  se corta en cuanto lo recibido pasa el límite, sin esperar al final.
+- Starlette ya vuelca las partes de archivo a disco (SpooledTemporaryFile, >1 MB);
+  los endpoints pasan ese file-like tal cual a transcribe_audio, que lo sube en
+  streaming. spool_to_disk() copia por bloques a un archivo propio cuando el audio
+  debe sobrevivir al request (trabajos en segundo plano).
+"""
+
+import os
+import shutil
+import tempfile
+from pathlib import Path
+from typing import BinaryIO, Iterable, Optional
+
+from fastapi import HTTPException
+from starlette.responses import JSONResponse
+
+def _too_large(max_bytes: int) -> str:
+    return f"El archivo supera el máximo permitido ({max_bytes / (1 << 20):g} MB)."
+
+class UploadLimitMiddleware:
+    """ Middleware ASGI: tope de tamaño del cuerpo para las rutas de subida de audio. """
+
+    def __init__(self, app, max_bytes: int, paths: Iterable[str]):
+        self.app = app
+        self.max_bytes = max_bytes
+        self.paths = {p.rstrip("/") or "/" for p in paths}
+
+    async def __call__(self, scope, receive, send):
+        if (scope["type"] != "http" or self.max_bytes <= 0
+                or (scope.get("path", "").rstrip("/") or "/") not in self.paths):
+            await self.app(scope, receive, send)
+            return
+        length = dict(scope.get("headers") or []).get(b"content-length")
+        if length is not None and length.isdigit() and int(length) > self.max_bytes:
+            await JSONResponse({"detail": _too_large(self.max_bytes)}, status_code=413)(scope, receive, send)
+            return
+        received = 0
+
+        async def limited_receive():
+            nonlocal received
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+                if received > self.max_bytes:
+                    # FastAPI re-lanza HTTPException al parsear el formulario -> 413
+                    raise HTTPException(status_code=413, detail=_too_large(self.max_bytes))
+            return message
+
+        await self.app(scope, limited_receive, send)
+
+def spool_to_disk(src: BinaryIO, directory: Optional[Path] = None, chunk_bytes: int = 1 << 20,
+                  suffix: str = ".audio") -> Path:
+    """ Copia `src` a un archivo temporal propio por bloques de `chunk_bytes`; el llamador lo borra. """
+    if directory is not None:
+        Path(directory).mkdir(parents=True, exist_ok=True)
+    fd, name = tempfile.mkstemp(suffix=suffix, dir=directory)
+    try:
+        with os.fdopen(fd, "wb") as dst:
+            shutil.copyfileobj(src, dst, chunk_bytes)
+    except BaseException:
+        os.unlink(name)
+        raise
+    return Path(name)
@@ -0,0 +1,206 @@
+# -*- coding: utf-8 -*-
+"""
+Pool de procesos para la inferencia NER (modo multi-núcleo).
+
+Cada worker carga `model-last-tuned` una sola vez (initializer) y luego atiende
+llamadas a process_text / process_texts. Si un worker muere (segfault, OOM),
+el pool se recrea automáticamente y la llamada en curso se reintenta una vez.
+
+Las métricas por etapa se acumulan en cada hijo y viajan al padre junto con cada
+resultado (REGISTRY.drain() -> REGISTRY.merge()), así /metrics ve todo el pool.
+
+Uso desde la API:
+  CATASTRO_EXEC_MODE=pool CATASTRO_WORKERS=8 uvicorn pipeline_catastral:app --port 8000
+"""
+
+import os
+import math
+import signal
+import threading
+import multiprocessing as mp
+from typing import Any, Dict, List, Optional, Tuple
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from metrics import REGISTRY
+
+# ------------------------------------------------
+# Funciones que corren DENTRO de cada proceso hijo
+# ------------------------------------------------
+def _init_worker(model_path: str) -> None:
+    # El padre se encarga del apagado ordenado; los hijos ignoran Ctrl+C
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    import pipeline_catastral as pc
+    pc.MODEL_PATH = model_path
+    pc._CHUNK_RUNNER = None  # con fork se heredaría el del padre (que reenvía al pool)
+    pc.get_nlp()
+
+def _work_ping() -> int:
+    return os.getpid()
+
+def _work_warmup(docs: int) -> int:
+    import pipeline_catastral as pc
+    n = pc.warmup(docs)
+    REGISTRY.drain()  # el calentamiento no cuenta en /metrics
+    return n
+
+def _work_process_text(text: str, mode: Optional[str],
+                       profile: Optional[str] = None) -> Tuple[Dict[str, Any], Dict[str, Any]]:
+    import pipeline_catastral as pc
+    try:
+        return pc.process_text(text, mode=mode, profile=profile), REGISTRY.drain()
+    except Exception as e:
+        e.metrics = REGISTRY.drain()
+        raise
+
+def _work_process_texts(texts: List[str], batch_size: Optional[int], mode: Optional[str],
+                        profile: Optional[str] = None) -> Tuple[List[Dict[str, Any]], Dict[str, Any]]:
+    import pipeline_catastral as pc
+    return list(pc.process_texts(texts, batch_size=batch_size, mode=mode, profile=profile)), REGISTRY.drain()
+
+def _work_run_ner(texts: List[str], mode: Optional[str]) -> Tuple[List[Any], Dict[str, Any]]:
+    """ Sólo NER (ventanas de una transcripción larga); el padre fusiona y arma la salida. """
+    import pipeline_catastral as pc
+    return [pc.run_ner(t, mode or "full") for t in texts], REGISTRY.drain()
+
+# -------------
+# Pool del padre
+# -------------
+class NERWorkerPool:
+    """
+    Envoltorio sobre ProcessPoolExecutor con:
+    - modelo precargado por proceso
+    - reinicio automático si un worker se cae (BrokenProcessPool)
+    - apagado ordenado (shutdown)
+    """
+
+    def __init__(self, workers: Optional[int] = None, model_path: str = "model-last-tuned",
+                 start_method: Optional[str] = None, max_retries: int = 1):
+        self.workers = max(1, workers or os.cpu_count() or 1)
+        self.model_path = model_path
+        self.start_method = start_method or os.getenv("CATASTRO_MP_START", "spawn")
+        self.max_retries = max_retries
+        self.restarts = 0
+        self._lock = threading.Lock()
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._closed = False
+
+    def _new_executor(self) -> ProcessPoolExecutor:
+        return ProcessPoolExecutor(
+            max_workers=self.workers,
+            mp_context=mp.get_context(self.start_method),
+            initializer=_init_worker,
+            initargs=(self.model_path,),
+        )
+
+    def start(self, wait_ready: bool = True) -> "NERWorkerPool":
+        with self._lock:
+            if self._executor is None:
+                self._executor = self._new_executor()
+            ex = self._executor
+        if wait_ready:
+            # fuerza el arranque (y la carga del modelo) en todos los procesos
+            for f in [ex.submit(_work_ping) for _ in range(self.workers)]:
+                f.result()
+        return self
+
+    def warmup(self, docs: int) -> None:
+        """ Un lote de calentamiento por worker (se reparten como los pings de start). """
+        ex = self._executor
+        if ex is None:
+            return
+        for f in [ex.submit(_work_warmup, docs) for _ in range(self.workers)]:
+            f.result()
+
+    def _restart(self, broken: ProcessPoolExecutor) -> None:
+        with self._lock:
+            if self._closed:
+                raise RuntimeError("El pool de workers NER está cerrado.")
+            if self._executor is not broken:
+                return  # otro hilo ya lo reinició
+            broken.shutdown(wait=False, cancel_futures=True)
+            self._executor = self._new_executor()
+            self.restarts += 1
+
+    def _call(self, fn, *args):
+        attempts = 0
+        while True:
+            with self._lock:
+                if self._closed:
+                    raise RuntimeError("El pool de workers NER está cerrado.")
+                if self._executor is None:
+                    self._executor = self._new_executor()
+                ex = self._executor
+            try:
+                result, metrics = ex.submit(fn, *args).result()
+                REGISTRY.merge(metrics)
+                return result
+            except BrokenProcessPool:
+                self._restart(ex)
+                attempts += 1
+                if attempts > self.max_retries:
+                    raise RuntimeError("Un worker NER se cayó procesando el documento.")
+            except Exception as e:
+                REGISTRY.merge(getattr(e, "metrics", None))
+                raise
+
+    def process_text(self, text: str, mode: Optional[str] = None,
+                     profile: Optional[str] = None) -> Dict[str, Any]:
+        return self._call(_work_process_text, text, mode, profile)
+
+    def _fan_out(self, fn, items: List[Any], *args) -> List[Tuple[List[Any], Any]]:
+        """
+        Un sub-lote contiguo por worker (nunca más hilos que workers); devuelve
+        [(sub-lote, resultado o excepción)] en orden.
+        """
+        size = max(1, math.ceil(len(items) / self.workers))
+        parts = [items[i:i + size] for i in range(0, len(items), size)]
+        threads_out: List[Any] = [None] * len(parts)
+
+        def run(i: int, part: List[Any]) -> None:
+            try:
+                threads_out[i] = self._call(fn, part, *args)
+            except Exception as e:
+                threads_out[i] = e
+
+        threads = [threading.Thread(target=run, args=(i, p)) for i, p in enumerate(parts)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        return list(zip(parts, threads_out))
+
+    def process_texts(self, texts: List[str], batch_size: Optional[int] = None,
+                      mode: Optional[str] = None, profile: Optional[str] = None) -> List[Dict[str, Any]]:
+        """
+        Reparte el lote entre los workers (un sub-lote contiguo por worker) y respeta el orden.
+        batch_size es el de nlp.pipe dentro de cada worker, no el tamaño de los sub-lotes.
+        """
+        texts = list(texts)
+        if not texts:
+            return []
+        out: List[Dict[str, Any]] = []
+        for part, res in self._fan_out(_work_process_texts, texts, batch_size, mode, profile):
+            out.extend([{"error": str(res)} for _ in part] if isinstance(res, Exception) else res)
+        return out
+
+    def run_ner_chunks(self, chunks: List[str], mode: Optional[str] = None) -> List[List[Any]]:
+        """ NER en paralelo de las ventanas de un documento largo (orden preservado). """
+        if not chunks:
+            return []
+        out: List[List[Any]] = []
+        for _, res in self._fan_out(_work_run_ner, list(chunks), mode):
+            if isinstance(res, Exception):
+                raise res
+            out.extend(res)
+        return out
+
+    def stats(self) -> Dict[str, Any]:
+        return {"workers": self.workers, "restarts": self.restarts,
+                "start_method": self.start_method, "closed": self._closed}
+
+    def shutdown(self, wait: bool = True) -> None:
+        with self._lock:
+            self._closed = True
+            ex, self._executor = self._executor, None
+        if ex is not None:
+            ex.shutdown(wait=wait, cancel_futures=not wait)